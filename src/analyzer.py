@@ -0,0 +1,126 @@
+# analyzer.py
+# Programmatic entry point: analyze_namespace returns the results of a namespace as objects and prints nothing.
+# The text report and all_errors.json are rendered from these objects by report.py.
+
+# Custom imports
+from pattern_matcher import PatternMatcher
+from error_info import ErrorInfoHolder, analyze_pods_without_errors, analyze_pods_with_errors, analyze_describe_pods_output, classify_pods
+
+
+class AnalysisOptions:
+    """
+    workers: number of processes used to scan log files.
+    scan_mode: how log files are read, see log_scanner.SCAN_MODES.
+    scan_cache: an open scan_cache.ScanCache to reuse the results of earlier runs, or None.
+    show_progress: shows a progress line on the console while the pods in normal state are analyzed.
+    findings_writer: a findings_export.FindingsWriter that gets every log finding as it is found, or None.
+    level_filter: a level_filter.LevelFilter that skips the low severity lines in the logs of the pods in normal state, or None.
+    time_window: a time_window.TimeWindow, only the log lines inside it are analyzed. The scan cache is not used then.
+    """
+    def __init__(self, workers=1, scan_mode="text", scan_cache=None, show_progress=False, findings_writer=None, level_filter=None,
+                 time_window=None):
+        self.workers = workers
+        self.scan_mode = scan_mode
+        self.scan_cache = scan_cache
+        self.show_progress = show_progress
+        self.findings_writer = findings_writer
+        self.level_filter = level_filter
+        self.time_window = time_window
+
+
+class CategorySummary:
+    """Where an error category was found in the logs of the pods in normal state."""
+    def __init__(self, category, error_infos):
+        self.category = category
+        self.messages = len(error_infos)
+        # In the order they were found, like the report
+        self.files = list(dict.fromkeys(error_info.file_name for error_info in error_infos))
+        self.containers = list(dict.fromkeys(error_info.container for error_info in error_infos))
+
+
+class NamespaceAnalysis:
+    """
+    Results of analyze_namespace.
+    pods_with_errors: pod_info.PodInfo of the pods classified with an issue, pod.errors holds their pod_info.PodError by file.
+    pods_without_errors: pod_info.PodInfo of the pods in normal state.
+    error_infos: {category: [error_info.ErrorInfo]}, the unique messages found in the logs of the pods in normal state.
+    level_filter_stats: {log file: (lines, lines skipped for their level)} when a level filter was used,
+    the files whose results came from the scan cache are not in it.
+    time_window: the time_window.TimeWindow the log lines were restricted to, or None.
+    status is "failed" (and error says why) when the namespace could not be analyzed.
+    """
+    def __init__(self, namespace_path):
+        self.namespace_path = namespace_path
+        self.status = "ok"
+        self.error = None
+        self.pods_with_errors = []
+        self.pods_without_errors = []
+        self.logs_folder_found = True
+        self.error_info_holder = ErrorInfoHolder()
+        self.level_filter_stats = None
+        self.time_window = None
+
+    @property
+    def pods(self):
+        return self.pods_with_errors + self.pods_without_errors
+
+    @property
+    def error_infos(self):
+        return self.error_info_holder.errors
+
+    def get_error_categories(self):
+        return {category: CategorySummary(category, error_infos) for category, error_infos in self.error_infos.items()}
+
+    def get_pod_errors(self):
+        # {pod name: [error lines]}, the content of all_errors.json
+        return {pod.name: [str(error) for errors in pod.errors.values() for error in errors] for pod in self.pods_with_errors}
+
+    def get_level_filter_totals(self):
+        lines = sum(file_lines for file_lines, _ in self.level_filter_stats.values())
+        lines_skipped = sum(file_lines_skipped for _, file_lines_skipped in self.level_filter_stats.values())
+        return {"files": len(self.level_filter_stats), "lines_scanned": lines - lines_skipped, "lines_skipped": lines_skipped}
+
+    def to_summary(self):
+        summary = {"namespace_path": self.namespace_path, "status": self.status}
+        if self.status != "ok":
+            return {**summary, "error": self.error}
+        return {
+            **summary,
+            "pods": len(self.pods_with_errors) + len(self.pods_without_errors),
+            "pods_with_errors": {pod.name: pod.status for pod in self.pods_with_errors},
+            **({"level_filter": self.get_level_filter_totals()} if self.level_filter_stats is not None else {}),
+            **({"time_window": self.time_window.to_summary()} if self.time_window is not None else {}),
+            "error_categories": {
+                category: {"messages": category_summary.messages, "files": len(category_summary.files), "containers": len(category_summary.containers)}
+                for category, category_summary in self.get_error_categories().items()
+            },
+        }
+
+
+def analyze_namespace(namespace_path, error_patterns, options=None):
+    """
+    Analyzes the namespace folder (or namespace inside a bundle) at namespace_path and returns a NamespaceAnalysis.
+    error_patterns is an error patterns dict ({category: [patterns]}) or a PatternMatcher, which is reused as is.
+    """
+    options = options or AnalysisOptions()
+    matcher = error_patterns if isinstance(error_patterns, PatternMatcher) else PatternMatcher(error_patterns)
+    analysis = NamespaceAnalysis(namespace_path)
+    analysis.time_window = options.time_window
+
+    classified_pods = classify_pods(namespace_path)
+    if classified_pods is None:
+        analysis.status = "failed"
+        analysis.error = "get/pods.txt not found"
+        return analysis
+    pods_with_errors, pods_without_errors = classified_pods
+
+    analysis.pods_with_errors = analyze_describe_pods_output(namespace_path, pods_with_errors)
+    analysis.pods_without_errors = pods_without_errors
+    analysis.logs_folder_found = analyze_pods_with_errors(namespace_path, pods_with_errors, matcher, options.workers, options.scan_mode,
+                                                          options.scan_cache, options.findings_writer, options.time_window)
+    if options.level_filter is not None:
+        analysis.level_filter_stats = {}
+    analysis.error_info_holder = analyze_pods_without_errors(namespace_path, pods_without_errors, matcher, options.workers, options.scan_mode,
+                                                             options.scan_cache, options.show_progress, options.findings_writer,
+                                                             options.level_filter, analysis.level_filter_stats, options.time_window)
+    return analysis
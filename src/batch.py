@@ -0,0 +1,198 @@
+# batch.py
+# Report of one namespace, and the non-interactive batch mode that runs it over many namespaces
+
+import os
+import json
+import time
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+# Custom imports
+from utils import conf, logging, setup_logging, worker_log_queue
+from track_usage import record_user_activity
+from printer import Printer
+from analyzer import AnalysisOptions, analyze_namespace
+from report import print_report, write_all_errors
+from findings_export import open_findings_writer
+from level_filter import get_level_filter
+from time_window import get_time_window
+from pattern_matcher import PatternMatcher
+from case_bundle import is_bundle_path, path_exists, path_isdir, list_dir
+from scan_cache import ScanCache
+
+# Set once per worker process by init_batch_worker
+worker_matcher = None
+worker_scan_mode = "text"
+worker_scan_cache = None
+worker_findings_format = None
+worker_since = None
+worker_until = None
+
+
+def open_scan_cache():
+    scan_cache_conf = conf.get("scan_cache", {})
+    return ScanCache(os.path.join(conf["output_folder"], scan_cache_conf.get("file_name", "scan_cache.sqlite")),
+                     scan_cache_conf.get("max_size_mb", 512))
+
+def get_report_adjacent_path(printer, namespace_path, name):
+    # <report path without .txt>_<name>, or <output folder>/<name>_<namespace> without a report file
+    if printer.file_path:
+        return f"{os.path.splitext(printer.file_path)[0]}_{name}"
+    return os.path.join(conf["output_folder"], f"{name}_{os.path.basename(namespace_path)}")
+
+def report_namespace(namespace_path, matcher, printer_mode="both", workers=1, scan_mode="text", scan_cache=None, report_suffix="",
+                     findings_format=None, since=None, until=None):
+    """
+    Analyzes one namespace (see analyzer.analyze_namespace) and writes its report, and all_errors.json when pods have errors.
+    With findings_format, every finding is also exported next to the report, see findings_export.
+    since / until: the --since / --until values, only the log lines between them are analyzed (see time_window.get_time_window).
+    Returns a summary dict of the results. printer_mode "file" keeps the console quiet, as in batch mode.
+    """
+    printer = Printer(namespace_path, mode=printer_mode, file_suffix=report_suffix)
+    findings_writer = None
+    if findings_format:
+        findings_writer = open_findings_writer(get_report_adjacent_path(printer, namespace_path, "findings"), namespace_path, findings_format)
+
+    options = AnalysisOptions(workers, scan_mode, scan_cache, show_progress=printer_mode != "file", findings_writer=findings_writer,
+                              level_filter=get_level_filter(matcher.categories), time_window=get_time_window(since, until, namespace_path))
+    try:
+        analysis = analyze_namespace(namespace_path, matcher, options)
+    finally:
+        if findings_writer:
+            findings_writer.close()
+    if analysis.status != "ok":
+        # The analysis only logs why it failed
+        if printer_mode != "file":
+            print(f"Could not analyze {namespace_path}: {analysis.error}")
+        printer.close()
+        return {**analysis.to_summary(), "report_path": None}
+
+    all_errors_path = None
+    if analysis.pods_with_errors:
+        all_errors_path = os.path.join(namespace_path, "all_errors.json")
+        if is_bundle_path(namespace_path):
+            # Bundles are read only, the file goes next to the report instead
+            all_errors_path = get_report_adjacent_path(printer, namespace_path, "all_errors") + ".json"
+        write_all_errors(analysis, all_errors_path)
+
+    print_report(analysis, printer, all_errors_path)
+    printer.close()
+
+    if findings_writer and printer_mode != "file":
+        print(f"\n{findings_writer.findings} findings exported to: {findings_writer.path}")
+
+    summary = {**analysis.to_summary(), "report_path": printer.file_path, "all_errors_path": all_errors_path}
+    if findings_writer:
+        summary["findings_path"] = findings_writer.path
+    return summary
+
+def find_namespaces(target, namespace_names=None):
+    """
+    Returns the namespace paths of a batch target: a namespace folder (it has get/pods.txt) is used as is,
+    for a case folder or bundle every namespace under kubernetes/ is used, or only the ones in namespace_names.
+    """
+    if path_exists(os.path.join(target, "get", "pods.txt")):
+        return [target]
+
+    kubernetes_path = os.path.join(target, "kubernetes")
+    if not path_isdir(kubernetes_path):
+        print(f"Skipping {target}: no 'kubernetes' folder and no get/pods.txt found.")
+        logging.warning(f"Skipping {target}: no 'kubernetes' folder and no get/pods.txt found.")
+        return []
+
+    namespaces = sorted(f for f in list_dir(kubernetes_path) if path_isdir(os.path.join(kubernetes_path, f)))
+    if namespace_names:
+        namespaces = [namespace for namespace in namespaces if namespace in namespace_names]
+    return [os.path.join(kubernetes_path, namespace) for namespace in namespaces]
+
+def analyze_batch_namespace(batch_index, namespace_path, matcher, scan_mode, scan_cache, findings_format=None, since=None, until=None):
+    # A failing namespace is reported in the summary instead of stopping the batch
+    start = time.perf_counter()
+    try:
+        # Namespaces of the same case started within the same second would otherwise share a report file
+        summary = report_namespace(namespace_path, matcher, printer_mode="file", scan_mode=scan_mode, scan_cache=scan_cache,
+                                   report_suffix=f"_{batch_index}", findings_format=findings_format, since=since, until=until)
+    except Exception as e:
+        logging.exception(f"Batch analysis of {namespace_path} failed")
+        summary = {"namespace_path": namespace_path, "status": "failed", "error": f"{type(e).__name__}: {e}"}
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary
+
+def init_batch_worker(matcher, scan_mode, use_cache, findings_format, since=None, until=None, log_queue=None):
+    global worker_matcher, worker_scan_mode, worker_scan_cache, worker_findings_format, worker_since, worker_until
+    setup_logging(log_queue)
+    worker_matcher = matcher
+    worker_scan_mode = scan_mode
+    worker_scan_cache = open_scan_cache() if use_cache else None
+    worker_findings_format = findings_format
+    worker_since = since
+    worker_until = until
+
+def analyze_batch_namespace_in_worker(batch_index, namespace_path):
+    summary = analyze_batch_namespace(batch_index, namespace_path, worker_matcher, worker_scan_mode, worker_scan_cache, worker_findings_format,
+                                      worker_since, worker_until)
+    if worker_scan_cache:
+        worker_scan_cache.commit()
+    return summary
+
+def run_batch(targets, error_patterns, namespace_names=None, workers=1, scan_mode="text", use_cache=True, summary_path=None, findings_format=None,
+              since=None, until=None):
+    """
+    Analyzes every namespace of targets (see find_namespaces) without any prompt, workers namespaces at a time.
+    Every namespace gets its report in the output folder, and a JSON summary of all of them is written to summary_path.
+    Returns the summary.
+    """
+    namespace_paths = [namespace_path for target in targets for namespace_path in find_namespaces(target, namespace_names)]
+    # Compiled once, worker processes get a copy
+    matcher = PatternMatcher(error_patterns)
+    workers = max(1, min(workers, len(namespace_paths)))
+    print(f"Analyzing {len(namespace_paths)} namespaces, {workers} at a time")
+    logging.info(f"Batch of {len(namespace_paths)} namespaces with {workers} worker processes")
+
+    for namespace_path in namespace_paths:
+        record_user_activity(namespace_path)
+
+    started = datetime.now()
+    results = []
+    if workers == 1:
+        scan_cache = open_scan_cache() if use_cache else None
+        summaries = (analyze_batch_namespace(i, namespace_path, matcher, scan_mode, scan_cache, findings_format, since, until)
+                     for i, namespace_path in enumerate(namespace_paths, start=1))
+        try:
+            for i, summary in enumerate(summaries, start=1):
+                print_batch_progress(i, len(namespace_paths), summary)
+                results.append(summary)
+        finally:
+            if scan_cache:
+                scan_cache.close()
+    else:
+        with worker_log_queue() as log_queue, ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker,
+                                                                  initargs=(matcher, scan_mode, use_cache, findings_format, since, until, log_queue)) as executor:
+            for i, summary in enumerate(executor.map(analyze_batch_namespace_in_worker, range(1, len(namespace_paths) + 1), namespace_paths), start=1):
+                print_batch_progress(i, len(namespace_paths), summary)
+                results.append(summary)
+
+    batch_summary = {
+        "started": started.strftime(conf.get("output_timestamp_format", "%Y-%m-%d %H:%M:%S")),
+        "seconds": round((datetime.now() - started).total_seconds(), 3),
+        "error_patterns_fingerprint": matcher.fingerprint,
+        "namespaces": results,
+    }
+
+    if summary_path is None:
+        summary_path = os.path.join(conf["output_folder"], f"batch_summary_{started.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(summary_path) or ".", exist_ok=True)
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(batch_summary, f, indent=2, ensure_ascii=False)
+
+    failed = sum(1 for summary in results if summary["status"] != "ok")
+    print(f"\nBatch summary saved to: {summary_path} ({len(results) - failed} done, {failed} failed)")
+    logging.info(f"Batch summary saved to: {summary_path} ({len(results) - failed} done, {failed} failed)")
+    return batch_summary
+
+def print_batch_progress(i, total, summary):
+    if summary["status"] == "ok":
+        print(f"[{i}/{total}] {summary['namespace_path']}: {len(summary['pods_with_errors'])} of {summary['pods']} pods with issues, "
+              f"report: {summary['report_path']}")
+    else:
+        print(f"[{i}/{total}] {summary['namespace_path']}: failed ({summary['error']})")
@@ -0,0 +1,1099 @@
+# benchmarks.py
+# Benchmarks for the log analysis hot paths on synthetic data.
+# Run from the folder that contains conf.json, for example: python src/benchmarks.py matcher
+
+import os
+import sys
+import json
+import time
+import random
+import string
+import re
+import argparse
+from datetime import datetime, timedelta, timezone
+import tempfile
+import shutil
+import tracemalloc
+import tarfile
+import subprocess
+import zipfile
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Custom imports
+from pattern_matcher import PatternMatcher
+from log_scanner import scan_log_files, scan_log_file_text, scan_log_file_mmap
+import cleaner
+from cleaner import normalize_logs
+from error_info import ErrorInfo, ErrorInfoHolder
+import json_backend
+from case_bundle import build_log_index
+from scan_cache import ScanCache
+from error_message import parse_log_line
+from pod_info import PodInfo
+from findings_export import NdjsonFindingsWriter, FINDING_FIELDS
+import utils
+from utils import conf, setup_logging
+from track_usage import ActivityTracker, get_activity_tracker
+from mongodb_handler import MongoHandler, CachedMongoHandler
+from pattern_similarity import promote_user_patterns, SIMILARITY_THRESHOLD
+from pattern_compiler import compile_entry
+from level_filter import LevelFilter
+from batch import run_batch
+from time_window import TimeWindow, read_line_time
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+def make_words(number_of_words, seed=0):
+    rng = random.Random(seed)
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(number_of_words)]
+
+def make_error_patterns(words, number_of_categories, patterns_per_category, seed=0):
+    rng = random.Random(seed)
+    return {
+        f"Synthetic Category {category}": [" ".join(rng.choices(words, k=rng.randint(2, 4))) for _ in range(patterns_per_category)]
+        for category in range(number_of_categories)
+    }
+
+def make_log_lines(words, error_patterns, number_of_lines, hit_ratio=0.01, seed=0):
+    rng = random.Random(seed)
+    all_patterns = [pattern for patterns in error_patterns.values() for pattern in patterns]
+    lines = []
+    for i in range(number_of_lines):
+        message = " ".join(rng.choices(words, k=rng.randint(10, 30)))
+        if rng.random() < hit_ratio:
+            message = f"{message} {rng.choice(all_patterns)}"
+        lines.append(json.dumps({
+            "version": 1,
+            "level": rng.choice(["info", "info", "info", "debug", "warn", "error"]),
+            "source": "synthetic",
+            "messageKey": message[:20],
+            "messageParameters": {"p1": rng.choice(words), "p2": str(rng.randint(0, 10 ** 6))},
+            "properties": {"logger": "com.sas.synthetic", "appname": "sas-synthetic", "caller": "synthetic.go:42", "thread": str(rng.randint(1, 64))},
+            "message": message,
+            "timeStamp": f"2025-01-21T04:{(i // 60) % 60:02d}:{i % 60:02d}.000Z"
+        }) + "\n")
+    return lines
+
+def write_synthetic_namespace(namespace_path, words, error_patterns, number_of_pods, containers_per_pod, lines_per_file, hit_ratio=0.01):
+    logs_dir = os.path.join(namespace_path, "logs")
+    os.makedirs(logs_dir, exist_ok=True)
+    log_files = []
+    for pod in range(number_of_pods):
+        for container in range(containers_per_pod):
+            log_file_path = os.path.join(logs_dir, f"sas-synthetic-{pod}-abcde_container-{container}.log")
+            with open(log_file_path, "w", encoding="utf-8") as log_file:
+                log_file.writelines(make_log_lines(words, error_patterns, lines_per_file, hit_ratio, seed=pod * 1000 + container))
+            log_files.append(log_file_path)
+    return log_files
+
+@contextmanager
+def spawn_start_method():
+    # Worker processes start this way on Windows and in main.exe, everything they get is pickled
+    start_method = multiprocessing.get_start_method()
+    multiprocessing.set_start_method("spawn", force=True)
+    try:
+        yield
+    finally:
+        multiprocessing.set_start_method(start_method, force=True)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def print_result(name, seconds, baseline_seconds=None):
+    speedup = f" ({baseline_seconds / seconds:.1f}x)" if baseline_seconds else ""
+    print(f"{name:<40} {seconds:>8.3f}s{speedup}")
+
+
+# Pattern matching
+
+def legacy_scan(log_files, error_patterns):
+    hits = []
+    for file_name in log_files:
+        with open(file_name, "r", encoding="utf-8", errors="ignore") as log_file:
+            for line_number, line in enumerate(log_file, start=1):
+                for category, patterns in error_patterns.items():
+                    if any(p in line for p in patterns):
+                        hits.append((file_name, line_number, category))
+                        break
+    return hits
+
+def matcher_scan(log_files, matcher):
+    hits = []
+    for file_name in log_files:
+        with open(file_name, "r", encoding="utf-8", errors="ignore") as log_file:
+            for line_number, line in enumerate(log_file, start=1):
+                category = matcher.match(line)
+                if category:
+                    hits.append((file_name, line_number, category))
+    return hits
+
+def bench_matcher(args):
+    words = make_words(5000)
+    error_patterns = make_error_patterns(words, args.categories, args.patterns_per_category)
+    number_of_patterns = sum(len(patterns) for patterns in error_patterns.values())
+
+    with tempfile.TemporaryDirectory() as namespace_path:
+        log_files = write_synthetic_namespace(namespace_path, words, error_patterns, args.pods, args.containers, args.lines)
+        print(f"{number_of_patterns} patterns, {len(log_files)} log files, {len(log_files) * args.lines} lines")
+
+        legacy_seconds, legacy_hits = timed(legacy_scan, log_files, error_patterns)
+        print_result("any(p in line) loop", legacy_seconds)
+
+        for use_native in (False, True):
+            compile_seconds, matcher = timed(PatternMatcher, error_patterns, use_native)
+            if use_native and not matcher.native:
+                print("pyahocorasick is not installed. Skipping the native matcher.")
+                continue
+            scan_seconds, hits = timed(matcher_scan, log_files, matcher)
+            assert hits == legacy_hits, "Matcher results differ from the any(p in line) loop"
+            name = "PatternMatcher (pyahocorasick)" if use_native else "PatternMatcher (pure Python)"
+            print_result(name, scan_seconds, legacy_seconds)
+            print_result(" - compile", compile_seconds)
+
+
+# Pattern dictionary compiler
+
+def make_object_patterns(words, error_patterns, seed=0):
+    # Each category also gets a regex, a case-insensitive literal and a "not" entry
+    rng = random.Random(seed)
+    object_patterns = {}
+    for category, patterns in error_patterns.items():
+        first_word, second_word = rng.sample(words, 2)
+        object_patterns[category] = patterns + [
+            {"regex": rf"{first_word} \w+ {second_word}"},
+            {"literal": rng.choice(patterns).upper(), "ignore_case": True},
+            {"not": {"regex": rf"^{rng.choice(words)}\b"}},
+        ]
+    return object_patterns
+
+def unfiltered_scan(log_files, error_patterns):
+    # Every entry tested on every line, without prefilter
+    compiled_categories = []
+    for category, patterns in error_patterns.items():
+        entries = [compile_entry(pattern) for pattern in patterns if not (isinstance(pattern, dict) and "not" in pattern)]
+        exclusions = [compile_entry(pattern["not"]) for pattern in patterns if isinstance(pattern, dict) and "not" in pattern]
+        compiled_categories.append((category, entries, exclusions))
+
+    hits = []
+    for file_name in log_files:
+        with open(file_name, "r", encoding="utf-8", errors="ignore") as log_file:
+            for line_number, line in enumerate(log_file, start=1):
+                for category, entries, exclusions in compiled_categories:
+                    if any(entry.matches(line) for entry in entries) and not any(entry.matches(line) for entry in exclusions):
+                        hits.append((file_name, line_number, category))
+                        break
+    return hits
+
+def bench_compiler(args):
+    words = make_words(5000)
+    error_patterns = make_error_patterns(words, args.categories, args.patterns_per_category)
+    object_patterns = make_object_patterns(words, error_patterns)
+
+    with tempfile.TemporaryDirectory() as namespace_path:
+        log_files = write_synthetic_namespace(namespace_path, words, error_patterns, args.pods, args.containers, args.lines)
+        print(f"{args.categories * 3} object entries besides {args.categories * args.patterns_per_category} plain patterns, "
+              f"{len(log_files)} log files, {len(log_files) * args.lines} lines")
+
+        unfiltered_seconds, unfiltered_hits = timed(unfiltered_scan, log_files, object_patterns)
+        print_result("Every entry on every line", unfiltered_seconds)
+        compile_seconds, matcher = timed(PatternMatcher, object_patterns)
+        scan_seconds, hits = timed(matcher_scan, log_files, matcher)
+        assert hits == unfiltered_hits, "Compiled dictionary results differ from testing every entry"
+        print_result("Prefiltered MatchPlan", scan_seconds, unfiltered_seconds)
+        print_result(" - compile", compile_seconds)
+        print(f"Tested on every line: {len(matcher.plan.unfiltered_keys)} entries")
+
+        plain_seconds, _ = timed(matcher_scan, log_files, PatternMatcher(error_patterns))
+        print_result("Plain strings only, for reference", plain_seconds)
+
+        # The matcher with its plan is pickled to each worker
+        serial_results = list(scan_log_files(log_files, matcher, all_categories=True))
+        with spawn_start_method():
+            spawn_seconds, spawn_results = timed(lambda: list(scan_log_files(log_files, matcher, 2, all_categories=True)))
+        assert spawn_results == serial_results, "Results of 2 spawned workers differ from the serial scan"
+        print_result("Prefiltered MatchPlan, 2 spawned workers", spawn_seconds)
+
+
+# Level prefilter
+
+def drop_low_level_records(scan_results, matcher, level_filter):
+    # The unfiltered results without the records of the lines below the minimum level of their category
+    kept_results = []
+    for file_name, records in scan_results:
+        kept_records = []
+        for line_number, category, line in records:
+            excluded = level_filter.get_excluded_indexes(line)
+            if not excluded or matcher.categories.index(category) not in excluded:
+                kept_records.append((line_number, category, line))
+        kept_results.append((file_name, kept_records))
+    return kept_results
+
+def bench_levels(args):
+    words = make_words(5000)
+    error_patterns = make_error_patterns(words, args.categories, args.patterns_per_category)
+
+    with tempfile.TemporaryDirectory() as namespace_path:
+        log_files = write_synthetic_namespace(namespace_path, words, error_patterns, args.pods, args.containers, args.lines, args.hit_ratio)
+        print(f"{len(log_files)} log files, {len(log_files) * args.lines} lines, minimum level {args.min_level}")
+
+        for use_native in (False, True):
+            matcher = PatternMatcher(error_patterns, use_native)
+            if use_native and not matcher.native:
+                print("pyahocorasick is not installed. Skipping the native matcher.")
+                continue
+            level_filter = LevelFilter(matcher.categories, args.min_level)
+            name = "pyahocorasick" if use_native else "pure Python"
+
+            full_seconds, full_results = timed(lambda: list(scan_log_files(log_files, matcher, all_categories=True, scan_mode="text")))
+            print_result(f"Every line ({name})", full_seconds)
+            seconds, results = timed(lambda: list(scan_log_files(log_files, matcher, all_categories=True, scan_mode="text", level_filter=level_filter)))
+            assert [(file_name, list(records)) for file_name, records in results] == drop_low_level_records(full_results, matcher, level_filter), \
+                "Level filter results differ from dropping the records afterwards"
+            print_result(f"Level filter ({name})", seconds, full_seconds)
+
+        lines_skipped = sum(records.lines_skipped for _, records in results)
+        print(f"{lines_skipped} of {sum(records.lines for _, records in results)} lines skipped for their level")
+
+
+# Parallel scanning
+
+def bench_workers(args):
+    words = make_words(5000)
+    error_patterns = make_error_patterns(words, args.categories, args.patterns_per_category)
+    matcher = PatternMatcher(error_patterns)
+    max_workers = args.max_workers or os.cpu_count() or 1
+    worker_counts = sorted(set([1] + [2 ** i for i in range(1, max_workers.bit_length())] + [max_workers]))
+
+    with tempfile.TemporaryDirectory() as namespace_path:
+        log_files = write_synthetic_namespace(namespace_path, words, error_patterns, args.pods, args.containers, args.lines)
+        print(f"{len(log_files)} log files, {len(log_files) * args.lines} lines, {os.cpu_count()} CPUs")
+
+        serial_seconds = None
+        serial_results = None
+        for workers in worker_counts:
+            seconds, results = timed(lambda: list(scan_log_files(log_files, matcher, workers, all_categories=True)))
+            if serial_results is None:
+                serial_seconds, serial_results = seconds, results
+            assert results == serial_results, f"Results with {workers} workers differ from the serial scan"
+            print_result(f"{workers} worker(s)", seconds, serial_seconds if workers > 1 else None)
+
+
+# Error aggregation
+
+class LegacyErrorInfoHolder:
+    # ErrorInfoHolder.add_error before the per category index, without the stray print()
+    def __init__(self):
+        self.errors = {}
+        self.seen_messages = {}
+
+    def add_error(self, error_info):
+        dedup_key = f"{normalize_logs(error_info.message)}_{error_info.file_name}"
+        existing = self.seen_messages.get(dedup_key)
+        if not existing or error_info.timestamp > existing[0]:
+            self.seen_messages[dedup_key] = (error_info.timestamp, error_info)
+        self.errors[error_info.category] = [entry[1] for entry in self.seen_messages.values() if entry[1].category == error_info.category]
+
+def make_error_infos(number_of_matches, number_of_messages, number_of_files, number_of_categories, seed=0):
+    rng = random.Random(seed)
+    error_infos = []
+    for i in range(number_of_matches):
+        message_id = rng.randrange(number_of_messages)
+        file_name = f"logs/sas-synthetic-{rng.randrange(number_of_files)}-abcde_main.log"
+        error_infos.append(ErrorInfo(f"2025-01-21 04:{(i // 60) % 60:02d}:{i % 60:02d}", f"Synthetic warning number {message_id}",
+                                     f"Synthetic Category {message_id % number_of_categories}", "main", file_name, i + 1))
+    return error_infos
+
+def fill_holder(holder, error_infos):
+    for error_info in error_infos:
+        holder.add_error(error_info)
+    return holder
+
+def bench_holder(args):
+    error_infos = make_error_infos(args.matches, args.messages, args.files, args.categories)
+    print(f"{args.matches} matches, {args.messages} distinct messages, {args.files} files")
+
+    seconds, holder = timed(fill_holder, ErrorInfoHolder(None), error_infos)
+    view_seconds, errors = timed(lambda: holder.errors)
+    print_result("ErrorInfoHolder.add_error", seconds)
+    print_result(" - build category lists", view_seconds)
+
+    legacy_infos = error_infos[:args.legacy_matches]
+    legacy_seconds, _ = timed(fill_holder, LegacyErrorInfoHolder(), legacy_infos)
+    print_result(f"Legacy add_error ({len(legacy_infos)} matches)", legacy_seconds)
+    per_match = seconds / len(error_infos)
+    legacy_per_match = legacy_seconds / len(legacy_infos)
+    print(f"Per match: {per_match * 1e6:.1f}us against {legacy_per_match * 1e6:.1f}us ({legacy_per_match / per_match:.0f}x)")
+
+
+# Message cleaning
+
+LEGACY_CLEANER_PATTERNS = {
+    "ip_address": (cleaner.IP_ADDRESS_PATTERN, "IP_ADDRESS"),
+    "port": (cleaner.PORT_PATTERN, ":PORT"),
+    "job_number": (cleaner.JOB_NUMBER_PATTERN, 'The job "JOB_NUMBER" has been terminated through the REST API'),
+    "job_id": (cleaner.JOB_ID_PATTERN, "job ID 'JOB_ID'"),
+    "pod_id": (cleaner.POD_ID_PATTERN, "-POD_ID-"),
+    "job_id_after_pod_id": (cleaner.JOB_ID_PATTERN_AFTER_POD_ID, "-POD_ID-JOB_ID"),
+}
+
+def legacy_clean_and_normalize(message):
+    # clean_log + normalize_logs before the compiled cleaner passes
+    cleaners = [LEGACY_CLEANER_PATTERNS[key] for key, value in cleaner.conf.get("cleaner", {}).items() if value is True]
+    for pattern, replacement in cleaners:
+        message = re.sub(pattern, replacement, message)
+    normalized = re.sub(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}", "DATETIME", message)
+    normalized = re.sub(r"\s+", " ", normalized)
+    return message, normalized.strip()
+
+def clean_and_normalize(message):
+    message = cleaner.clean_log(message)
+    return message, cleaner.normalize_logs(message)
+
+def clean_and_normalize_uncached(message):
+    message = cleaner.clean_log_uncached(message)
+    return message, cleaner.normalize_logs.__wrapped__(message)
+
+def make_messages(number_of_messages, number_of_distinct_messages, seed=0):
+    rng = random.Random(seed)
+    templates = [
+        "Request timed out talking to {ip}:{port} after 30s",
+        "The job \"{job}\" has been terminated through the REST API.",
+        "Launcher job ID '{job}' failed on sas-launcher-{uuid}-{job_short}\"",
+        "no ready CAS servers, so cas-control is not ready",
+        "Connection refused at {ip}:{port}  while   calling 2025-01-21 04:42:31 endpoint",
+        "Waiting for {job_short} seconds for Commonfiles POD(s) to Complete.",
+    ]
+    distinct_messages = []
+    for _ in range(number_of_distinct_messages):
+        distinct_messages.append(rng.choice(templates).format(
+            ip=".".join(str(rng.randint(0, 255)) for _ in range(4)), port=rng.randint(1, 65535), job=rng.randint(1, 10 ** 6),
+            job_short=rng.randint(0, 9999), uuid="-".join("".join(rng.choices("0123456789abcdef", k=k)) for k in (8, 4, 4, 4, 12))))
+    return [rng.choice(distinct_messages) for _ in range(number_of_messages)]
+
+def bench_cleaner(args):
+    for name, number_of_distinct_messages in (("repeated messages", args.distinct), ("unique messages", args.messages)):
+        messages = make_messages(args.messages, number_of_distinct_messages)
+        print(f"\n{args.messages} messages, {len(set(messages))} distinct ({name})")
+        cleaner.clean_log.cache_clear()
+        cleaner.normalize_logs.cache_clear()
+
+        legacy_seconds, legacy_results = timed(lambda: [legacy_clean_and_normalize(message) for message in messages])
+        print_result("Legacy clean_log + normalize_logs", legacy_seconds)
+        seconds, results = timed(lambda: [clean_and_normalize_uncached(message) for message in messages])
+        assert results == legacy_results, "Compiled cleaner results differ from the legacy cleaner"
+        print_result("Compiled passes", seconds, legacy_seconds)
+        seconds, results = timed(lambda: [clean_and_normalize(message) for message in messages])
+        assert results == legacy_results, "Memoized cleaner results differ from the legacy cleaner"
+        print_result("Compiled passes + memoization", seconds, legacy_seconds)
+
+
+# JSON decoding
+
+def bench_json(args):
+    words = make_words(5000)
+    error_patterns = make_error_patterns(words, 30, 20)
+    lines = [line.strip() for line in make_log_lines(words, error_patterns, args.lines, hit_ratio=0.05)]
+    print(f"{len(lines)} Viya JSON log lines, JSON backend in use: {json_backend.select_json_backend()}")
+
+    def get_fields(log_json):
+        return tuple(log_json.get(field) for field in json_backend.VIYA_LOG_FIELDS)
+
+    stdlib_seconds, expected = timed(lambda: [get_fields(json.loads(line)) for line in lines])
+    print_result("json.loads", stdlib_seconds)
+
+    decoders = []
+    if json_backend.orjson is not None:
+        decoders.append(("orjson.loads", json_backend.orjson.loads))
+    if json_backend.msgspec is not None:
+        decoders.append(("msgspec generic decoder", json_backend.msgspec_decoder.decode))
+        decoders.append(("msgspec ViyaLogFields decoder", lambda line: {
+            field: getattr(log_fields, field) for field in json_backend.VIYA_LOG_FIELDS
+        } if (log_fields := json_backend.viya_log_decoder.decode(line)) else None))
+    decoders.append(("json_backend.decode_log_fields", json_backend.decode_log_fields))
+    if len(decoders) == 1:
+        print("Neither orjson nor msgspec is installed, json_backend uses json.loads.")
+
+    for name, decode in decoders:
+        seconds, results = timed(lambda: [get_fields(decode(line)) for line in lines])
+        assert results == expected, f"{name} fields differ from json.loads"
+        print_result(name, seconds, stdlib_seconds)
+
+
+# Large log files
+
+def bench_mmap(args):
+    words = make_words(5000)
+    error_patterns = make_error_patterns(words, args.categories, args.patterns_per_category)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log_file_path = os.path.join(temp_dir, "sas-synthetic-0-abcde_container-0.log")
+        with open(log_file_path, "w", encoding="utf-8") as log_file:
+            for block in range(args.lines // 10000 + 1):
+                log_file.writelines(make_log_lines(words, error_patterns, min(10000, args.lines - block * 10000), args.hit_ratio, seed=block))
+        print(f"One log file of {os.path.getsize(log_file_path) / 1024 / 1024:.0f} MB, {args.lines} lines, {args.hit_ratio:.2%} matching lines")
+
+        results = {}
+        for native in (True, False):
+            matcher = PatternMatcher(error_patterns, use_native=native)
+            if native and not matcher.native:
+                continue
+            print(f"\n{'pyahocorasick' if native else 'Pure Python'} matcher")
+            for name, scan in (("Text scan", scan_log_file_text), ("mmap scan", scan_log_file_mmap)):
+                seconds, records = timed(scan, log_file_path, matcher)
+                results.setdefault(native, records)
+                assert records == results[native], f"{name} records differ from the text scan"
+                # Measured in a second run, tracemalloc slows the scan down
+                tracemalloc.start()
+                scan(log_file_path, matcher)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print_result(f"{name} (peak {peak / 1024 / 1024:.0f} MB allocated)", seconds, None if name == "Text scan" else text_seconds)
+                if name == "Text scan":
+                    text_seconds = seconds
+
+# Batch mode
+
+def write_synthetic_case(case_path, words, error_patterns, number_of_pods, lines_per_file, hit_ratio):
+    # One namespace, every other pod in Error so both the pods with and without errors are analyzed
+    namespace_path = os.path.join(case_path, "kubernetes", "synthetic")
+    write_synthetic_namespace(namespace_path, words, error_patterns, number_of_pods, 1, lines_per_file, hit_ratio)
+    for folder in ("get", "describe"):
+        os.makedirs(os.path.join(namespace_path, folder), exist_ok=True)
+    open(os.path.join(namespace_path, "describe", "pods.txt"), "w").close()
+    with open(os.path.join(namespace_path, "get", "pods.txt"), "w", encoding="utf-8") as pods_file:
+        pods_file.write("NAME READY STATUS RESTARTS AGE IP NODE NOMINATED NODE READINESS GATES\n")
+        for pod in range(number_of_pods):
+            ready, status = ("0/1", "Error") if pod % 2 else ("1/1", "Running")
+            pods_file.write(f"sas-synthetic-{pod}-abcde   {ready}   {status}   0   21h   10.244.0.4   aks-node-1   <none>   <none>\n")
+    return case_path
+
+def get_comparable_summaries(batch_summary):
+    # Without the timings and the report paths, which hold the time and the batch index
+    return [{key: value for key, value in summary.items() if key not in ("seconds", "report_path", "all_errors_path")}
+            for summary in batch_summary["namespaces"]]
+
+def bench_batch(args):
+    words = make_words(5000)
+    error_patterns = make_error_patterns(words, args.categories, args.patterns_per_category)
+    object_patterns = make_object_patterns(words, error_patterns)
+    conf["user_activity_url"] = get_dead_url()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cases = [write_synthetic_case(os.path.join(temp_dir, f"CS{1000000 + case}_20250910_163413"), words, error_patterns, args.pods, args.lines,
+                                      args.hit_ratio) for case in range(args.cases)]
+        print(f"{args.cases} cases of {args.pods} pods, object entries in every category")
+        # Reports and logs go to the output folder of the current one, the spawned workers read conf.json there
+        if os.path.exists("conf.json"):
+            shutil.copy("conf.json", temp_dir)
+        cwd = os.getcwd()
+        os.chdir(temp_dir)
+        try:
+            serial_seconds, serial_summary = timed(run_batch, cases, object_patterns, None, 1, "text", False, "serial_summary.json")
+            with spawn_start_method():
+                seconds, spawned_summary = timed(run_batch, cases, object_patterns, None, args.workers, "text", False, "spawned_summary.json")
+            # Its pending file is relative to the current folder
+            get_activity_tracker().close()
+        finally:
+            os.chdir(cwd)
+
+    assert all(summary["status"] == "ok" for summary in spawned_summary["namespaces"]), "A namespace failed in a spawned worker"
+    assert any(summary["pods_with_errors"] for summary in serial_summary["namespaces"]), "No pod with errors to compare"
+    assert get_comparable_summaries(spawned_summary) == get_comparable_summaries(serial_summary), \
+        f"Summaries of {args.workers} spawned workers differ from the serial batch"
+    print_result("Serial batch", serial_seconds)
+    print_result(f"{args.workers} spawned workers", seconds, serial_seconds)
+
+
+# Time window
+
+def write_time_ordered_log(log_file_path, words, error_patterns, number_of_lines, hit_ratio, start_time):
+    # make_log_lines with one second between lines, so the file is in time order
+    with open(log_file_path, "w", encoding="utf-8") as log_file:
+        for block in range(number_of_lines // 10000 + 1):
+            lines = make_log_lines(words, error_patterns, min(10000, number_of_lines - block * 10000), hit_ratio, seed=block)
+            for i, line in enumerate(lines):
+                line_time = start_time + timedelta(seconds=block * 10000 + i)
+                log_file.write(re.sub(r'"timeStamp": "[^"]+"', f'"timeStamp": "{line_time.isoformat()}"', line))
+
+def bench_window(args):
+    words = make_words(5000)
+    error_patterns = make_error_patterns(words, args.categories, args.patterns_per_category)
+    matcher = PatternMatcher(error_patterns)
+    start_time = datetime(2025, 1, 21, tzinfo=timezone.utc)
+    since = start_time + timedelta(seconds=int(args.lines * (1 - args.window_ratio)))
+    time_window = TimeWindow(since, since + timedelta(seconds=int(args.lines * args.window_ratio) - 1))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log_file_path = os.path.join(temp_dir, "sas-synthetic-0-abcde_container-0.log")
+        write_time_ordered_log(log_file_path, words, error_patterns, args.lines, args.hit_ratio, start_time)
+        print(f"One log file of {os.path.getsize(log_file_path) / 1024 / 1024:.0f} MB, {args.lines} lines, window of the last {args.window_ratio:.1%}")
+
+        full_seconds, full_results = timed(lambda: list(scan_log_files([log_file_path], matcher, all_categories=True, scan_mode="text")))
+        print_result("Every line, filtered afterwards", full_seconds)
+        seconds, results = timed(lambda: list(scan_log_files([log_file_path], matcher, all_categories=True, time_window=time_window)))
+        expected = [record for record in full_results[0][1] if not time_window.is_before(read_line_time(record[2]))
+                    and not time_window.is_after(read_line_time(record[2]))]
+        assert list(results[0][1]) == expected, "Time window records differ from filtering the full scan"
+        # Measured in a second run, tracemalloc slows the scan down
+        tracemalloc.start()
+        list(scan_log_files([log_file_path], matcher, all_categories=True, time_window=time_window))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print_result(f"Binary search on the time window (peak {peak / 1024 / 1024:.0f} MB allocated)", seconds, full_seconds)
+        print(f"{len(expected)} of {len(full_results[0][1])} records inside the window")
+
+
+# Compressed bundles
+
+def extract_and_scan(archive_path, extract_dir, matcher, workers):
+    # What the README used to ask for: decompress the whole bundle, then analyze the folder
+    if archive_path.endswith(".zip"):
+        with zipfile.ZipFile(archive_path) as zip_file:
+            zip_file.extractall(extract_dir)
+    else:
+        with tarfile.open(archive_path) as tar_file:
+            tar_file.extractall(extract_dir)
+    return scan_bundle_logs(os.path.join(extract_dir, "logs"), matcher, workers)
+
+def scan_bundle_logs(logs_dir, matcher, workers):
+    log_files = sorted(log_file for log_files in build_log_index(logs_dir).values() for log_file in log_files)
+    return [(os.path.basename(file_name), records) for file_name, records in scan_log_files(log_files, matcher, workers, all_categories=True)]
+
+def bench_bundle(args):
+    words = make_words(5000)
+    error_patterns = make_error_patterns(words, args.categories, args.patterns_per_category)
+    matcher = PatternMatcher(error_patterns)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        namespace_path = os.path.join(temp_dir, "namespace")
+        log_files = write_synthetic_namespace(namespace_path, words, error_patterns, args.pods, args.containers, args.lines)
+        print(f"{len(log_files)} log files, {len(log_files) * args.lines} lines, {args.workers} worker(s)")
+
+        for extension in (".tgz", ".zip"):
+            archive_path = os.path.join(temp_dir, f"bundle{extension}")
+            if extension == ".zip":
+                with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+                    for log_file in log_files:
+                        zip_file.write(log_file, os.path.relpath(log_file, namespace_path))
+            else:
+                with tarfile.open(archive_path, "w:gz") as tar_file:
+                    tar_file.add(os.path.join(namespace_path, "logs"), "logs")
+
+            print(f"\n{extension} bundle, {os.path.getsize(archive_path) / 1024 / 1024:.1f} MB")
+            extract_dir = os.path.join(temp_dir, f"extracted{extension}")
+            extract_seconds, expected = timed(extract_and_scan, archive_path, extract_dir, matcher, args.workers)
+            print_result("Extract, then scan the folder", extract_seconds)
+            seconds, results = timed(scan_bundle_logs, os.path.join(archive_path, "logs"), matcher, args.workers)
+            assert results == expected, f"Results read from the {extension} bundle differ from the extracted folder"
+            print_result("Scan straight from the bundle", seconds, extract_seconds)
+
+
+# Scan cache
+
+def bench_cache(args):
+    words = make_words(5000)
+    error_patterns = make_error_patterns(words, args.categories, args.patterns_per_category)
+    matcher = PatternMatcher(error_patterns)
+
+    with tempfile.TemporaryDirectory() as namespace_path:
+        log_files = write_synthetic_namespace(namespace_path, words, error_patterns, args.pods, args.containers, args.lines)
+        print(f"{len(log_files)} log files, {len(log_files) * args.lines} lines")
+
+        uncached_seconds, expected = timed(lambda: list(scan_log_files(log_files, matcher, all_categories=True)))
+        print_result("No cache", uncached_seconds)
+
+        with ScanCache(os.path.join(namespace_path, "scan_cache.sqlite")) as scan_cache:
+            for name in ("First run (fills the cache)", "Second run (unchanged files)"):
+                seconds, results = timed(lambda: list(scan_log_files(log_files, matcher, all_categories=True, scan_cache=scan_cache)))
+                assert results == expected, f"{name} results differ from the uncached scan"
+                print_result(name, seconds, uncached_seconds)
+
+            # A personal dictionary: a few patterns added and removed, and the categories reordered
+            changed_patterns = {category: patterns[1:] for category, patterns in reversed(list(error_patterns.items()))}
+            changed_patterns["Added Category"] = [" ".join(random.Random(1).choices(words, k=2)) for _ in range(args.added_patterns)]
+            changed_matcher = PatternMatcher(changed_patterns)
+            full_seconds, expected = timed(lambda: list(scan_log_files(log_files, changed_matcher, all_categories=True)))
+            print_result(f"Changed dictionary, no cache", full_seconds)
+            seconds, results = timed(lambda: list(scan_log_files(log_files, changed_matcher, all_categories=True, scan_mode="auto", scan_cache=scan_cache)))
+            assert results == expected, "Incremental results differ from the uncached scan"
+            print_result(f"Changed dictionary, {args.added_patterns} patterns scanned", seconds, full_seconds)
+            print(f"Cache size: {scan_cache.total_size / 1024 / 1024:.1f} MB")
+
+
+# Findings export
+
+def export_findings_streaming(findings_path, pod, findings):
+    with NdjsonFindingsWriter(findings_path, "synthetic") as findings_writer:
+        for file_name, line_number, category, log_record in findings:
+            findings_writer.add(pod, file_name, line_number, category, log_record)
+
+def export_findings_in_memory(findings_path, pod, findings):
+    # Every finding kept in a list and written once with json.dump, like all_errors.json
+    rows = []
+    for file_name, line_number, category, log_record in findings:
+        message = cleaner.clean_log(log_record.display_message)
+        rows.append(dict(zip(FINDING_FIELDS, ("synthetic", pod.name, pod.status, pod.node, "main", category, log_record.timestamp, message,
+                                              normalize_logs(message), file_name, line_number))))
+    with open(findings_path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+
+def bench_export(args):
+    words = make_words(5000)
+    error_patterns = make_error_patterns(words, 30, 20)
+    log_records = [parse_log_line(line) for line in make_log_lines(words, error_patterns, 10000, hit_ratio=1)]
+    findings = [(f"logs/sas-synthetic-{i % 300}-abcde_main.log", i + 1, f"Synthetic Category {i % 30}", log_records[i % len(log_records)])
+                for i in range(args.findings)]
+    pod = PodInfo("sas-synthetic-0-abcde", "No Issues", "aks-node-1", "synthetic", log_index={})
+    print(f"{args.findings} findings")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        baseline_seconds = None
+        for name, export in (("json.dump of a list", export_findings_in_memory), ("Streaming NDJSON", export_findings_streaming)):
+            findings_path = os.path.join(temp_dir, name)
+            seconds, _ = timed(export, findings_path, pod, findings)
+            # Measured in a second run, tracemalloc slows the export down
+            tracemalloc.start()
+            export(findings_path, pod, findings)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print_result(f"{name} (peak {peak / 1024 / 1024:.0f} MB allocated, {os.path.getsize(findings_path) / 1024 / 1024:.0f} MB file)",
+                         seconds, baseline_seconds)
+            baseline_seconds = baseline_seconds or seconds
+
+
+# Telemetry and .env download against a local stand-in of the tracking server
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # /ok answers at once, /slow only after delay_seconds, /partial sends half of the body and stalls for delay_seconds.
+    # received: the paths of the posts, in order.
+    delay_seconds = 0
+    received = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        StandInHandler.received.append(self.path)
+        self.answer()
+
+    def do_GET(self):
+        self.answer()
+
+    def answer(self):
+        if self.path.startswith("/slow"):
+            time.sleep(self.delay_seconds)
+        body = b"MONGODB_URI=mongodb://localhost\n"
+        try:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.path.startswith("/partial"):
+                self.wfile.write(body[:len(body) // 2])
+                self.wfile.flush()
+                time.sleep(self.delay_seconds)
+            self.wfile.write(body)
+        except OSError:
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+# record() only queues the payload, close() waits at most the exit wait
+RECORD_MAX_SECONDS = 0.05
+EXIT_WAIT_MARGIN_SECONDS = 0.5
+
+def get_dead_url():
+    # A port that was just free, nothing listens on it
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    port = server.server_address[1]
+    server.server_close()
+    return f"http://127.0.0.1:{port}/record"
+
+def bench_telemetry(args):
+    StandInHandler.delay_seconds = args.delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    conf.setdefault("network", {}).update({"connect_timeout_seconds": args.timeout, "read_timeout_seconds": args.timeout})
+    print(f"Server delay {args.delay}s, request timeouts {args.timeout}s, exit wait {args.exit_wait}s")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, url in (("Responsive server", f"{base_url}/ok/record"), ("Slow server", f"{base_url}/slow/record"), ("Dead server", get_dead_url())):
+            pending_path = os.path.join(temp_dir, f"{name}.json")
+            tracker = ActivityTracker(url, pending_path, exit_wait_seconds=args.exit_wait)
+            record_times = [timed(tracker.record, {"user": "synthetic", "namespace_path": str(i)})[0] for i in range(args.records)]
+            close_seconds, _ = timed(tracker.close)
+            pending = len(json.load(open(pending_path))) if os.path.exists(pending_path) else 0
+            print_result(f"{name}: {args.records} records queued", sum(record_times))
+            print_result(f"{name}: exit, {pending} records kept for the next run", close_seconds)
+            assert max(record_times) < RECORD_MAX_SECONDS, f"{name}: record() blocked for {max(record_times):.3f}s"
+            assert close_seconds < args.exit_wait + EXIT_WAIT_MARGIN_SECONDS, f"{name}: close() took {close_seconds:.3f}s, exit wait {args.exit_wait}s"
+            if name == "Responsive server":
+                assert pending == 0, f"{name}: {pending} records were not sent"
+                continue
+            # Past the size of the queue, records are dropped
+            kept = min(args.records, tracker.max_queue_size)
+            assert pending == kept, f"{name}: {pending} of {kept} undelivered records kept for the next run"
+
+            # The next run sends them once the server is back
+            retry_path = f"/ok/retry/{len(StandInHandler.received)}"
+            next_tracker = ActivityTracker(f"{base_url}{retry_path}", pending_path, exit_wait_seconds=args.exit_wait)
+            next_tracker.close()
+            sent = StandInHandler.received.count(retry_path)
+            print(f"{name}: {sent} kept records sent on the next start")
+            assert sent == kept and not os.path.exists(pending_path), f"{name}: {sent} of {kept} kept records sent on the next start"
+
+        # get_env_file writes .env to the current folder, which must not be the temporary one when it is removed
+        conf["network"]["env_file_wait_seconds"] = args.env_wait
+        cwd = os.getcwd()
+        os.chdir(temp_dir)
+        try:
+            for name, url in (("Slow server", f"{base_url}/slow/.env"), ("Stalled download", f"{base_url}/partial/.env"), ("Dead server", get_dead_url())):
+                conf["mongodb_conn_var_url"] = url
+                utils.env_file_download = None
+                start_seconds, _ = timed(utils.start_env_file_download)
+                wait_seconds, error = timed(wait_for_download)
+                print_result(f".env download, {name}: started", start_seconds)
+                print_result(f".env download, {name}: gave up ({error})", wait_seconds)
+                assert start_seconds < RECORD_MAX_SECONDS, f"{name}: starting the .env download blocked for {start_seconds:.3f}s"
+                assert error != "done", f"{name}: the .env download did not fail"
+                assert wait_seconds < args.env_wait + EXIT_WAIT_MARGIN_SECONDS, \
+                    f"{name}: wait_for_env_file took {wait_seconds:.3f}s, env_file_wait_seconds {args.env_wait}s"
+                # The download goes on after the wait gave up, until the request times out
+                utils.env_file_download.exception(timeout=2 * args.timeout + EXIT_WAIT_MARGIN_SECONDS)
+                assert not os.path.exists(".env") and not os.path.exists(".env.part"), f"{name}: the failed download left {os.listdir('.')}"
+        finally:
+            os.chdir(cwd)
+    server.shutdown()
+
+def wait_for_download():
+    try:
+        utils.wait_for_env_file()
+    except Exception as e:
+        return type(e).__name__
+    return "done"
+
+
+# MongoDB pattern dictionaries
+
+class SlowCollection:
+    # A mongomock collection where every call takes latency_seconds, like a round trip to the remote cluster
+    def __init__(self, collection, latency_seconds):
+        self.collection = collection
+        self.latency_seconds = latency_seconds
+        self.round_trips = 0
+
+    def __getattr__(self, name):
+        attribute = getattr(self.collection, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            self.round_trips += 1
+            time.sleep(self.latency_seconds)
+            return attribute(*args, **kwargs)
+        return call
+
+def make_slow_mongo(client, latency_seconds):
+    mongo = MongoHandler("mongodb://stand-in", client=client)
+    mongo.shared_config = SlowCollection(mongo.shared_config, latency_seconds)
+    mongo.user_config = SlowCollection(mongo.user_config, latency_seconds)
+    return mongo
+
+def run_main_dictionary_calls(mongo, user_id):
+    # The MongoDB calls of main() for a user that keeps their patterns
+    error_patterns = mongo.get_default_error_patterns()
+    mongo.update_user_patterns("default", error_patterns)
+    mongo.get_all_users()
+    if mongo.user_exists(user_id):
+        error_patterns = mongo.get_user_patterns(user_id)
+    mongo.update_user_patterns(user_id, error_patterns)
+    return mongo.get_user_patterns(user_id)
+
+def bench_mongodb(args):
+    if mongomock is None:
+        print("mongomock is not installed, it stands in for the remote cluster: pip install mongomock")
+        return
+    client = mongomock.MongoClient()
+    seed_mongo = MongoHandler("mongodb://stand-in", client=client)
+    seed_mongo.update_error_patterns(conf["log_error_patterns"])
+    for user in range(args.users):
+        seed_mongo.update_user_patterns(f"synthetic-user-{user}", conf["log_error_patterns"])
+    user_id = "synthetic-user-0"
+    print(f"{args.users} users, {args.latency * 1000:.0f}ms per round trip")
+
+    def count_round_trips(mongo):
+        return mongo.shared_config.round_trips + mongo.user_config.round_trips
+
+    mongo = make_slow_mongo(client, args.latency)
+    baseline_seconds, expected = timed(run_main_dictionary_calls, mongo, user_id)
+    print_result(f"MongoHandler ({count_round_trips(mongo)} round trips)", baseline_seconds)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        snapshot_path = os.path.join(temp_dir, "mongodb_snapshot.json")
+        for name in ("CachedMongoHandler, no snapshot", "CachedMongoHandler, snapshot up to date"):
+            mongo = make_slow_mongo(client, args.latency)
+            seconds, results = timed(lambda: run_main_dictionary_calls(CachedMongoHandler(mongo, snapshot_path), user_id))
+            assert results == expected, f"{name} returns other patterns than MongoHandler"
+            print_result(f"{name} ({count_round_trips(mongo)} round trips)", seconds, baseline_seconds)
+
+        seconds, results = timed(lambda: run_main_dictionary_calls(CachedMongoHandler(None, snapshot_path), user_id))
+        assert results == expected, "The offline snapshot returns other patterns than MongoHandler"
+        print_result("CachedMongoHandler, offline", seconds, baseline_seconds)
+
+        # Another client promotes a pattern after the snapshot was taken, without incrementing the version like older releases
+        mongo = CachedMongoHandler(MongoHandler("mongodb://stand-in", client=client), snapshot_path)
+        seed_mongo.add_error_pattern("Synthetic", "Disk quota exceeded on volume")
+        mongo.add_error_patterns(promote_user_patterns({"Synthetic": ["Certificate chain could not be verified"]}, mongo.get_live_default_error_patterns()))
+        assert seed_mongo.get_default_error_patterns()["Synthetic"] == ["Disk quota exceeded on volume", "Certificate chain could not be verified"], \
+            "The promotion lost the pattern promoted by another client"
+        assert mongo.get_default_error_patterns() == seed_mongo.get_default_error_patterns(), "The snapshot misses the promoted patterns"
+        print("Concurrent promotions are both kept")
+
+
+# Promotion of user patterns to the default dictionary
+
+def legacy_promote_user_patterns(user_patterns, default_patterns):
+    # The loop main() used, every user pattern against every default pattern
+    from thefuzz import fuzz
+    new_patterns_added = []
+    for category, patterns in user_patterns.items():
+        for pattern in patterns:
+            if any(fuzz.ratio(pattern, default_pattern) >= SIMILARITY_THRESHOLD for default_patterns_list in default_patterns.values()
+                   for default_pattern in default_patterns_list):
+                continue
+            default_patterns.setdefault(category, []).append(pattern)
+            new_patterns_added.append((category, pattern))
+    return new_patterns_added
+
+def mutate_pattern(pattern, number_of_edits, rng):
+    characters = list(pattern)
+    for _ in range(number_of_edits):
+        position = rng.randrange(len(characters))
+        edit = rng.choice(("replace", "insert", "delete"))
+        if edit == "replace":
+            characters[position] = rng.choice(string.ascii_lowercase)
+        elif edit == "insert":
+            characters.insert(position, rng.choice(string.ascii_lowercase))
+        elif len(characters) > 1:
+            del characters[position]
+    return "".join(characters)
+
+def make_user_patterns(words, default_patterns, number_of_patterns, seed=0):
+    # Half are copies of default patterns with a few edits, around the threshold, the rest are new patterns
+    rng = random.Random(seed)
+    all_patterns = [pattern for patterns in default_patterns.values() for pattern in patterns]
+    user_patterns = {}
+    for i in range(number_of_patterns):
+        if i % 2:
+            pattern = rng.choice(all_patterns)
+            pattern = mutate_pattern(pattern, rng.randint(0, max(1, len(pattern) // 4)), rng)
+        else:
+            pattern = " ".join(rng.choices(words, k=rng.randint(3, 10)))
+        user_patterns.setdefault(f"Synthetic Category {rng.randrange(60)}", []).append(pattern)
+    return user_patterns
+
+def bench_promotion(args):
+    words = make_words(2000)
+    rng = random.Random(0)
+    default_patterns = {
+        f"Synthetic Category {category}": [" ".join(rng.choices(words, k=rng.randint(3, 10))) for _ in range(args.default_patterns // 50)]
+        for category in range(50)
+    }
+    user_patterns = make_user_patterns(words, default_patterns, args.user_patterns)
+    print(f"{sum(len(patterns) for patterns in default_patterns.values())} default patterns, {args.user_patterns} user patterns")
+
+    legacy_dict = json.loads(json.dumps(default_patterns))
+    legacy_seconds, legacy_added = timed(legacy_promote_user_patterns, user_patterns, legacy_dict)
+    print_result("thefuzz against every default pattern", legacy_seconds)
+    indexed_dict = json.loads(json.dumps(default_patterns))
+    seconds, added = timed(promote_user_patterns, user_patterns, indexed_dict)
+    print_result("PatternSimilarityIndex", seconds, legacy_seconds)
+
+    assert added == legacy_added, "Promoted patterns differ from the thefuzz loop"
+    assert json.dumps(indexed_dict) == json.dumps(legacy_dict), "Default dictionary differs from the thefuzz loop"
+    print(f"Same {len(added)} patterns promoted, {args.user_patterns - len(added)} rejected as near duplicates")
+
+
+# Start up time
+
+# Only needed on some code paths, importing main must not import them
+LAZY_MODULES = ["inflect", "requests", "pymongo", "certifi", "dotenv", "thefuzz", "rapidfuzz", "prompt_toolkit", "pyarrow"]
+
+def measure_imports(module_name):
+    # Returns {module: cumulative import time in us} from python -X importtime in a fresh interpreter
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module_name}"], capture_output=True, text=True,
+                               env={**os.environ, "PYTHONPATH": src_dir})
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module_name} failed:\n{completed.stderr}")
+    import_times = {}
+    for line in completed.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line and "cumulative" not in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            # A module is listed after the modules it imports, the ones listed before the import of module_name
+            # belong to the interpreter start up (site, sitecustomize, ...)
+            if not name.startswith("  ") and name.strip() != module_name:
+                import_times = {}
+                continue
+            import_times[name.strip()] = int(cumulative)
+    return import_times
+
+def bench_imports(args):
+    runs = [measure_imports(args.module) for _ in range(args.runs)]
+    import_times = min(runs, key=lambda run: run[args.module])
+    total_ms = import_times[args.module] / 1000
+    print(f"import {args.module}: {total_ms:.0f}ms (fastest of {args.runs} runs)")
+    for name, cumulative in sorted(import_times.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {name:<40} {cumulative / 1000:8.1f}ms")
+
+    failures = [f"{name} is imported at start up" for name in LAZY_MODULES if name in import_times]
+    if args.max_ms and total_ms > args.max_ms:
+        failures.append(f"import {args.module} took {total_ms:.0f}ms, more than {args.max_ms}ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+def main():
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Benchmarks for auto_k8s_info on synthetic data.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    matcher_parser = subparsers.add_parser("matcher", help="PatternMatcher against the any(p in line) loop")
+    matcher_parser.add_argument("--categories", type=int, default=30)
+    matcher_parser.add_argument("--patterns-per-category", type=int, default=20)
+    matcher_parser.add_argument("--pods", type=int, default=20)
+    matcher_parser.add_argument("--containers", type=int, default=2)
+    matcher_parser.add_argument("--lines", type=int, default=2000)
+    matcher_parser.set_defaults(func=bench_matcher)
+
+    compiler_parser = subparsers.add_parser("compiler", help="Dictionary with regex, ignore_case and not entries, prefiltered against testing every entry")
+    compiler_parser.add_argument("--categories", type=int, default=30)
+    compiler_parser.add_argument("--patterns-per-category", type=int, default=20)
+    compiler_parser.add_argument("--pods", type=int, default=20)
+    compiler_parser.add_argument("--containers", type=int, default=2)
+    compiler_parser.add_argument("--lines", type=int, default=2000)
+    compiler_parser.set_defaults(func=bench_compiler)
+
+    levels_parser = subparsers.add_parser("levels", help="Text scan with and without the level prefilter")
+    levels_parser.add_argument("--min-level", default="warn")
+    levels_parser.add_argument("--categories", type=int, default=30)
+    levels_parser.add_argument("--patterns-per-category", type=int, default=20)
+    levels_parser.add_argument("--pods", type=int, default=20)
+    levels_parser.add_argument("--containers", type=int, default=2)
+    levels_parser.add_argument("--lines", type=int, default=2000)
+    levels_parser.add_argument("--hit-ratio", type=float, default=0.05)
+    levels_parser.set_defaults(func=bench_levels)
+
+    workers_parser = subparsers.add_parser("workers", help="Log file scanning with an increasing number of worker processes")
+    workers_parser.add_argument("--max-workers", type=int, default=0, help="Defaults to the number of CPUs")
+    workers_parser.add_argument("--categories", type=int, default=30)
+    workers_parser.add_argument("--patterns-per-category", type=int, default=20)
+    workers_parser.add_argument("--pods", type=int, default=100)
+    workers_parser.add_argument("--containers", type=int, default=3)
+    workers_parser.add_argument("--lines", type=int, default=1000)
+    workers_parser.set_defaults(func=bench_workers)
+
+    holder_parser = subparsers.add_parser("holder", help="ErrorInfoHolder.add_error against the rebuild-per-match version")
+    holder_parser.add_argument("--matches", type=int, default=100000)
+    holder_parser.add_argument("--messages", type=int, default=5000)
+    holder_parser.add_argument("--files", type=int, default=300)
+    holder_parser.add_argument("--categories", type=int, default=30)
+    holder_parser.add_argument("--legacy-matches", type=int, default=10000, help="The legacy holder is quadratic, so only a prefix of the matches is used")
+    holder_parser.set_defaults(func=bench_holder)
+
+    cleaner_parser = subparsers.add_parser("cleaner", help="Compiled and memoized cleaner against the legacy clean_log + normalize_logs chain")
+    cleaner_parser.add_argument("--messages", type=int, default=100000)
+    cleaner_parser.add_argument("--distinct", type=int, default=2000, help="Distinct messages in the repeated workload")
+    cleaner_parser.set_defaults(func=bench_cleaner)
+
+    json_parser = subparsers.add_parser("json", help="JSON decoding of Viya log lines with each available backend")
+    json_parser.add_argument("--lines", type=int, default=200000)
+    json_parser.set_defaults(func=bench_json)
+
+    mmap_parser = subparsers.add_parser("mmap", help="Text scan against the memory-mapped scan of one large log file")
+    mmap_parser.add_argument("--lines", type=int, default=500000)
+    mmap_parser.add_argument("--hit-ratio", type=float, default=0.001)
+    mmap_parser.add_argument("--categories", type=int, default=30)
+    mmap_parser.add_argument("--patterns-per-category", type=int, default=20)
+    mmap_parser.set_defaults(func=bench_mmap)
+
+    window_parser = subparsers.add_parser("window", help="Time window scan of one large time ordered log file against scanning every line")
+    window_parser.add_argument("--lines", type=int, default=500000)
+    window_parser.add_argument("--window-ratio", type=float, default=0.05, help="Share of the lines inside the window, at the end of the file")
+    window_parser.add_argument("--hit-ratio", type=float, default=0.01)
+    window_parser.add_argument("--categories", type=int, default=30)
+    window_parser.add_argument("--patterns-per-category", type=int, default=20)
+    window_parser.set_defaults(func=bench_window)
+
+    bundle_parser = subparsers.add_parser("bundle", help="Scanning logs straight from .tgz and .zip bundles against extracting them first")
+    bundle_parser.add_argument("--workers", type=int, default=1)
+    bundle_parser.add_argument("--categories", type=int, default=30)
+    bundle_parser.add_argument("--patterns-per-category", type=int, default=20)
+    bundle_parser.add_argument("--pods", type=int, default=50)
+    bundle_parser.add_argument("--containers", type=int, default=2)
+    bundle_parser.add_argument("--lines", type=int, default=2000)
+    bundle_parser.set_defaults(func=bench_bundle)
+
+    cache_parser = subparsers.add_parser("cache", help="Log file scanning with an empty and a filled scan cache, and after a dictionary change")
+    cache_parser.add_argument("--categories", type=int, default=30)
+    cache_parser.add_argument("--patterns-per-category", type=int, default=20)
+    cache_parser.add_argument("--pods", type=int, default=100)
+    cache_parser.add_argument("--containers", type=int, default=3)
+    cache_parser.add_argument("--lines", type=int, default=1000)
+    cache_parser.add_argument("--added-patterns", type=int, default=5)
+    cache_parser.set_defaults(func=bench_cache)
+
+    export_parser = subparsers.add_parser("export", help="Streaming NDJSON findings export against building the whole list first")
+    export_parser.add_argument("--findings", type=int, default=200000)
+    export_parser.set_defaults(func=bench_export)
+
+    telemetry_parser = subparsers.add_parser("telemetry", help="User activity and .env download against a slow and a dead local server")
+    telemetry_parser.add_argument("--records", type=int, default=20)
+    telemetry_parser.add_argument("--delay", type=float, default=30, help="Seconds the slow server takes to answer")
+    telemetry_parser.add_argument("--timeout", type=float, default=1, help="Connect and read timeouts of the requests")
+    telemetry_parser.add_argument("--exit-wait", type=float, default=2)
+    telemetry_parser.add_argument("--env-wait", type=float, default=0.5, help="env_file_wait_seconds, how long the start up waits for the .env file")
+    telemetry_parser.set_defaults(func=bench_telemetry)
+
+    mongodb_parser = subparsers.add_parser("mongodb", help="MongoDB calls of main() with and without the local snapshot, against mongomock")
+    mongodb_parser.add_argument("--users", type=int, default=50)
+    mongodb_parser.add_argument("--latency", type=float, default=0.2, help="Seconds per round trip")
+    mongodb_parser.set_defaults(func=bench_mongodb)
+
+    promotion_parser = subparsers.add_parser("promotion", help="Near duplicate check of the dictionary promotion against the thefuzz loop")
+    promotion_parser.add_argument("--default-patterns", type=int, default=5000)
+    promotion_parser.add_argument("--user-patterns", type=int, default=500)
+    promotion_parser.set_defaults(func=bench_promotion)
+
+    batch_parser = subparsers.add_parser("batch", help="Batch mode with a dictionary of object entries, serial and in spawned worker processes")
+    batch_parser.add_argument("--cases", type=int, default=4)
+    batch_parser.add_argument("--workers", type=int, default=2)
+    batch_parser.add_argument("--pods", type=int, default=10)
+    batch_parser.add_argument("--lines", type=int, default=2000)
+    batch_parser.add_argument("--hit-ratio", type=float, default=0.05)
+    batch_parser.add_argument("--categories", type=int, default=30)
+    batch_parser.add_argument("--patterns-per-category", type=int, default=20)
+    batch_parser.set_defaults(func=bench_batch)
+
+    imports_parser = subparsers.add_parser("imports", help="Import time of main (python -X importtime), fails when a lazy dependency is imported")
+    imports_parser.add_argument("--module", default="main")
+    imports_parser.add_argument("--runs", type=int, default=5)
+    imports_parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to show")
+    imports_parser.add_argument("--max-ms", type=float, default=0, help="Also fail when the import takes longer")
+    imports_parser.set_defaults(func=bench_imports)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
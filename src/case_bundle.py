@@ -0,0 +1,256 @@
+# case_bundle.py
+# Reads get-k8s-info output from a folder, or straight from a .tgz/.tar.gz/.tar.xz/.tar/.zip bundle without extracting it.
+# A path inside a bundle is the bundle path followed by the member path,
+# e.g. C:\cases\CS0001234_20250910_163413.tgz\kubernetes\sasviya4\get\pods.txt
+
+import io
+import os
+import gzip
+import tarfile
+import zipfile
+from functools import lru_cache
+
+# Custom imports
+from utils import logging, parse_pod_name
+
+ARCHIVE_EXTENSIONS = (".tgz", ".tar.gz", ".tar.bz2", ".tar.xz", ".tar", ".zip")
+# Single files such as logs/<pod>_<container>.log.gz are decompressed while they are read
+GZIP_EXTENSION = ".gz"
+PATH_SEPARATORS = ("/", "\\")
+
+
+class CaseBundle:
+    """
+    Member index of a get-k8s-info bundle, built once when the bundle is first opened.
+    When the kubernetes folder is under a single top folder (e.g. CS0001234_20250910_163413/kubernetes/...),
+    that folder is treated as the root of the bundle.
+    """
+    # A compressed tar can only be read front to back, so its members should be read in archive order
+    sequential = False
+
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        # {member_path: (position in the archive, archive entry)}
+        self.members = {}
+        # {directory_path: {child_name: is_file}}, the root is ""
+        self.directories = {"": {}}
+        self.build_index()
+        logging.info(f"Indexed {len(self.members)} files in {self.archive_path}")
+
+    def build_index(self):
+        entries = [(normalize_member_path(name), is_file, entry) for name, is_file, entry in self.iter_entries()]
+
+        top_folders = {name.split("/")[0] for name, _, _ in entries if name}
+        root = ""
+        if len(top_folders) == 1 and any(name.startswith(f"{folder}/kubernetes/") for folder in top_folders for name, _, _ in entries):
+            root = top_folders.pop() + "/"
+
+        for position, (name, is_file, entry) in enumerate(entries):
+            if root:
+                if not name.startswith(root):
+                    continue
+                name = name[len(root):]
+            if not name:
+                continue
+            self.add_path(name, is_file)
+            if is_file:
+                self.members[name] = (position, entry)
+
+    def add_path(self, name, is_file):
+        parent, _, child = name.rpartition("/")
+        if parent not in self.directories:
+            self.add_path(parent, False)
+        self.directories[parent][child] = self.directories[parent].get(child, False) or is_file
+        if not is_file:
+            self.directories.setdefault(name, {})
+
+    def iter_entries(self):
+        # Yields (name, is_file, entry) in archive order
+        raise NotImplementedError
+
+    def open_member(self, entry):
+        raise NotImplementedError
+
+    def exists(self, member_path):
+        return member_path in self.members or member_path in self.directories
+
+    def isdir(self, member_path):
+        return member_path in self.directories
+
+    def listdir(self, member_path):
+        return list(self.directories.get(member_path, {}))
+
+    def list_files(self, member_path):
+        return [name for name, is_file in self.directories.get(member_path, {}).items() if is_file]
+
+    def position(self, member_path):
+        return self.members[member_path][0]
+
+    def open(self, member_path):
+        if member_path not in self.members:
+            raise FileNotFoundError(f"{member_path} not found in {self.archive_path}")
+        return self.open_member(self.members[member_path][1])
+
+
+class TarBundle(CaseBundle):
+    def __init__(self, archive_path):
+        self.tar_file = tarfile.open(archive_path, "r:*")
+        self.sequential = not archive_path.lower().endswith(".tar")
+        super().__init__(archive_path)
+
+    def iter_entries(self):
+        # One streaming pass over the headers, the tar file stays open to read the members later
+        for member in self.tar_file:
+            if member.isfile() or member.isdir():
+                yield member.name, member.isfile(), member
+
+    def open_member(self, entry):
+        return self.tar_file.extractfile(entry)
+
+
+class ZipBundle(CaseBundle):
+    def __init__(self, archive_path):
+        self.zip_file = zipfile.ZipFile(archive_path)
+        super().__init__(archive_path)
+
+    def iter_entries(self):
+        # The central directory already lists every member
+        for info in self.zip_file.infolist():
+            yield info.filename, not info.is_dir(), info
+
+    def open_member(self, entry):
+        return self.zip_file.open(entry)
+
+
+class GzipMemberFile(gzip.GzipFile):
+    # Closes the bundle member along with the gzip stream
+    def __init__(self, member_file):
+        super().__init__(fileobj=member_file, mode="rb")
+        self.member_file = member_file
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.member_file.close()
+
+
+def normalize_member_path(name):
+    name = name.replace("\\", "/").strip("/")
+    while name.startswith("./"):
+        name = name[2:]
+    return "" if name == "." else name
+
+def get_bundle(archive_path):
+    # Forked worker processes must not share the parent's open archive, so each process indexes the bundle once
+    return get_process_bundle(archive_path, os.getpid())
+
+@lru_cache(maxsize=None)
+def get_process_bundle(archive_path, process_id):
+    if archive_path.lower().endswith(".zip"):
+        return ZipBundle(archive_path)
+    return TarBundle(archive_path)
+
+@lru_cache(maxsize=65536)
+def split_bundle_path(path):
+    # Returns (archive_path, member_path), or (None, path) for a path that is not inside a bundle
+    lowered = path.lower()
+    for extension in ARCHIVE_EXTENSIONS:
+        index = lowered.find(extension)
+        while index != -1:
+            end = index + len(extension)
+            if (end == len(path) or path[end] in PATH_SEPARATORS) and os.path.isfile(path[:end]):
+                return path[:end], normalize_member_path(path[end:])
+            index = lowered.find(extension, end)
+    return None, path
+
+def is_bundle_path(path):
+    archive_path, _ = split_bundle_path(path)
+    return archive_path is not None
+
+def is_sequential_bundle_path(path):
+    archive_path, _ = split_bundle_path(path)
+    return archive_path is not None and get_bundle(archive_path).sequential
+
+def bundle_position(path):
+    archive_path, member_path = split_bundle_path(path)
+    return get_bundle(archive_path).position(member_path)
+
+def path_exists(path):
+    archive_path, member_path = split_bundle_path(path)
+    if archive_path is None:
+        return os.path.exists(path) or os.path.exists(path + GZIP_EXTENSION)
+    bundle = get_bundle(archive_path)
+    return bundle.exists(member_path) or bundle.exists(member_path + GZIP_EXTENSION)
+
+def path_isdir(path):
+    archive_path, member_path = split_bundle_path(path)
+    if archive_path is None:
+        return os.path.isdir(path)
+    # The bundle itself is the root folder
+    return get_bundle(archive_path).isdir(member_path)
+
+def list_dir(path):
+    archive_path, member_path = split_bundle_path(path)
+    if archive_path is None:
+        return os.listdir(path)
+    return get_bundle(archive_path).listdir(member_path)
+
+def list_files(path):
+    # Returns (name, path) for each file directly under path
+    archive_path, member_path = split_bundle_path(path)
+    if archive_path is None:
+        with os.scandir(path) as entries:
+            return [(entry.name, entry.path) for entry in entries if entry.is_file()]
+    return [(name, os.path.join(path, name)) for name in get_bundle(archive_path).list_files(member_path)]
+
+def file_fingerprint(path):
+    # Size and modification time, of the bundle for a file inside a bundle
+    archive_path, _ = split_bundle_path(path)
+    stat = os.stat(archive_path or path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def can_mmap(path):
+    return not is_bundle_path(path) and not path.endswith(GZIP_EXTENSION)
+
+def open_file(path, mode="r", encoding=None, errors=None):
+    """
+    Opens a file for reading, from disk or from a bundle. mode is "r" or "rb".
+    A file that only exists as <path>.gz is read through gzip, like any other .gz file.
+    """
+    assert mode in ("r", "rb"), f"Invalid mode: {mode}. Case bundles are read only."
+    if not path.endswith(GZIP_EXTENSION) and not path_exists_exactly(path) and path_exists_exactly(path + GZIP_EXTENSION):
+        path += GZIP_EXTENSION
+
+    archive_path, member_path = split_bundle_path(path)
+    if archive_path is None:
+        if not path.endswith(GZIP_EXTENSION):
+            return open(path, mode, encoding=encoding, errors=errors)
+        binary_file = open(path, "rb")
+    else:
+        binary_file = get_bundle(archive_path).open(member_path)
+
+    if path.endswith(GZIP_EXTENSION):
+        binary_file = GzipMemberFile(binary_file)
+
+    if mode == "rb":
+        return binary_file
+    return io.TextIOWrapper(binary_file, encoding=encoding, errors=errors)
+
+def path_exists_exactly(path):
+    archive_path, member_path = split_bundle_path(path)
+    if archive_path is None:
+        return os.path.exists(path)
+    return get_bundle(archive_path).exists(member_path)
+
+def build_log_index(logs_dir):
+    # Maps each pod name to its log file paths with a single pass over the logs folder
+    log_index = {}
+    for file_name, file_path in list_files(logs_dir):
+        if "_" in file_name:
+            log_index.setdefault(parse_pod_name(file_name), []).append(file_path)
+
+    for log_files in log_index.values():
+        log_files.sort()
+
+    return log_index
@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 
 from utils import conf
 
@@ -9,31 +10,45 @@ JOB_ID_PATTERN = r"(?<=job ID ')\d+(?=')"
 POD_ID_PATTERN = r'-([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})-'
 JOB_ID_PATTERN_AFTER_POD_ID = r'-POD_ID-\b(?:0|[1-9]\d{0,3})\b\"'
 
+IP_ADDRESS_REGEX = re.compile(IP_ADDRESS_PATTERN)
+PORT_REGEX = re.compile(PORT_PATTERN)
+JOB_NUMBER_REGEX = re.compile(JOB_NUMBER_PATTERN)
+JOB_ID_REGEX = re.compile(JOB_ID_PATTERN)
+POD_ID_REGEX = re.compile(POD_ID_PATTERN)
+JOB_ID_AFTER_POD_ID_REGEX = re.compile(JOB_ID_PATTERN_AFTER_POD_ID)
 
-def clean_ip_address(line):    
-    text_with_ip_replaced = re.sub(IP_ADDRESS_PATTERN, 'IP_ADDRESS', line)
+DATETIME_REGEX = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+# Same result as \s+ -> " ", without rewriting the single spaces that are already normalized
+WHITESPACE_REGEX = re.compile(r"\s\s+|[^\S ]")
+
+# Cleaned and normalized messages are memoized, repeated log lines are the common case
+CLEANER_CACHE_SIZE = 65536
+
+
+def clean_ip_address(line):
+    text_with_ip_replaced = IP_ADDRESS_REGEX.sub('IP_ADDRESS', line)
     return text_with_ip_replaced
 
 
 def clean_port(line):
-    text_with_port_replaced = re.sub(PORT_PATTERN, ':PORT', line)
+    text_with_port_replaced = PORT_REGEX.sub(':PORT', line)
     return text_with_port_replaced
 
 def clean_job_number(line):
-    text_with_job_number_replaced = re.sub(JOB_NUMBER_PATTERN, 'The job "JOB_NUMBER" has been terminated through the REST API', line)
-    return text_with_job_number_replaced    
+    text_with_job_number_replaced = JOB_NUMBER_REGEX.sub('The job "JOB_NUMBER" has been terminated through the REST API', line)
+    return text_with_job_number_replaced
 
 def clean_job_id(line):
-    text_with_job_id_replaced = re.sub(JOB_ID_PATTERN, 'job ID \'JOB_ID\'', line)
-    return text_with_job_id_replaced 
+    text_with_job_id_replaced = JOB_ID_REGEX.sub('job ID \'JOB_ID\'', line)
+    return text_with_job_id_replaced
 
 def clean_pod_id(line):
-    text_with_pod_id_replaced = re.sub(POD_ID_PATTERN, "-POD_ID-", line)
-    return text_with_pod_id_replaced 
+    text_with_pod_id_replaced = POD_ID_REGEX.sub("-POD_ID-", line)
+    return text_with_pod_id_replaced
 
 def clean_job_id_after_pod_id(line):
-    text_with_job_id_after_pod_id_replaced = re.sub(JOB_ID_PATTERN_AFTER_POD_ID, "-POD_ID-JOB_ID", line)
-    return text_with_job_id_after_pod_id_replaced 
+    text_with_job_id_after_pod_id_replaced = JOB_ID_AFTER_POD_ID_REGEX.sub("-POD_ID-JOB_ID", line)
+    return text_with_job_id_after_pod_id_replaced
 
 
 CLEANER_FUNC_DICT = {
@@ -45,19 +60,41 @@ CLEANER_FUNC_DICT = {
     "job_id_after_pod_id" : clean_job_id_after_pod_id
 }
 
+# (literal, regex, replacement) for each cleaner. The regex can only match when the literal is in the line,
+# so the substitution is skipped for most lines.
+CLEANER_PASS_DICT = {
+    "ip_address": (".", IP_ADDRESS_REGEX, "IP_ADDRESS"),
+    "port": (":", PORT_REGEX, ":PORT"),
+    "job_number": ("The job", JOB_NUMBER_REGEX, 'The job "JOB_NUMBER" has been terminated through the REST API'),
+    "job_id": ("job ID '", JOB_ID_REGEX, "job ID 'JOB_ID'"),
+    "pod_id": ("-", POD_ID_REGEX, "-POD_ID-"),
+    "job_id_after_pod_id": ("-POD_ID-", JOB_ID_AFTER_POD_ID_REGEX, "-POD_ID-JOB_ID"),
+}
+
 def get_full_cleaners():
     cleaners_conf = [key for key, value in conf.get("cleaner", {}).items() if value is True]
     cleaners = [CLEANER_FUNC_DICT[i] for i in cleaners_conf]
     return cleaners
 
-def clean_log(line):
-    cleaners = get_full_cleaners()
-    for cleaner in cleaners:
-        line = cleaner(line)
-    
+@lru_cache(maxsize=None)
+def get_cleaner_passes():
+    # Built once from conf["cleaner"]. The order matters, e.g. ports are only cleaned after IP addresses.
+    cleaners_conf = [key for key, value in conf.get("cleaner", {}).items() if value is True]
+    return tuple(CLEANER_PASS_DICT[i] for i in cleaners_conf)
+
+def clean_log_uncached(line):
+    for literal, regex, replacement in get_cleaner_passes():
+        if literal in line:
+            line = regex.sub(replacement, line)
+
     return line
 
+@lru_cache(maxsize=CLEANER_CACHE_SIZE)
+def clean_log(line):
+    return clean_log_uncached(line)
+
+@lru_cache(maxsize=CLEANER_CACHE_SIZE)
 def normalize_logs(message: str) -> str:
-    message = re.sub(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}", "DATETIME", message)
-    message = re.sub(r"\s+", " ", message)
+    message = DATETIME_REGEX.sub("DATETIME", message)
+    message = WHITESPACE_REGEX.sub(" ", message)
     return message.strip()
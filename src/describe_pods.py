@@ -0,0 +1,95 @@
+# describe_pods.py
+
+import io
+
+# Custom imports
+from utils import logging
+from case_bundle import open_file, is_bundle_path
+
+
+class DescribePodsIndex:
+    """
+    Byte offsets of every pod section in a kubectl describe pods output, built in one streaming pass.
+    A section starts at a "Name:" line and ends where the next one starts.
+    """
+    def __init__(self, describe_pods_path):
+        self.describe_pods_path = describe_pods_path
+        # {pod_name: [(start_offset, end_offset, first_line_number)]}
+        self.sections = {}
+        # Seeking back in a compressed bundle means decompressing again, so the file is kept in memory there
+        self.data = None
+        self.build()
+
+    def build(self):
+        offset = 0
+        current_section = None
+
+        with open_file(self.describe_pods_path, "rb") as describe_pods_file:
+            if is_bundle_path(self.describe_pods_path):
+                self.data = describe_pods_file.read()
+                describe_pods_file = io.BytesIO(self.data)
+            for line_number, line in enumerate(describe_pods_file, start=1):
+                if line.startswith(b"Name:"):
+                    if current_section:
+                        self.add_section(*current_section, offset)
+                    fields = line.split()
+                    current_section = (fields[1].decode("utf-8", errors="ignore"), offset, line_number) if len(fields) > 1 else None
+                offset += len(line)
+
+        if current_section:
+            self.add_section(*current_section, offset)
+
+        logging.info(f"Indexed {len(self.sections)} pods in {self.describe_pods_path}")
+
+    def add_section(self, pod_name, start_offset, first_line_number, end_offset):
+        self.sections.setdefault(pod_name, []).append((start_offset, end_offset, first_line_number))
+
+    def __contains__(self, pod_name):
+        return pod_name in self.sections
+
+    def iter_section_lines(self, pod_name):
+        # Yields (line_number, line) for the pod's section(s), reading only those bytes
+        spans = self.sections.get(pod_name, [])
+        if not spans:
+            return
+
+        with (io.BytesIO(self.data) if self.data is not None else open_file(self.describe_pods_path, "rb")) as describe_pods_file:
+            for start_offset, end_offset, first_line_number in spans:
+                describe_pods_file.seek(start_offset)
+                section = io.BytesIO(describe_pods_file.read(end_offset - start_offset))
+                # Split on b"\n" only, the same way the offsets were counted
+                for line_number, line in enumerate(section, start=first_line_number):
+                    yield line_number, line.decode("utf-8", errors="ignore")
+
+    def get_section(self, pod_name):
+        return "".join(line for _, line in self.iter_section_lines(pod_name))
+
+    def get_blocks(self, pod_name, heading):
+        """
+        Returns every block of the pod's section that starts with heading (e.g. "Events:", "Conditions:", "Last State:"),
+        as a list of lists of (line_number, line). A block holds the heading line and the lines indented below it.
+        """
+        blocks = []
+        current_block = None
+        heading_indent = 0
+
+        for line_number, line in self.iter_section_lines(pod_name):
+            stripped_line = line.lstrip()
+            indent = len(line) - len(stripped_line)
+
+            if current_block is not None:
+                if stripped_line.strip() and indent <= heading_indent:
+                    blocks.append(current_block)
+                    current_block = None
+                else:
+                    current_block.append((line_number, line))
+                    continue
+
+            if stripped_line.startswith(heading):
+                current_block = [(line_number, line)]
+                heading_indent = indent
+
+        if current_block is not None:
+            blocks.append(current_block)
+
+        return blocks
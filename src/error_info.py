@@ -2,14 +2,17 @@
 
 import os
 import sys
-import json
 
 # Custom imports
 from utils import conf, logging, parse_container_name, pluralize
 from cleaner import clean_log, normalize_logs
 from printer import Printer
-from pod_info import PodInfo
-from error_message import format_timestamp, parse_non_json_logs, get_full_error_message
+from pod_info import PodInfo, PodError
+from log_scanner import scan_log_files
+from pattern_matcher import PatternMatcher
+from case_bundle import build_log_index, open_file, path_exists, path_isdir
+from describe_pods import DescribePodsIndex
+from error_message import format_timestamp, parse_log_line
 
 class ErrorInfo:
     def __init__(self, timestamp, message, category, container, file_name, line_number):
@@ -22,169 +25,179 @@ class ErrorInfo:
 
 
 class ErrorInfoHolder:
-    def __init__(self, printer):
-        self.errors = {}
+    def __init__(self, printer=None):
         self.added_files = set()
         self.printer = printer
+        # {category: {dedup_key: (timestamp, error_info)}}, so each match is a single dict update
         self.seen_messages = {}
-        
+        self.errors_by_category = None
+
+    @property
+    def errors(self):
+        # The per category lists are only built when a report asks for them
+        if self.errors_by_category is None:
+            self.errors_by_category = {
+                category: [entry[1] for entry in category_messages.values()]
+                for category, category_messages in self.seen_messages.items()
+            }
+        return self.errors_by_category
     
     def add_error(self, error_info):
         # normalize
         dedup_key = f"{normalize_logs(error_info.message)}_{error_info.file_name}"  # strips timestamp/dynamic parts
 
-        existing = self.seen_messages.get(dedup_key)
+        category_messages = self.seen_messages.setdefault(error_info.category, {})
+        existing = category_messages.get(dedup_key)
 
         # If timestamp is new it is changed
         if not existing or error_info.timestamp > existing[0]:
-            self.seen_messages[dedup_key] = (error_info.timestamp, error_info)
-
-        # Always rebuild the file's error list from seen_messages
-        self.errors[error_info.category] = [entry[1] for entry in self.seen_messages.values() if entry[1].category == error_info.category]
-        print()
+            category_messages[dedup_key] = (error_info.timestamp, error_info)
+            self.errors_by_category = None
         
-    def format_error(self, line, file_name, category, line_number):
-        message = ""
-        timestamp = ""
+    def format_error(self, log_record, file_name, category, line_number):
+        # log_record comes from parse_log_line, so the line is not parsed again here
         container = parse_container_name(file_name)
-        try:
-            # Try to load the full line as JSON directly
-            log_json = json.loads(line.strip())
-            message = clean_log(get_full_error_message(line))
-            timestamp = log_json.get("timeStamp") or log_json.get("ts") or "unknown-time"
-
-        except json.JSONDecodeError:
-                logging.info(f"The log snippet {line} is from {file_name} is not in JSON format. Returning original message")
-                timestamp, message = parse_non_json_logs(line.strip())
+        timestamp = log_record.timestamp
+        if log_record.is_json:
+            message = clean_log(log_record.display_message)
+        else:
+            logging.info(f"The log snippet {log_record.display_message} is from {file_name} is not in JSON format. Returning original message")
+            message = log_record.display_message
         
         error_info = ErrorInfo(format_timestamp(timestamp), message, category, container, file_name, line_number)
         return error_info
     
-    def print_pods_by_error_category(self):
+    def print_pods_by_error_category(self, printer=None):
+        printer = printer or self.printer
         for category, error_infos in self.errors.items():
-            self.printer.print_message(f"\nError: [{category}] found in {pluralize(len(error_infos), 'file')}")
-            self.printer.print_message("List of files:")
+            printer.print_message(f"\nError: [{category}] found in {pluralize(len(error_infos), 'file')}")
+            printer.print_message("List of files:")
             for error_info in error_infos[:conf["max_files_to_show"]]:
                 if error_info.message:
-                    self.printer.print_message(f" - {error_info.file_name}:{error_info.line_number} : {error_info.message}")
+                    printer.print_message(f" - {error_info.file_name}:{error_info.line_number} : {error_info.message}")
             if len(error_infos) > conf["max_files_to_show"]:
-                self.printer.print_message(f" - ... and {pluralize(len(error_infos) - conf['max_files_to_show'], 'more file')}\n")
+                printer.print_message(f" - ... and {pluralize(len(error_infos) - conf['max_files_to_show'], 'more file')}\n")
     
-    def print_containers_by_error_category(self):
+    def print_containers_by_error_category(self, printer=None):
+        printer = printer or self.printer
         for category, error_infos in self.errors.items():
-            containers_with_errors = set(error_info.container for error_info in error_infos)
-            self.printer.print_message(f"\nError [{category}] found in {pluralize(len(containers_with_errors), 'container')}")
+            # Keep the containers in the order they were found so the report is reproducible
+            containers_with_errors = dict.fromkeys(error_info.container for error_info in error_infos)
+            printer.print_message(f"\nError [{category}] found in {pluralize(len(containers_with_errors), 'container')}")
             for container in containers_with_errors:
                 if container:
-                    self.printer.print_message(f" - {container}")
+                    printer.print_message(f" - {container}")
 
 # Collect log file errors for each pod
 # If a log line matches a pattern, we parse it and store only unique messages ignoring timestamp
-def analyze_pods_with_errors(namespace_path, pods_with_errors, printer, error_patterns):
+# Nothing is printed here, see report.print_report
+def analyze_pods_with_errors(namespace_path, pods_with_errors, matcher, workers=1, scan_mode="text", scan_cache=None, findings_writer=None,
+                             time_window=None):
     logs_dir = os.path.join(namespace_path, "logs")
-    if not os.path.exists(logs_dir):
-        printer.print_message(f"No logs folder found at {logs_dir}")
+    if not path_exists(logs_dir):
         logging.warning(f"No logs folder found at {logs_dir}. Skipping log file collection.")
-        return
+        return False
+
+    # Results come back in this order, so they can be consumed pod by pod below
+    log_file_paths = [file_name for pod in pods_with_errors for file_name in pod.logs]
+    scan_results = scan_log_files(log_file_paths, matcher, workers, scan_mode=scan_mode, scan_cache=scan_cache, time_window=time_window)
 
     for pod in pods_with_errors:
-        printer.print_message(f"\n=== Checking logs for pod: {pod.name} ===", print_level=2)
+        for file_name in pod.logs:
+            _, records = next(scan_results)
 
-        if not pod.logs:
-            printer.print_message(f"No log files found for pod {pod.name}")
-            continue
+            for line_number, category, line in records:
+                log_record = parse_log_line(line)
+                pod.add_error_once_by_message(file_name, category, log_record, line_number)
+                if findings_writer:
+                    findings_writer.add(pod, file_name, line_number, category, log_record)
 
-        for file_name in pod.logs:
-            log_file_path = os.path.join(logs_dir, file_name)
-            printer.print_message(f"Processing log file: {file_name}", print_level=2)
-
-            with open(log_file_path, "r", encoding="utf-8", errors="ignore") as log_file:
-                for line_number, line in enumerate(log_file, start=1):
-                    for category, patterns in error_patterns.items():
-                        if any(p in line for p in patterns):
-                            pod.add_error_once_by_message(file_name, category, line, line_number)
-                            break
-                    
-                # pod.add_error_once_by_message(file_name, "Most Recent Record", log_file[-1].strip())
-
-def analyze_pods_without_errors(namespace_path, pods_without_errors, printer, error_patterns):
-    error_info_holder = ErrorInfoHolder(printer)
-    printer_console = Printer(namespace_path, mode="console")
-    printer.print_message("\nAnalyzing pods in normal state.")
+            # pod.add_error_once_by_message(file_name, "Most Recent Record", log_file[-1].strip())
+    return True
+
+def analyze_pods_without_errors(namespace_path, pods_without_errors, matcher, workers=1, scan_mode="text", scan_cache=None, show_progress=True,
+                                findings_writer=None, level_filter=None, level_filter_stats=None, time_window=None):
+    # level_filter: a level_filter.LevelFilter for the log lines. The (lines, lines skipped) of each scanned file are added to level_filter_stats.
+    error_info_holder = ErrorInfoHolder()
+    printer_console = Printer(namespace_path, mode="console") if show_progress else None
 
     i = 0
     total_number_of_log_files = sum(len(pod.logs) for pod in pods_without_errors)
 
-    for pod in pods_without_errors:
-        printer.print_message(f"\n=== Analyzing pod without errors: {pod.name} ===", print_level=2)
-
-        if not pod.logs:
-            printer.print_message(f"No log files found for pod {pod.name}\n")
-            continue
+    # Every matching category of a line is recorded for pods in normal state
+    log_file_paths = [file_name for pod in pods_without_errors for file_name in pod.logs]
+    scan_results = scan_log_files(log_file_paths, matcher, workers, all_categories=True, scan_mode=scan_mode, scan_cache=scan_cache,
+                                  level_filter=level_filter, time_window=time_window)
 
+    for pod in pods_without_errors:
         for file_name in pod.logs:
+            _, records = next(scan_results)
+            if level_filter is not None and records.lines is not None:
+                logging.info(f"Level filter: {file_name}: {records.lines - records.lines_skipped} lines scanned, {records.lines_skipped} skipped")
+                if level_filter_stats is not None:
+                    level_filter_stats[file_name] = (records.lines, records.lines_skipped)
             i += 1
-            sys.stdout.write("\033[K")
-            printer_console.print_message(f"[{i}/{total_number_of_log_files} {i/total_number_of_log_files*100:.1f}%] Processing log file: {os.path.basename(file_name)}", print_level=1, end_="\r", flush_=True)
-            if file_name.endswith("sas-rabbitmq-server-0_sas-start-sequencer.log"):
-                pass
-            with open(file_name, "r", encoding="utf-8", errors="ignore") as log_file:
-                for line_number, line in enumerate(log_file, start=1):
-                    for category, patterns in error_patterns.items():
-                        if any(p in line for p in patterns):
-                            error_info = error_info_holder.format_error(line, file_name, category, line_number)
-                            error_info_holder.add_error(error_info)
-
+            if show_progress:
+                sys.stdout.write("\033[K")
+                printer_console.print_message(f"[{i}/{total_number_of_log_files} {i/total_number_of_log_files*100:.1f}%] Processing log file: {os.path.basename(file_name)}", print_level=1, end_="\r", flush_=True)
+            parsed_line_number = None
+            for line_number, category, line in records:
+                # A line can match several categories but is only parsed once
+                if line_number != parsed_line_number:
+                    log_record = parse_log_line(line)
+                    parsed_line_number = line_number
+                error_info = error_info_holder.format_error(log_record, file_name, category, line_number)
+                error_info_holder.add_error(error_info)
+                if findings_writer:
+                    findings_writer.add(pod, file_name, line_number, category, log_record)
+
+    if show_progress and total_number_of_log_files:
+        # Clears the progress line, the report is printed after the analysis
+        sys.stdout.write("\033[K")
+        sys.stdout.flush()
     return error_info_holder
 
-def line_matches_error_patterns(line, error_patterns, mode='any'):
-    result = False, None
-    for category, patterns in error_patterns.items():
-        if mode == 'any':
-            if any(p in line for p in patterns):
-                result = True, category
-                break
-        elif mode == 'all':
-            if all(p in line for p in patterns):
-                result = True, category
-                break
-    return result
-
-def analyze_describe_pods_output(namespace_path, pods_with_errors):
+# {(conf key, mode): PatternMatcher}, the conf.json dictionaries are compiled once per process
+conf_matchers = {}
+
+def get_conf_matcher(conf_key, mode='any'):
+    """
+    PatternMatcher of the error patterns dict conf[conf_key]. In 'any' mode a category matches a line with any of its
+    patterns, in 'all' mode only a line with every one of them, like an {"all": [...]} entry (see pattern_compiler).
+    """
+    if (conf_key, mode) not in conf_matchers:
+        error_patterns = conf.get(conf_key, {})
+        if mode == 'all':
+            error_patterns = {category: [{"all": patterns}] for category, patterns in error_patterns.items()}
+        conf_matchers[(conf_key, mode)] = PatternMatcher(error_patterns)
+    return conf_matchers[(conf_key, mode)]
+
+def analyze_describe_pods_output(namespace_path, pods_with_errors, describe_pods_index=None):
     # Read the kubectl describe pods command output
     describe_pods_output = os.path.join(namespace_path, 'describe', 'pods.txt')
-    if not os.path.exists(describe_pods_output):
-        print(f"The file {describe_pods_output} does not exist.")
+    if not path_exists(describe_pods_output):
         logging.warning(f"The file {describe_pods_output} does not exist. Skipping error checks in describe pods output.")
     else:
-        with open(describe_pods_output, 'r') as describe_pods_output_file:
-            describe_pods_output_lines = describe_pods_output_file.readlines()
-        # Check each line in the describe pods content and check if it contains the pod name in pods_with_errors
-        pods_with_errors_name_list = [pod.name for pod in pods_with_errors]
-
-        current_pod_name = None
-        for line_number, line in enumerate(describe_pods_output_lines, start=1):
-            if line.startswith('Name:'):
-                current_pod_name = line.split()[1]
-            if current_pod_name in pods_with_errors_name_list:
-                matched, category = line_matches_error_patterns(line, conf.get("describe_pods_error_patterns", {}))
-                if matched:
-                    for pod in pods_with_errors:
-                        if pod.name == current_pod_name:
-                            pod.add_error(describe_pods_output, f"{line_number}: {clean_log(line.strip())}")
-                            break
+        # Only the sections of the pods with errors are read, see DescribePodsIndex
+        if describe_pods_index is None:
+            describe_pods_index = DescribePodsIndex(describe_pods_output)
+
+        matcher = get_conf_matcher("describe_pods_error_patterns")
+        for pod in pods_with_errors:
+            for line_number, line in describe_pods_index.iter_section_lines(pod.name):
+                if matcher.match(line) is not None:
+                    pod.add_error(describe_pods_output, PodError(line_number, clean_log(line.strip())))
     return pods_with_errors
 
-def classify_pods(namespace_path, printer):
+def classify_pods(namespace_path, printer=None):
     column_index = 0
     reverse_node_name_index = 0 
     get_pods_output = os.path.join(namespace_path, 'get','pods.txt')
-    if not os.path.exists(get_pods_output):
-        print(f"The file {get_pods_output} does not exist.")
-        logging.error(f"The file {get_pods_output} does not exist. Exiting the program.")
+    if not path_exists(get_pods_output):
+        logging.error(f"The file {get_pods_output} does not exist.")
         return
 
-    with open(get_pods_output, 'r') as get_pods_output_file:
+    with open_file(get_pods_output, 'r') as get_pods_output_file:
         get_pods_output_lines = get_pods_output_file.readlines()
 
     for i, line in enumerate(get_pods_output_lines):
@@ -198,14 +211,19 @@ def classify_pods(namespace_path, printer):
         node_name_index = fields.index('NODE')
         reverse_node_name_index = -(len(fields) - 2 - node_name_index)
     else:
-        print("The 'NODE' column is not present in the get pods output. Defaulting to 'unknown'.")
         logging.warning("The 'NODE' column is not present in the get pods output. Defaulting to 'unknown'.")
 
     pods_with_errors = []
     pods_without_errors = []
 
+    # List the logs folder once for the whole namespace instead of once per pod
+    logs_dir = os.path.join(namespace_path, 'logs')
+    log_index = build_log_index(logs_dir) if path_isdir(logs_dir) else None
+
+    matcher = get_conf_matcher("get_pods_error_patterns", "all")
     for line_number, line in enumerate(get_pods_output_lines[column_index + 1:], start=column_index + 2):
-        matched, category = line_matches_error_patterns(line, conf.get("get_pods_error_patterns", {}), "all")
+        category = matcher.match(line)
+        matched = category is not None
         line_list = line.split()
         pod_name = line_list[0]
         pod_node = line_list[reverse_node_name_index] if reverse_node_name_index != -1 else "unknown"
@@ -217,11 +235,11 @@ def classify_pods(namespace_path, printer):
             matched = True
             
         if matched:
-            pod_info = PodInfo(pod_name, category, pod_node, namespace_path, printer)
-            pod_info.add_error(get_pods_output, f"{line_number}: {line.strip()}")
+            pod_info = PodInfo(pod_name, category, pod_node, namespace_path, printer, log_index)
+            pod_info.add_error(get_pods_output, PodError(line_number, line.strip()))
             pods_with_errors.append(pod_info)
         elif not matched and pod_name != "NAME":
-            pod_info = PodInfo(pod_name, "No Issues", pod_node, namespace_path, printer)
+            pod_info = PodInfo(pod_name, "No Issues", pod_node, namespace_path, printer, log_index)
             pods_without_errors.append(pod_info)
         
     return pods_with_errors, pods_without_errors
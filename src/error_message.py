@@ -1,36 +1,85 @@
 import json
-
-from thefuzz import fuzz
+from datetime import datetime, timezone
+from functools import lru_cache
 
 from utils import conf, logging
+from json_backend import decode_log_fields
 
 def format_timestamp(timestamp):
     """Format a timestamp string to a more readable format."""
     try:
-        from datetime import datetime
         dt = datetime.fromisoformat(timestamp)
         return dt.strftime(conf.get("output_timestamp_format", "%Y-%m-%d %H:%M:%S"))
-    except ValueError:
+    except (ValueError, TypeError):
         logging.info(f"Invalid timestamp format: {timestamp}. Using original.")
         return timestamp
 
+def format_epoch_timestamp(seconds):
+    # ISO string of a numeric "ts" (zap logs write epoch seconds), so every timestamp is a string
+    try:
+        return datetime.fromtimestamp(seconds, timezone.utc).isoformat()
+    except (OverflowError, OSError, ValueError):
+        return str(seconds)
+
 def parse_non_json_logs(line):
     timestamp = line.split()[0]
     error = " ".join(line.split()[1:])
     return timestamp, error
 
+class LogRecord:
+    """A matched log line, parsed once and passed to PodInfo and ErrorInfoHolder."""
+    def __init__(self, timestamp, level, message, message_key, display_message, is_json):
+        self.timestamp = timestamp
+        self.level = level
+        self.message = message
+        self.message_key = message_key
+        self.display_message = display_message
+        self.is_json = is_json
+
+def parse_log_line(line):
+    stripped_line = line.strip()
+    try:
+        log_json = decode_log_fields(stripped_line)
+    except json.JSONDecodeError:
+        log_json = None
+
+    if not isinstance(log_json, dict):
+        timestamp, message = parse_non_json_logs(stripped_line)
+        return LogRecord(timestamp, "", message, "", message, False)
+
+    message = log_json.get("message", "")
+    message_key = log_json.get("messageKey", "")
+    timestamp = log_json.get("timeStamp") or log_json.get("ts") or "unknown-time"
+    if isinstance(timestamp, (int, float)) and not isinstance(timestamp, bool):
+        timestamp = format_epoch_timestamp(timestamp)
+    elif not isinstance(timestamp, str):
+        timestamp = str(timestamp)
+
+    display_message = resolve_display_message(line, message, message_key)
+
+    return LogRecord(timestamp, log_json.get("level", ""), message, message_key, display_message, True)
+
 def get_full_error_message(line):
-    log_json = json.loads(line.strip())
+    log_json = decode_log_fields(line.strip())
     
     message = log_json.get("message", "")
     message_key = log_json.get("messageKey", "")
     
+    return resolve_display_message(line, message, message_key)
+
+def resolve_display_message(line, message, message_key):
     if not message and not message_key:
         return line
-    
-    return check_message_duplicate(message, message_key)
 
+    # Only strings can be cached, anything else is compared as before
+    if isinstance(message, str) and isinstance(message_key, str):
+        return check_message_duplicate(message, message_key)
+    return check_message_duplicate.__wrapped__(message, message_key)
+
+# The fuzzy comparison only runs once per distinct (message, messageKey) pair
+@lru_cache(maxsize=65536)
 def check_message_duplicate(message, message_key):
+    from thefuzz import fuzz
     if any(
         [fuzz.ratio(message, message_key) >= 80,
         message in message_key,
@@ -0,0 +1,112 @@
+# findings_export.py
+# Streams every log finding of an analysis to NDJSON, or to Parquet when pyarrow is installed.
+# Findings are written while the logs are scanned, so memory use does not grow with the number of findings.
+# pyarrow is only imported once a Parquet export is asked for, it slows down the start of main.exe
+
+import os
+
+# Custom imports
+from utils import logging, parse_container_name
+from cleaner import clean_log, normalize_logs
+from json_backend import dumps
+
+FINDINGS_FORMATS = ["ndjson", "parquet"]
+FINDING_FIELDS = ("namespace", "pod", "pod_status", "node", "container", "category", "timestamp", "message", "normalized_message",
+                  "file", "line")
+
+
+class FindingsWriter:
+    """
+    Writes one finding per matched log line and category, for the pods with and without errors alike.
+    Unlike the report and all_errors.json, repeated messages are not merged.
+    """
+    def __init__(self, path, namespace_path):
+        self.path = path
+        self.namespace = os.path.basename(namespace_path)
+        self.findings = 0
+        self.file_name = None
+        self.container = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, pod, file_name, line_number, category, log_record):
+        # log_record comes from parse_log_line
+        if file_name != self.file_name:
+            self.file_name = file_name
+            self.container = parse_container_name(file_name)
+        message = clean_log(log_record.display_message)
+        self.write_row((self.namespace, pod.name, pod.status, pod.node, self.container, category, log_record.timestamp, message,
+                        normalize_logs(message), file_name, line_number))
+        self.findings += 1
+
+    def write_row(self, row):
+        raise NotImplementedError
+
+    def close(self):
+        logging.info(f"Exported {self.findings} findings to {self.path}")
+
+
+class NdjsonFindingsWriter(FindingsWriter):
+    def __init__(self, path, namespace_path):
+        super().__init__(path, namespace_path)
+        self.file = open(path, "w", encoding="utf-8", buffering=1024 * 1024)
+
+    def write_row(self, row):
+        self.file.write(dumps(dict(zip(FINDING_FIELDS, row))) + "\n")
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+            super().close()
+
+
+class ParquetFindingsWriter(FindingsWriter):
+    # Rows are kept column by column until a row group is full
+    row_group_size = 65536
+
+    def __init__(self, path, namespace_path):
+        import pyarrow
+        import pyarrow.parquet
+
+        super().__init__(path, namespace_path)
+        self.make_table = pyarrow.Table.from_arrays
+        self.schema = pyarrow.schema([(field, pyarrow.int64() if field == "line" else pyarrow.string()) for field in FINDING_FIELDS])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+        self.columns = [[] for _ in FINDING_FIELDS]
+
+    def write_row(self, row):
+        for column, value in zip(self.columns, row):
+            column.append(value)
+        if len(self.columns[0]) >= self.row_group_size:
+            self.write_row_group()
+
+    def write_row_group(self):
+        if self.columns[0]:
+            self.writer.write_table(self.make_table(self.columns, schema=self.schema))
+            self.columns = [[] for _ in FINDING_FIELDS]
+
+    def close(self):
+        if self.writer:
+            self.write_row_group()
+            self.writer.close()
+            self.writer = None
+            super().close()
+
+
+def open_findings_writer(path_without_extension, namespace_path, findings_format="ndjson"):
+    """Returns a FindingsWriter for <path_without_extension>.ndjson or .parquet."""
+    assert findings_format in FINDINGS_FORMATS, f"Invalid findings format: {findings_format}. Choose from {FINDINGS_FORMATS}."
+    if findings_format == "parquet":
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            print("pyarrow is not installed, findings are exported to NDJSON instead of Parquet.")
+            logging.warning("pyarrow is not installed. Exporting findings to NDJSON instead of Parquet.")
+        else:
+            return ParquetFindingsWriter(f"{path_without_extension}.parquet", namespace_path)
+    return NdjsonFindingsWriter(f"{path_without_extension}.ndjson", namespace_path)
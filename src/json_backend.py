@@ -0,0 +1,95 @@
+# json_backend.py
+
+import json
+from typing import Any
+
+# Custom imports
+from utils import conf, logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+JSON_BACKENDS = ["auto", "msgspec", "orjson", "json"]
+
+# Fields of a Viya structured log line that the analysis reads
+VIYA_LOG_FIELDS = ("timeStamp", "ts", "level", "message", "messageKey", "source")
+
+if msgspec is not None:
+    class ViyaLogFields(msgspec.Struct):
+        """Typed view of a Viya log line. Every other field is skipped while decoding instead of being built."""
+        timeStamp: Any = None
+        ts: Any = None
+        level: Any = None
+        message: Any = None
+        messageKey: Any = None
+        source: Any = None
+
+    msgspec_decoder = msgspec.json.Decoder()
+    msgspec_encoder = msgspec.json.Encoder()
+    viya_log_decoder = msgspec.json.Decoder(ViyaLogFields)
+
+
+def get_json_backend(name):
+    available = {"msgspec": msgspec is not None, "orjson": orjson is not None, "json": True}
+    if name not in JSON_BACKENDS:
+        logging.warning(f"Unknown json_backend: {name}. Choose from {JSON_BACKENDS}. Defaulting to auto.")
+        name = "auto"
+    if name != "auto" and not available[name]:
+        logging.warning(f"json_backend {name} is not installed. Defaulting to auto.")
+        name = "auto"
+    if name == "auto":
+        name = next(backend for backend in ("msgspec", "orjson", "json") if available[backend])
+    return name
+
+# Picked from conf.json on first use, see select_json_backend
+JSON_BACKEND = None
+
+def select_json_backend():
+    global JSON_BACKEND
+    if JSON_BACKEND is None:
+        JSON_BACKEND = get_json_backend(conf.get("json_backend", "auto"))
+        logging.info(f"Using the {JSON_BACKEND} JSON backend for log lines")
+    return JSON_BACKEND
+
+
+def loads(text):
+    # Anything the fast backends reject is retried with json, so the result is always what json.loads would give
+    backend = JSON_BACKEND or select_json_backend()
+    try:
+        if backend == "orjson":
+            return orjson.loads(text)
+        if backend == "msgspec":
+            return msgspec_decoder.decode(text)
+    except ValueError:
+        pass
+    return json.loads(text)
+
+def decode_log_fields(text):
+    """
+    Decodes a log line and returns a dict with at least the Viya log fields that are present.
+    Raises json.JSONDecodeError when the line is not JSON.
+    """
+    if (JSON_BACKEND or select_json_backend()) == "msgspec":
+        try:
+            log_fields = viya_log_decoder.decode(text)
+        except ValueError:
+            # Not an object, or not JSON at all
+            return json.loads(text)
+        return {field: value for field, value in msgspec.structs.asdict(log_fields).items() if value is not None}
+    return loads(text)
+
+def dumps(obj):
+    # Compact JSON text, non-ASCII characters are kept as is
+    backend = JSON_BACKEND or select_json_backend()
+    if backend == "orjson":
+        return orjson.dumps(obj).decode("utf-8")
+    if backend == "msgspec":
+        return msgspec_encoder.encode(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,91 @@
+# level_filter.py
+# Skips low severity JSON log lines ("level":"info", "debug", ...) before the error patterns are matched.
+# The level is read at the position of the "level" key, the line is not parsed.
+
+import re
+
+# Custom imports
+from utils import conf, logging
+
+LEVEL_RANKS = {
+    "trace": 0,
+    "debug": 1,
+    "info": 2,
+    "notice": 2,
+    "warn": 3,
+    "warning": 3,
+    "error": 4,
+    "fatal": 5,
+    "critical": 5,
+    "panic": 5,
+}
+LEVEL_KEY = '"level"'
+LEVEL_VALUE_REGEX = re.compile(r'\s*:\s*"([A-Za-z]+)"')
+
+
+def get_level_rank(level):
+    # None for no level, so the category is never filtered
+    if level is None:
+        return None
+    rank = LEVEL_RANKS.get(str(level).lower())
+    if rank is None:
+        raise ValueError(f"Unknown log level {level!r}, expected one of {', '.join(LEVEL_RANKS)}")
+    return rank
+
+def read_level(line):
+    # The "level" value of a JSON line, or None for any other line
+    if not line.startswith("{"):
+        return None
+    position = line.find(LEVEL_KEY)
+    if position == -1:
+        return None
+    match = LEVEL_VALUE_REGEX.match(line, position + len(LEVEL_KEY))
+    return match.group(1) if match else None
+
+
+class LevelFilter:
+    """
+    Minimum level of each category of the matcher: a JSON line below it is never reported under the category,
+    and a line below the minimum level of every category is not matched at all.
+    Lines without a known level (plain text, no "level" key) are always matched.
+    """
+    def __init__(self, categories, min_level="warn", category_min_levels=None):
+        category_min_levels = category_min_levels or {}
+        self.min_ranks = [get_level_rank(category_min_levels.get(category, min_level)) for category in categories]
+        self.all_indexes = frozenset(range(len(categories)))
+        # {level in the line: frozenset(indexes of the categories it is below)}, only the levels below some minimum
+        self.excluded_by_level = {}
+        for level, rank in LEVEL_RANKS.items():
+            excluded = frozenset(index for index, min_rank in enumerate(self.min_ranks) if min_rank is not None and rank < min_rank)
+            if excluded == self.all_indexes:
+                # Compared by identity while scanning
+                excluded = self.all_indexes
+            if excluded:
+                for spelling in (level, level.upper(), level.capitalize()):
+                    self.excluded_by_level[spelling] = excluded
+
+    def get_excluded_indexes(self, line):
+        # Indexes of the categories the line is below the minimum level of, or None
+        level = read_level(line)
+        if level is None:
+            return None
+        excluded = self.excluded_by_level.get(level)
+        if excluded is None and level.lower() != level:
+            excluded = self.excluded_by_level.get(level.lower())
+        return excluded
+
+
+def get_level_filter(categories):
+    """
+    LevelFilter of conf["level_filter"] for these categories, or None when it is disabled or invalid.
+    conf["level_filter"]["category_min_levels"] overrides min_level by category, null never filters the category.
+    """
+    level_filter_conf = conf.get("level_filter", {})
+    if not level_filter_conf.get("enabled", False):
+        return None
+    try:
+        return LevelFilter(categories, level_filter_conf.get("min_level", "warn"), level_filter_conf.get("category_min_levels", {}))
+    except ValueError as e:
+        print(f"Invalid level_filter in conf.json: {e}. Scanning every log line.")
+        logging.error(f"Invalid level_filter in conf.json: {e}. Scanning every log line.")
+        return None
@@ -0,0 +1,327 @@
+# log_scanner.py
+
+import io
+import os
+import re
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+
+# Custom imports
+from utils import conf, logging, setup_logging, worker_log_queue
+from pattern_matcher import PatternMatcher
+from case_bundle import open_file, can_mmap, is_sequential_bundle_path, bundle_position, file_fingerprint
+from time_window import find_window_offsets, iter_window_lines
+
+SCAN_MODES = ["auto", "text", "mmap"]
+# Whole lines are cut out of the memory map in blocks of about this size
+MMAP_CHUNK_SIZE = 4 * 1024 * 1024
+# Up to this many patterns, one bytes.find pass per pattern beats decoding the block for the automaton.
+# Past it, the pure Python matcher is better off with the text scan.
+MMAP_MAX_FIND_PATTERNS = 64
+LONE_CARRIAGE_RETURN_REGEX = re.compile(rb"\r(?!\n)")
+
+# Set once per worker process by init_worker so the matcher is not pickled for every file
+worker_matcher = None
+worker_all_categories = False
+worker_scan_mode = "text"
+worker_level_filter = None
+worker_time_window = None
+
+
+class ScanRecords(list):
+    """
+    Match records (line_number, category, line) of a log file, in file order.
+    With a level filter, lines is the number of lines of the file and lines_skipped the number of them skipped for their level
+    (the memory-mapped scan only reads the lines with a pattern, so only these are skipped). Both are None for results of the scan cache.
+    """
+    lines = None
+    lines_skipped = None
+
+
+def add_line_records(records, line_number, line, matcher, all_categories, level_filter=None):
+    if level_filter is not None:
+        excluded = level_filter.get_excluded_indexes(line)
+        if excluded is not None:
+            if excluded is level_filter.all_indexes:
+                records.lines_skipped += 1
+                return
+            for index in matcher.match_indexes(line):
+                if index not in excluded:
+                    records.append((line_number, matcher.categories[index], line))
+                    if not all_categories:
+                        break
+            return
+
+    if all_categories:
+        for category in matcher.match_all(line):
+            records.append((line_number, category, line))
+    else:
+        category = matcher.match(line)
+        if category:
+            records.append((line_number, category, line))
+
+def new_scan_records(level_filter):
+    records = ScanRecords()
+    if level_filter is not None:
+        records.lines = 0
+        records.lines_skipped = 0
+    return records
+
+def scan_log_file_text(file_name, matcher, all_categories=False, level_filter=None):
+    # Returns compact match records (line_number, category, line) in file order
+    records = new_scan_records(level_filter)
+    line_number = 0
+    with open_file(file_name, "r", encoding="utf-8", errors="ignore") as log_file:
+        for line_number, line in enumerate(log_file, start=1):
+            add_line_records(records, line_number, line, matcher, all_categories, level_filter)
+    if level_filter is not None:
+        records.lines = line_number
+    return records
+
+def scan_log_file_mmap(file_name, matcher, all_categories=False, level_filter=None):
+    # Same records as scan_log_file_text, but only the lines that contain a pattern are decoded and matched
+    records = new_scan_records(level_filter)
+    with open(file_name, "rb") as log_file:
+        size = os.fstat(log_file.fileno()).st_size
+        if size == 0:
+            return records
+
+        with mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as log_map:
+            # Text mode also ends a line at a lone \r, and an empty pattern is in every line.
+            # Regex, case-insensitive and "not" entries are matched on decoded lines only.
+            if matcher.always_indexes or matcher.plan is not None or LONE_CARRIAGE_RETURN_REGEX.search(log_map):
+                return scan_log_file_text(file_name, matcher, all_categories, level_filter)
+
+            line_number = 1
+            chunk_start = 0
+            while chunk_start < size:
+                chunk_end = min(chunk_start + MMAP_CHUNK_SIZE, size)
+                if chunk_end < size:
+                    # Cut after a newline so neither a line nor a UTF-8 character is split
+                    last_newline = log_map.rfind(b"\n", chunk_start, chunk_end)
+                    if last_newline == -1:
+                        last_newline = log_map.find(b"\n", chunk_end)
+                    chunk_end = size if last_newline == -1 else last_newline + 1
+
+                chunk = log_map[chunk_start:chunk_end]
+                if matcher.native and len(matcher.encoded_patterns) > MMAP_MAX_FIND_PATTERNS:
+                    chunk = chunk.decode("utf-8", errors="ignore")
+                newline = "\n" if isinstance(chunk, str) else b"\n"
+
+                counted_up_to = 0
+                for line_start in matcher.find_candidate_lines(chunk):
+                    line_number += chunk.count(newline, counted_up_to, line_start)
+                    counted_up_to = line_start
+
+                    line_end = chunk.find(newline, line_start)
+                    line = chunk[line_start:len(chunk) if line_end == -1 else line_end + 1]
+                    if isinstance(line, bytes):
+                        line = line.decode("utf-8", errors="ignore")
+                    # Text mode translates \r\n
+                    if line.endswith("\r\n"):
+                        line = line[:-2] + "\n"
+                    add_line_records(records, line_number, line, matcher, all_categories, level_filter)
+
+                line_number += chunk.count(newline, counted_up_to)
+                chunk_start = chunk_end
+
+            if level_filter is not None:
+                # line_number is one past the last line when the file ends with a newline
+                records.lines = line_number - (log_map[size - 1:size] == b"\n")
+    return records
+
+def scan_log_file_window(file_name, matcher, all_categories=False, level_filter=None, time_window=None):
+    # Same records as scan_log_file_text, for the lines inside time_window only (see time_window.py)
+    records = new_scan_records(level_filter)
+    lines_read = 0
+    if can_mmap(file_name) and os.path.isfile(file_name):
+        with open(file_name, "rb") as log_file:
+            size = os.fstat(log_file.fileno()).st_size
+            if size == 0:
+                return records
+
+            with mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ) as log_map:
+                start, end = find_window_offsets(log_map, size, time_window)
+                # The binary search splits lines at \n only, text mode also at a lone \r. Checked from the line before the window.
+                check_start = log_map.rfind(b"\n", 0, max(start - 1, 0)) + 1
+                if not LONE_CARRIAGE_RETURN_REGEX.search(log_map, check_start, end):
+                    logging.info(f"Time window: reading bytes {start} to {end} of {size} of {file_name}")
+                    for line_number, line in enumerate(iter_mmap_lines(log_map, start, end), start=1):
+                        add_line_records(records, line_number, line, matcher, all_categories, level_filter)
+                        lines_read += 1
+                    if records:
+                        # Only counted when the window has a match, it is a read of every byte before it
+                        lines_before = count_line_breaks(log_map, start)
+                        records[:] = [(line_number + lines_before, category, line) for line_number, category, line in records]
+                    if level_filter is not None:
+                        records.lines = lines_read
+                    return records
+
+    with open_file(file_name, "r", encoding="utf-8", errors="ignore") as log_file:
+        for line_number, line in iter_window_lines(log_file, time_window):
+            add_line_records(records, line_number, line, matcher, all_categories, level_filter)
+            lines_read += 1
+    if level_filter is not None:
+        records.lines = lines_read
+    return records
+
+def iter_mmap_lines(log_map, start, end):
+    # Lines of log_map[start:end] as text mode reads them, decoded a block at a time. The span has no lone \r.
+    chunk_start = start
+    while chunk_start < end:
+        chunk_end = min(chunk_start + MMAP_CHUNK_SIZE, end)
+        if chunk_end < end:
+            # Cut after a newline so neither a line nor a UTF-8 character is split
+            last_newline = log_map.rfind(b"\n", chunk_start, chunk_end)
+            if last_newline == -1:
+                last_newline = log_map.find(b"\n", chunk_end, end)
+            chunk_end = end if last_newline == -1 else last_newline + 1
+        # newline=None translates \r\n like text mode
+        yield from io.StringIO(log_map[chunk_start:chunk_end].decode("utf-8", errors="ignore"), newline=None)
+        chunk_start = chunk_end
+
+def count_line_breaks(log_map, end):
+    # Lines before offset end, as text mode counts them: \n, \r\n and lone \r. end is the start of a line.
+    count = 0
+    for chunk_start in range(0, end, MMAP_CHUNK_SIZE):
+        chunk_end = min(chunk_start + MMAP_CHUNK_SIZE, end)
+        chunk = log_map[chunk_start:chunk_end]
+        count += chunk.count(b"\n") + chunk.count(b"\r") - chunk.count(b"\r\n")
+        if chunk.endswith(b"\r") and chunk_end < end and log_map[chunk_end:chunk_end + 1] == b"\n":
+            # \r\n across two chunks
+            count -= 1
+    return count
+
+def use_mmap(file_name, matcher, scan_mode):
+    # Files inside a bundle and .gz files are streamed
+    if not can_mmap(file_name) or matcher.plan is not None:
+        return False
+    if scan_mode == "auto":
+        if not matcher.native and len(matcher.encoded_patterns) > MMAP_MAX_FIND_PATTERNS:
+            return False
+        return os.path.getsize(file_name) >= conf.get("mmap_min_file_size_mb", 64) * 1024 * 1024
+    return scan_mode == "mmap"
+
+def scan_log_file(file_name, matcher, all_categories=False, scan_mode="text", level_filter=None, time_window=None):
+    if time_window is not None:
+        return scan_log_file_window(file_name, matcher, all_categories, level_filter, time_window)
+    if use_mmap(file_name, matcher, scan_mode):
+        return scan_log_file_mmap(file_name, matcher, all_categories, level_filter)
+    return scan_log_file_text(file_name, matcher, all_categories, level_filter)
+
+def init_worker(matcher, all_categories, scan_mode, level_filter=None, time_window=None, log_queue=None):
+    global worker_matcher, worker_all_categories, worker_scan_mode, worker_level_filter, worker_time_window
+    # Spawned workers (Windows, main.exe) start without the logging setup of main(), see utils.worker_log_queue
+    setup_logging(log_queue)
+    worker_matcher = matcher
+    worker_all_categories = all_categories
+    worker_scan_mode = scan_mode
+    worker_level_filter = level_filter
+    worker_time_window = time_window
+
+def scan_log_file_in_worker(file_name):
+    return scan_log_file(file_name, worker_matcher, worker_all_categories, worker_scan_mode, worker_level_filter, worker_time_window)
+
+def scan_log_files(file_names, matcher, workers=1, all_categories=False, scan_mode="text", scan_cache=None, level_filter=None, time_window=None):
+    """
+    Yields (file_name, records) in the order of file_names, whatever the number of workers, records is a ScanRecords.
+    level_filter: a level_filter.LevelFilter, the lines below the minimum level of a category are not reported under it.
+    time_window: a time_window.TimeWindow, only the lines inside it are scanned.
+    """
+    # An empty pattern or a regex without literals matches every line, which is not worth caching.
+    # The results of part of a file are not cached either.
+    if scan_cache is None or matcher.scans_every_line or time_window is not None:
+        yield from scan_uncached_log_files(file_names, matcher, workers, all_categories, scan_mode, level_filter, time_window)
+        return
+
+    # Object entries (see pattern_compiler) are cached under their key
+    patterns = frozenset(matcher.pattern_keys)
+    fingerprints = {file_name: file_fingerprint(file_name) for file_name in file_names}
+    cached_hits = {}
+    missing_patterns_by_file = {}
+    # {frozenset(patterns to scan for): [file_name]}, usually a single group: every pattern, or the ones added since the last run
+    files_by_missing_patterns = {}
+    for file_name in file_names:
+        scanned_patterns, hits = scan_cache.get(file_name, fingerprints[file_name]) or (frozenset(), [])
+        cached_hits[file_name] = drop_removed_patterns(hits, patterns)
+        missing_patterns = patterns - scanned_patterns
+        if missing_patterns:
+            missing_patterns_by_file[file_name] = missing_patterns
+            files_by_missing_patterns.setdefault(missing_patterns, []).append(file_name)
+    scan_cache.commit()
+
+    # Each group is scanned with a matcher that has one category per pattern, so every record names a pattern found in the line
+    scan_results = {}
+    for missing_patterns, files_to_scan in files_by_missing_patterns.items():
+        logging.info(f"Scan cache: scanning {len(files_to_scan)} of {len(file_names)} log files for {len(missing_patterns)} of {len(patterns)} patterns")
+        pattern_matcher = PatternMatcher({pattern: [matcher.get_entry(pattern)] for pattern in sorted(missing_patterns)})
+        # Few lines contain the added patterns, which is where the memory-mapped scan is fastest whatever the file size
+        group_scan_mode = "mmap" if scan_mode == "auto" and missing_patterns != patterns else scan_mode
+        scan_results[missing_patterns] = scan_uncached_log_files(files_to_scan, pattern_matcher, workers, True, group_scan_mode)
+
+    try:
+        for file_name in file_names:
+            hits = cached_hits.pop(file_name)
+            if file_name in missing_patterns_by_file:
+                _, records = next(scan_results[missing_patterns_by_file[file_name]])
+                hits = merge_hits(hits, records)
+                scan_cache.put(file_name, fingerprints[file_name], patterns, hits)
+                scan_cache.commit()
+            # The cache holds every line with a pattern whatever its level, the level filter applies to its results
+            yield file_name, resolve_hits(hits, matcher, all_categories, level_filter)
+    finally:
+        scan_cache.commit()
+
+def drop_removed_patterns(hits, patterns):
+    kept_hits = []
+    for line_number, line, found_patterns in hits:
+        found_patterns = tuple(pattern for pattern in found_patterns if pattern in patterns)
+        if found_patterns:
+            kept_hits.append((line_number, line, found_patterns))
+    return kept_hits
+
+def merge_hits(hits, records):
+    # records come from a one-category-per-pattern matcher, the result is sorted by line number
+    merged = {line_number: (line, list(found_patterns)) for line_number, line, found_patterns in hits}
+    for line_number, pattern, line in records:
+        merged.setdefault(line_number, (line, []))[1].append(pattern)
+    return [(line_number, line, tuple(found_patterns)) for line_number, (line, found_patterns) in sorted(merged.items())]
+
+def resolve_hits(hits, matcher, all_categories, level_filter=None):
+    # The records scan_log_file would return with matcher, built from the patterns found in each line
+    records = ScanRecords()
+    for line_number, line, found_patterns in hits:
+        indexes = matcher.get_key_indexes(found_patterns)
+        excluded = level_filter.get_excluded_indexes(line) if level_filter is not None else None
+        if excluded:
+            indexes = [index for index in indexes if index not in excluded]
+        if all_categories:
+            records.extend((line_number, matcher.categories[index], line) for index in indexes)
+        elif indexes:
+            records.append((line_number, matcher.categories[indexes[0]], line))
+    return records
+
+def scan_uncached_log_files(file_names, matcher, workers=1, all_categories=False, scan_mode="text", level_filter=None, time_window=None):
+    if file_names and is_sequential_bundle_path(file_names[0]):
+        # A compressed tar is read front to back in one pass, parallel reads would decompress it again and again
+        if workers > 1:
+            logging.info("Log files are in a compressed tar bundle, scanning them in a single process")
+        records_by_file = {}
+        for file_name in sorted(set(file_names), key=bundle_position):
+            records_by_file[file_name] = scan_log_file(file_name, matcher, all_categories, scan_mode, level_filter, time_window)
+        for file_name in file_names:
+            yield file_name, records_by_file[file_name]
+        return
+
+    if workers <= 1 or len(file_names) <= 1:
+        for file_name in file_names:
+            yield file_name, scan_log_file(file_name, matcher, all_categories, scan_mode, level_filter, time_window)
+        return
+
+    logging.info(f"Scanning {len(file_names)} log files with {workers} worker processes")
+    with worker_log_queue() as log_queue, ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                                              initargs=(matcher, all_categories, scan_mode, level_filter, time_window, log_queue)) as executor:
+        # Small chunks keep the progress output moving while still batching the IPC round trips
+        chunksize = max(1, min(16, len(file_names) // (workers * 8)))
+        for file_name, records in zip(file_names, executor.map(scan_log_file_in_worker, file_names, chunksize=chunksize)):
+            yield file_name, records
@@ -1,23 +1,91 @@
 # main.py
-import os
-import json
-
-from thefuzz import fuzz
+import sys
+import argparse
+import multiprocessing
 
 # Custom imports
-from utils import conf, load_cache, logging, record_user_activity, manage_log_retention
-from printer import Printer
-from error_info import analyze_pods_without_errors, analyze_pods_with_errors, analyze_describe_pods_output, classify_pods
-from user_inputs import get_user_id_from_user, get_case_info_dir_from_user, get_namespace_path_from_user, get_error_patterns_from_user_input
+from utils import conf, load_cache, logging, manage_log_retention, load_json_from_path, start_env_file_download, setup_logging
+from user_inputs import get_user_id_from_user, get_case_info_dir_from_user, get_namespace_path_from_user, get_error_patterns_from_user_input, user_dict_has_valid_format
 from mongodb_handler import load_mongodb
+from track_usage import record_user_activity
+from pattern_matcher import PatternMatcher
+from pattern_similarity import promote_user_patterns
+from log_scanner import SCAN_MODES
+from findings_export import FINDINGS_FORMATS
+from batch import report_namespace, run_batch, open_scan_cache
+from time_window import check_time_option
+
+TIME_OPTIONS = ("--since", "--until")
+
+
+def time_option(value):
+    try:
+        return check_time_option(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def join_time_options(argv):
+    # argparse takes the relative time of "--since -2h" for an option, "--since=-2h" is read as intended
+    joined = []
+    i = 0
+    while i < len(argv):
+        if argv[i] in TIME_OPTIONS and i + 1 < len(argv) and argv[i + 1].startswith("-") and not argv[i + 1].startswith("--"):
+            joined.append(f"{argv[i]}={argv[i + 1]}")
+            i += 2
+        else:
+            joined.append(argv[i])
+            i += 1
+    return joined
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Flags abnormal pods and related log errors in get-k8s-info output.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes used to scan log files (default: 1)")
+    parser.add_argument("--scan-mode", choices=SCAN_MODES, default=conf.get("scan_mode", "auto"),
+                        help="Read log files line by line (text), through a memory map (mmap), or pick by file size (auto)")
+    parser.add_argument("--no-cache", action="store_true", help="Scan every log file again instead of reusing the results of earlier runs")
+    parser.add_argument("--findings", choices=FINDINGS_FORMATS,
+                        help="Also export every log finding next to the report, as NDJSON or Parquet (needs pyarrow)")
+    parser.add_argument("--since", type=time_option, metavar="TIME",
+                        help="Only analyze the log lines from this time: a timestamp (2025-09-10T14:00:00Z), "
+                             "or relative to the capture time in the case folder name (-2h, -30m, -1d, capture)")
+    parser.add_argument("--until", type=time_option, metavar="TIME", help="Only analyze the log lines up to this time, same formats as --since")
+
+    batch_group = parser.add_argument_group("batch mode", "Analyze many namespaces without any prompt. --workers is the number of namespaces analyzed at once.")
+    batch_group.add_argument("--batch", nargs="+", metavar="PATH",
+                             help="Case folders or bundles (every namespace under kubernetes/) or namespace folders to analyze")
+    batch_group.add_argument("--namespaces", nargs="+", metavar="NAMESPACE", help="Only analyze these namespaces of each case")
+    batch_group.add_argument("--patterns", metavar="FILE", help="Error patterns JSON file (default: the default dictionary)")
+    batch_group.add_argument("--summary", metavar="FILE", help="Path of the JSON summary (default: output/batch_summary_<time>.json)")
+    return parser.parse_args(join_time_options(sys.argv[1:]))
+
+def get_batch_error_patterns(patterns_path):
+    if patterns_path:
+        if not user_dict_has_valid_format(patterns_path):
+            raise SystemExit(f"Invalid error patterns file: {patterns_path}")
+        return load_json_from_path(patterns_path)
+
+    mongo = load_mongodb()
+    error_patterns = mongo.get_default_error_patterns() if mongo else None
+    return error_patterns or conf["log_error_patterns"]
 
-            
 def main():
+    setup_logging()
+    args = parse_args()
+    if not (args.batch and args.patterns):
+        # MongoDB needs the .env file, it is downloaded while the tool starts up
+        start_env_file_download()
+
     # Check if cache.json exists using the relataive path to where this script is located
     logging.info("START")
     manage_log_retention()
     cache = load_cache()
     
+    if args.batch:
+        run_batch(args.batch, get_batch_error_patterns(args.patterns), args.namespaces, args.workers, args.scan_mode,
+                  not args.no_cache, args.summary, args.findings, args.since, args.until)
+        return
+
+    user_id = "default"
     mongo = load_mongodb()
     if mongo:
         error_patterns = mongo.get_default_error_patterns()
@@ -28,48 +96,20 @@ def main():
     else:
         error_patterns = conf["log_error_patterns"]
 
+    # Compile the error patterns once and reuse them for every log file
+    matcher = PatternMatcher(error_patterns)
+
+    scan_cache = None if args.no_cache else open_scan_cache()
 
     case_info_dir = get_case_info_dir_from_user(cache)
 
     namespace_path = get_namespace_path_from_user(case_info_dir)
-    printer = Printer(namespace_path, mode="both")
     record_user_activity(namespace_path)
-    
-    pods_with_errors, pods_without_errors = classify_pods(namespace_path, printer)
 
-    pods_with_errors = analyze_describe_pods_output(namespace_path, pods_with_errors)
-
-    analyze_pods_with_errors(namespace_path, pods_with_errors, printer, error_patterns)
-
-    if pods_with_errors:
-        printer.print_message(f"\nFound {len(pods_with_errors)} pods with issues:")
-        logging.info(f"Found {len(pods_with_errors)} pods with issues:")
-        for pod in pods_with_errors:
-            printer.print_message(f"- {pod.get_pod_name()}")
-            logging.info(f"- {pod.get_pod_name()}")
-
-    if pods_with_errors:
-        print("\nDetails on pods with issues:")
-        for pod in pods_with_errors:
-            pod.print_info()
-
-        all_errors_path = os.path.join(namespace_path, "all_errors.json")
-        clean_errors_output = {}
-
-        for pod in pods_with_errors:
-            flat_errors = []
-            for messages in pod.errors.values():
-                flat_errors.extend(messages)
-            clean_errors_output[pod.name] = flat_errors
-
-        with open(all_errors_path, "w", encoding="utf-8") as f:
-            json.dump(clean_errors_output, f, indent=2)
-
-        print(f"\n Clean errors saved to: {all_errors_path}")
-    
-    error_info_holder = analyze_pods_without_errors(namespace_path, pods_without_errors, printer, error_patterns)
-    error_info_holder.print_pods_by_error_category()
-    error_info_holder.print_containers_by_error_category()
+    report_namespace(namespace_path, matcher, "both", args.workers, args.scan_mode, scan_cache, findings_format=args.findings,
+                     since=args.since, until=args.until)
+    if scan_cache:
+        scan_cache.close()
     
     if user_id != "default":
         confirm_custom_patterns = input("\nDo you want to permanently save the custom error patterns you used? (yes - default/no): ").strip()
@@ -82,7 +122,6 @@ def main():
         logging.info(f"Error patterns has been updated for user {user_id}")
         
         user_defined_dict = mongo.get_user_patterns(user_id)
-        default_log_dict = mongo.get_default_error_patterns()
         
         update_default_flag = False
         new_patterns_added = []
@@ -90,32 +129,13 @@ def main():
         confirm_promotion = input("\nDo you want to update the default dictionary? (yes - default/no): ").strip()
             
         if confirm_promotion in conf["yes_list"]:
-            for category, user_patterns_list in user_defined_dict.items():
-                for user_pattern in user_patterns_list:
-                    # Check if this pattern exists in ANY category of the default dict
-                    exists_anywhere = any(
-                        fuzz.ratio(user_pattern, default_pattern) >= 80
-                        for patterns in default_log_dict.values()
-                        for default_pattern in patterns
-                    )
-
-                    if exists_anywhere:
-                        continue  # Pattern already exists somewhere, then it is skipped
-
-                    # If pattern doesn't exist anywhere, either add to a preexisting category
-                    if category in default_log_dict:
-                        # Category exists → just append
-                        default_log_dict[category].append(user_pattern)
-                        new_patterns_added.append((category, user_pattern))
-                    else:
-                        # Category doesn't exist, then creates new category
-                        default_log_dict[category] = [user_pattern]
-                        new_patterns_added.append((category, user_pattern))
-
-                    update_default_flag = True
+            # Read right before the write, not from the snapshot, so the patterns others promoted meanwhile are compared against
+            default_log_dict = mongo.get_live_default_error_patterns()
+            new_patterns_added = promote_user_patterns(user_defined_dict, default_log_dict)
+            update_default_flag = bool(new_patterns_added)
 
             if update_default_flag:
-                mongo.update_error_patterns(default_log_dict)
+                mongo.add_error_patterns(new_patterns_added)
                 print("\nDefault log dictionary has been updated!")
                 for category, pattern in new_patterns_added:
                     print(f" -[{category}] {pattern}")
@@ -130,4 +150,6 @@ def main():
                     
 
 if __name__ == "__main__":
+    # Worker processes of the frozen executable must not rerun main()
+    multiprocessing.freeze_support()
     main()
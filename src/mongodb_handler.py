@@ -1,33 +1,49 @@
 # mongodb_handler.py
 
+# pymongo, certifi and dotenv are only imported once MongoDB is used, they slow down the start of main.exe
+
 import os
 import ssl
 import sys
-import certifi
-
-from dotenv import load_dotenv
-from pymongo import MongoClient
+import copy
+import json
+import time
+from datetime import datetime
 
 # Custom imports
-from utils import logging, get_env_file, conf
+from utils import logging, wait_for_env_file, conf
+
+# Document of the shared collection whose version is incremented by every dictionary write of CachedMongoHandler
+VERSION_DOCUMENT_TYPE = "dictionaries_version"
 
 
-# Handle certifi in PyInstaller bundle
-ca_bundle = certifi.where()
-if getattr(sys, 'frozen', False):
-    # If running inside PyInstaller
-    base_path = sys._MEIPASS
-    ca_bundle = os.path.join(base_path, "certifi", "cacert.pem")
+def get_ca_bundle():
+    import certifi
 
-print("Using CA bundle:", ca_bundle)
+    # Handle certifi in PyInstaller bundle
+    ca_bundle = certifi.where()
+    if getattr(sys, 'frozen', False):
+        # If running inside PyInstaller
+        base_path = sys._MEIPASS
+        ca_bundle = os.path.join(base_path, "certifi", "cacert.pem")
+
+    print("Using CA bundle:", ca_bundle)
+    return ca_bundle
 
 
 class MongoHandler:
-    def __init__(self, uri, db_name="log_config"):
+    def __init__(self, uri, db_name="log_config", client=None):
+        # client: an already created MongoClient, or a stand-in with the same API
         self.uri = uri
-        self.client = MongoClient(uri,
-                                  tls=True,
-                                tlsCAFile=ca_bundle)
+        if client is None:
+            from pymongo import MongoClient
+
+            ca_bundle = get_ca_bundle()
+            client = MongoClient(uri,
+                                 tls=True,
+                                 tlsCAFile=ca_bundle,
+                                 serverSelectionTimeoutMS=conf.get("mongodb", {}).get("server_selection_timeout_ms", 5000))
+        self.client = client
         self.db = self.client[db_name]
         self.shared_config = self.db["log_error_patterns"]       # Default shared patterns
         self.user_config = self.db["user_error_patterns"]        # User-specific patterns
@@ -40,6 +56,7 @@ class MongoHandler:
         self.client.close()
     
     def open_connection(self):
+        from pymongo import MongoClient
         self.client = MongoClient(self.uri)
 
     # Default Shared Dictionary
@@ -55,6 +72,17 @@ class MongoHandler:
             upsert=True
         )
 
+    def add_error_patterns(self, new_patterns):
+        # new_patterns: (category, pattern) pairs. Added in one write that leaves the patterns other clients added in place.
+        additions = {}
+        for category, pattern in new_patterns:
+            additions.setdefault(f"patterns.{category}", []).append(pattern)
+        self.shared_config.update_one(
+            {"type": "log_error_patterns"},
+            {"$addToSet": {field: {"$each": patterns} for field, patterns in additions.items()}},
+            upsert=True
+        )
+
     def add_error_pattern(self, category, pattern):
         doc = self.shared_config.find_one({"type": "log_error_patterns"})
         if not doc:
@@ -132,22 +160,189 @@ class MongoHandler:
             "log": log_data
         })
         
+def same_patterns(patterns, other_patterns):
+    # Unlike ==, the order of the categories counts, it decides which category a line is reported under
+    return json.dumps(patterns, ensure_ascii=False) == json.dumps(other_patterns, ensure_ascii=False)
+
+
+class CachedMongoHandler:
+    """
+    MongoHandler with a local snapshot of the pattern dictionaries: the default one and the one of every user.
+    On start up only the version stamp is read, the whole snapshot is fetched again (in two queries) when the stamp changed
+    or the snapshot is older than max_age_hours, as writes of older releases do not increment the stamp.
+    Writes that would not change a dictionary are skipped.
+    Without a connection (mongo is None) the last snapshot is used and writes are not saved.
+    """
+    def __init__(self, mongo, snapshot_path, max_age_hours=24):
+        self.mongo = mongo
+        self.snapshot_path = snapshot_path
+        self.max_age = max_age_hours * 3600
+        # {"version": int or None, "refreshed": time.time(), "default": {...}, "users": {user_id: {...}}}
+        self.snapshot = self.load_snapshot()
+        if self.mongo is not None:
+            self.revalidate()
+
+    @property
+    def offline(self):
+        return self.mongo is None
+
+    def load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read the MongoDB snapshot {self.snapshot_path}: {e}")
+            return None
+
+    def save_snapshot(self):
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        with open(f"{self.snapshot_path}.part", "w", encoding="utf-8") as f:
+            json.dump(self.snapshot, f, ensure_ascii=False)
+        os.replace(f"{self.snapshot_path}.part", self.snapshot_path)
+
+    def get_snapshot_time(self):
+        return datetime.fromtimestamp(self.snapshot["refreshed"]).strftime(conf.get("output_timestamp_format", "%Y-%m-%d %H:%M:%S"))
+
+    def get_version(self):
+        doc = self.mongo.shared_config.find_one({"type": VERSION_DOCUMENT_TYPE})
+        return doc["version"] if doc else 0
+
+    def revalidate(self):
+        version = self.get_version()
+        if self.snapshot and self.snapshot["version"] == version and time.time() - self.snapshot["refreshed"] < self.max_age:
+            logging.info(f"MongoDB snapshot {self.snapshot_path} is up to date (version {version})")
+            return
+        self.refresh(version)
+
+    def refresh(self, version):
+        users = {doc["user_id"]: doc.get("patterns", {}) for doc in self.mongo.user_config.find({}, {"_id": 0, "user_id": 1, "patterns": 1})}
+        self.snapshot = {"version": version, "refreshed": time.time(), "default": self.mongo.get_default_error_patterns(), "users": users}
+        self.save_snapshot()
+        logging.info(f"MongoDB snapshot {self.snapshot_path} refreshed (version {version}, {len(users)} users)")
+
+    def can_write(self, description):
+        if self.offline:
+            print(f"MongoDB is not reachable, {description} was not saved.")
+            logging.warning(f"MongoDB is not reachable, {description} was not saved.")
+        return not self.offline
+
+    def bump_version(self):
+        from pymongo import ReturnDocument
+
+        doc = self.mongo.shared_config.find_one_and_update({"type": VERSION_DOCUMENT_TYPE}, {"$inc": {"version": 1}}, upsert=True,
+                                                           return_document=ReturnDocument.AFTER)
+        # Another client wrote since the snapshot was taken, the next run fetches everything again
+        self.snapshot["version"] = doc["version"] if doc["version"] == (self.snapshot["version"] or 0) + 1 else None
+        self.save_snapshot()
+
+    def close_connection(self):
+        if self.mongo is not None:
+            self.mongo.close_connection()
+
+    # Default Shared Dictionary
+
+    def get_default_error_patterns(self):
+        # Copies, the callers change the dictionaries they get
+        return copy.deepcopy(self.snapshot["default"])
+
+    def get_live_default_error_patterns(self):
+        # The default dictionary as it is in MongoDB now, for changes based on it. The snapshot when offline.
+        if not self.offline:
+            self.snapshot["default"] = self.mongo.get_default_error_patterns()
+            self.save_snapshot()
+        return self.get_default_error_patterns()
+
+    def update_error_patterns(self, new_patterns):
+        if same_patterns(new_patterns, self.snapshot["default"]):
+            logging.info("Default error patterns unchanged, skipping the write")
+            return
+        if self.can_write("the default error patterns"):
+            self.mongo.update_error_patterns(new_patterns)
+            self.snapshot["default"] = copy.deepcopy(new_patterns)
+            self.bump_version()
+
+    def add_error_patterns(self, new_patterns):
+        # See MongoHandler.add_error_patterns, the snapshot takes the dictionary as it is after the write
+        if new_patterns and self.can_write(f"{len(new_patterns)} new default error patterns"):
+            self.mongo.add_error_patterns(new_patterns)
+            self.snapshot["default"] = self.mongo.get_default_error_patterns()
+            self.bump_version()
+
+    def add_error_pattern(self, category, pattern):
+        if self.can_write(f"pattern {pattern}"):
+            self.mongo.add_error_pattern(category, pattern)
+            self.snapshot["default"] = self.mongo.get_default_error_patterns()
+            self.bump_version()
+
+    # User-Specific Dictionary
+
+    def get_all_users(self):
+        return list(self.snapshot["users"])
+
+    def user_exists(self, user_id):
+        return user_id in self.snapshot["users"]
+
+    def add_document(self, user_id, patterns={}):
+        if self.can_write(f"user {user_id}"):
+            self.mongo.add_document(user_id, patterns)
+            self.snapshot["users"][user_id] = copy.deepcopy(patterns)
+            self.bump_version()
+
+    def ensure_user_document(self, user_id):
+        if not self.user_exists(user_id):
+            print(f"User ID {user_id} has no error patterns saved. ")
+            self.add_document(user_id)
+
+    def get_user_patterns(self, user_id):
+        return copy.deepcopy(self.snapshot["users"].get(user_id, {}))
+
+    def update_user_patterns(self, user_id, new_patterns):
+        if user_id in self.snapshot["users"] and same_patterns(new_patterns, self.snapshot["users"][user_id]):
+            logging.info(f"Error patterns of user {user_id} unchanged, skipping the write")
+            return
+        if self.can_write(f"the error patterns of user {user_id}"):
+            self.mongo.update_user_patterns(user_id, new_patterns)
+            self.snapshot["users"][user_id] = copy.deepcopy(new_patterns)
+            self.bump_version()
+
+    def add_user_error_pattern(self, user_id, category, pattern):
+        if self.can_write(f"pattern {pattern} of user {user_id}"):
+            self.mongo.add_user_error_pattern(user_id, category, pattern)
+            self.snapshot["users"][user_id] = self.mongo.get_user_patterns(user_id)
+            self.bump_version()
+
+    def save_log_result(self, pod_name, log_data):
+        if self.can_write(f"the log result of {pod_name}"):
+            self.mongo.save_log_result(pod_name, log_data)
+
+
+def get_snapshot_settings():
+    mongodb_conf = conf.get("mongodb", {})
+    return (os.path.join(conf["output_folder"], mongodb_conf.get("snapshot_file", "mongodb_snapshot.json")),
+            mongodb_conf.get("snapshot_max_age_hours", 24))
+
 def load_mongodb():
+    # Returns a CachedMongoHandler, offline when MongoDB is not reachable but a snapshot exists, or None
+    snapshot_path, max_age_hours = get_snapshot_settings()
     try:
-        get_env_file() 
+        wait_for_env_file()
+        from dotenv import load_dotenv
         load_dotenv()
         mongo_uri = os.getenv("MONGODB_URI")
 
         if not mongo_uri:
-            print("MongoDB URI not found in environment variables.")
-            logging.error("MongoDB URI not found in environment variables.")
-        else:
+            raise ValueError("MongoDB URI not found in environment variables")
+
+        return CachedMongoHandler(MongoHandler(uri=mongo_uri), snapshot_path, max_age_hours)
 
-            mongo = MongoHandler(uri=mongo_uri)
-    
     except Exception as e:
+        offline_mongo = CachedMongoHandler(None, snapshot_path, max_age_hours)
+        if offline_mongo.snapshot:
+            print(f"Error loading MongoDB configuration: {e}.\nUsing the error patterns saved locally on {offline_mongo.get_snapshot_time()}.")
+            logging.error(f"Error loading MongoDB configuration: {e}. Using the snapshot {snapshot_path} from {offline_mongo.get_snapshot_time()}.")
+            return offline_mongo
         print(f"Error loading MongoDB configuration: {e}.\nUsing default patterns from conf.json.")
         logging.error(f"Error loading MongoDB configuration: {e}. Using default patterns from conf.json.")
         return None
-    
-    return mongo
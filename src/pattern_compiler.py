@@ -0,0 +1,184 @@
+# pattern_compiler.py
+# Compiles the entries of an error patterns dict. An entry is either a plain string, found as a substring like before,
+# or an object:
+#   {"literal": "text", "ignore_case": true}    substring, optionally ignoring case
+#   {"regex": "expression", "ignore_case": true} re.search on the line
+#   {"all": [entry, ...]}                        every entry is in the line
+#   {"not": entry}                               in a category: lines with the entry are not reported under it,
+#                                                in an "all" list: the entry is not in the line
+# Every entry gets prefilter literals, one of which is in any line it matches, so it only runs on the lines
+# the Aho-Corasick automaton found them in. An entry without any (e.g. the regex "\d+$") runs on every line.
+
+import re
+import json
+
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+REPEAT_OPCODES = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, "POSSESSIVE_REPEAT", None)}
+ENTRY_OPTIONS = {"ignore_case"}
+
+
+def get_entry_key(entry):
+    """
+    Identifies an entry, e.g. in the scan cache. A plain string is its own key, an object is its sorted JSON
+    with a leading NUL, so it can never be taken for a plain string.
+    """
+    if isinstance(entry, str):
+        return entry
+    return "\0" + json.dumps(entry, sort_keys=True, ensure_ascii=False)
+
+def validate_entry(entry):
+    # Returns why entry is not a valid error pattern, or None
+    try:
+        compile_entry(entry)
+    except (ValueError, TypeError, re.error) as e:
+        return str(e)
+    return None
+
+
+class LiteralMatch:
+    def __init__(self, literal):
+        self.literal = literal
+
+    def __call__(self, line):
+        return self.literal in line
+
+class LoweredLiteralMatch:
+    def __init__(self, lowered):
+        self.lowered = lowered
+
+    def __call__(self, line):
+        return self.lowered in line.lower()
+
+class RegexMatch:
+    def __init__(self, regex):
+        self.regex = regex
+
+    def __call__(self, line):
+        return self.regex.search(line) is not None
+
+class NotMatch:
+    def __init__(self, inner):
+        self.inner = inner
+
+    def __call__(self, line):
+        return not self.inner.matches(line)
+
+class AllMatch:
+    def __init__(self, parts):
+        self.parts = parts
+
+    def __call__(self, line):
+        return all(part.matches(line) for part in self.parts)
+
+
+class CompiledEntry:
+    """
+    key: see get_entry_key.
+    matches: line -> bool, one of the *Match classes above. Unlike closures they can be pickled,
+    the matcher is sent to the worker processes of log_scanner and batch.
+    literal: the substring of a plain string entry, which the automaton finds by itself. None for the other entries.
+    prefilter: (literal, lowercase) pairs, any line the entry matches contains one of the literals (in the lowercased
+    line when lowercase is True). None when there are none and the entry is tested on every line.
+    """
+    def __init__(self, entry, key, matches, literal=None, prefilter=None):
+        self.entry = entry
+        self.key = key
+        self.matches = matches
+        self.literal = literal
+        self.prefilter = prefilter
+
+
+def compile_entry(entry):
+    key = get_entry_key(entry)
+    if isinstance(entry, str):
+        return CompiledEntry(entry, key, LiteralMatch(entry), literal=entry, prefilter=((entry, False),))
+    if not isinstance(entry, dict):
+        raise TypeError(f"An error pattern must be a string or an object, not {type(entry).__name__}: {entry!r}")
+
+    kinds = [kind for kind in ("literal", "regex", "all", "not") if kind in entry]
+    unknown_keys = set(entry) - {"literal", "regex", "all", "not"} - ENTRY_OPTIONS
+    if len(kinds) != 1 or unknown_keys:
+        raise ValueError(f"An error pattern object needs exactly one of literal, regex, all or not (and optionally ignore_case): {entry!r}")
+    kind = kinds[0]
+    ignore_case = entry.get("ignore_case", False)
+    if not isinstance(ignore_case, bool):
+        raise ValueError(f"ignore_case must be true or false: {entry!r}")
+
+    if kind == "literal":
+        literal = entry["literal"]
+        if not isinstance(literal, str):
+            raise ValueError(f"literal must be a string: {entry!r}")
+        if not ignore_case:
+            # Same as the plain string
+            return CompiledEntry(entry, key, LiteralMatch(literal), literal=literal, prefilter=((literal, False),))
+        lowered = literal.lower()
+        return CompiledEntry(entry, key, LoweredLiteralMatch(lowered), prefilter=((lowered, True),))
+
+    if kind == "regex":
+        if not isinstance(entry["regex"], str):
+            raise ValueError(f"regex must be a string: {entry!r}")
+        flags = re.IGNORECASE if ignore_case else 0
+        regex = re.compile(entry["regex"], flags)
+        return CompiledEntry(entry, key, RegexMatch(regex), prefilter=get_regex_prefilter(entry["regex"], flags))
+
+    if ignore_case:
+        raise ValueError(f"ignore_case only applies to literal and regex: {entry!r}")
+
+    if kind == "not":
+        inner = compile_entry(entry["not"])
+        return CompiledEntry(entry, key, NotMatch(inner))
+
+    if not isinstance(entry["all"], list):
+        raise ValueError(f"all must be a list of error patterns: {entry!r}")
+    parts = [compile_entry(part) for part in entry["all"]]
+    # Every part is in the line, so the prefilter of any one of them will do
+    return CompiledEntry(entry, key, AllMatch(parts), prefilter=choose_prefilter(part.prefilter for part in parts))
+
+
+def choose_prefilter(prefilters):
+    # The most selective one: the one whose shortest literal is the longest
+    best = None
+    for prefilter in prefilters:
+        if prefilter and (best is None or min(len(literal) for literal, _ in prefilter) > min(len(literal) for literal, _ in best)):
+            best = prefilter
+    return best
+
+def get_regex_prefilter(expression, flags):
+    parsed = sre_parse.parse(expression, flags)
+    # Inline (?i) at the start applies to the whole expression
+    lowercase = bool(parsed.state.flags & re.IGNORECASE)
+    prefilter = get_sequence_prefilter(list(parsed), lowercase)
+    if prefilter and any(literal == "" for literal, _ in prefilter):
+        return None
+    return prefilter
+
+def get_sequence_prefilter(items, lowercase):
+    # Literals, one of which is in every string the sequence of parsed items matches
+    candidates = []
+    run = []
+    for op, argument in items + [(None, None)]:
+        if op is sre_constants.LITERAL:
+            run.append(chr(argument))
+            continue
+        if run:
+            literal = "".join(run)
+            candidates.append(((literal.lower() if lowercase else literal, lowercase),))
+            run = []
+
+        if op is sre_constants.SUBPATTERN:
+            _, add_flags, del_flags, sub_items = argument
+            # A case-insensitive group is only usable when the whole expression ignores case
+            if lowercase or not add_flags & re.IGNORECASE:
+                candidates.append(get_sequence_prefilter(list(sub_items), lowercase))
+        elif op is sre_constants.BRANCH:
+            alternatives = [get_sequence_prefilter(list(branch), lowercase) for branch in argument[1]]
+            if all(alternatives):
+                candidates.append(tuple(dict.fromkeys(pair for alternative in alternatives for pair in alternative)))
+        elif op in REPEAT_OPCODES and argument[0] >= 1:
+            candidates.append(get_sequence_prefilter(list(argument[2]), lowercase))
+    return choose_prefilter(candidates)
@@ -0,0 +1,303 @@
+# pattern_matcher.py
+
+import json
+import hashlib
+from collections import deque
+
+# Custom imports
+from utils import logging
+from pattern_compiler import compile_entry
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+class PatternMatcher:
+    """
+    Aho-Corasick matcher compiled once from an error_patterns dict ({category: [patterns]}).
+    match(line) returns the first category (in dict order) with any pattern in the line,
+    match_all(line) returns every category with a pattern in the line, also in dict order.
+    """
+    def __init__(self, error_patterns, use_native=True, log=True):
+        self.error_patterns = error_patterns
+        self.categories = list(error_patterns.keys())
+        # Identifies the patterns and their order, e.g. for the scan cache
+        self.fingerprint = hashlib.sha256(json.dumps(error_patterns, ensure_ascii=False).encode("utf-8")).hexdigest()
+        # Set for dictionaries with object entries (regex, ignore_case, all, not), see pattern_compiler
+        self.plan = None
+
+        if not all(isinstance(pattern, str) for patterns in error_patterns.values() for pattern in patterns):
+            self.plan = MatchPlan(error_patterns, use_native)
+            self.pattern_indexes = self.plan.positive_indexes
+            self.always_indexes = []
+            self.always_index = None
+            self.encoded_patterns = []
+            self.native = self.plan.literal_matcher.native
+            if log:
+                logging.info(f"Compiled {len(self.plan.entries)} error patterns in {len(self.categories)} categories "
+                             f"({len(self.plan.literal_keys)} prefilter literals, {len(self.plan.unfiltered_keys)} patterns tested on every line, "
+                             f"{'pyahocorasick' if self.native else 'pure Python'} matcher)")
+            return
+
+        # Category indexes of every pattern, in dict order
+        self.pattern_indexes = {}
+        for index, patterns in enumerate(error_patterns.values()):
+            for pattern in patterns:
+                indexes = self.pattern_indexes.setdefault(pattern, [])
+                if index not in indexes:
+                    indexes.append(index)
+
+        # An empty pattern is found in every line
+        self.always_indexes = self.pattern_indexes.pop("", [])
+        self.always_index = self.always_indexes[0] if self.always_indexes else None
+
+        # Used when searching raw log bytes, see find_candidate_lines
+        self.encoded_patterns = [pattern.encode("utf-8") for pattern in self.pattern_indexes]
+
+        self.native = use_native and ahocorasick is not None and bool(self.pattern_indexes)
+        if self.native:
+            self.build_native()
+        else:
+            self.build_fallback()
+
+        if log:
+            logging.info(f"Compiled {len(self.pattern_indexes)} error patterns in {len(self.categories)} categories "
+                         f"({'pyahocorasick' if self.native else 'pure Python'} matcher)")
+
+    @property
+    def scans_every_line(self):
+        # Some pattern is tested on every line, which rules out the memory-mapped scan and the scan cache
+        if self.plan is not None:
+            return True if self.plan.unfiltered_keys else "" in self.plan.literal_keys
+        return bool(self.always_indexes)
+
+    @property
+    def pattern_keys(self):
+        # Keys of every pattern the categories depend on, see pattern_compiler.get_entry_key
+        if self.plan is not None:
+            return list(self.plan.entries)
+        return list(self.pattern_indexes)
+
+    def get_entry(self, key):
+        # The pattern with this key, the excluded pattern itself for a "not" entry
+        if self.plan is not None:
+            return self.plan.entries[key].entry
+        return key
+
+    def get_key_indexes(self, keys):
+        # Sorted indexes of the categories matched by a line that contains the patterns with these keys
+        if self.plan is not None:
+            return self.plan.get_indexes(keys)
+        return sorted({index for key in keys for index in self.pattern_indexes[key]})
+
+    def build_native(self):
+        self.automaton = ahocorasick.Automaton()
+        for pattern, indexes in self.pattern_indexes.items():
+            self.automaton.add_word(pattern, (indexes[0], tuple(indexes)))
+        self.automaton.make_automaton()
+
+    def build_fallback(self):
+        # Trie of goto transitions and failure links. Each state keeps the lowest category index
+        # and every category index reachable from it through the failure links.
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [None]
+        self.output_all = [()]
+
+        for pattern, indexes in self.pattern_indexes.items():
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(None)
+                    self.output_all.append(())
+                    self.goto[state][char] = next_state
+                state = next_state
+            self.output[state] = indexes[0]
+            self.output_all[state] = tuple(indexes)
+
+        # Breadth first so the failure state is always resolved before its children
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail_state = self.fail[state]
+                while fail_state and char not in self.goto[fail_state]:
+                    fail_state = self.fail[fail_state]
+                fail_state = self.goto[fail_state].get(char, 0)
+                self.fail[next_state] = fail_state
+
+                fail_output = self.output[fail_state]
+                if fail_output is not None and (self.output[next_state] is None or fail_output < self.output[next_state]):
+                    self.output[next_state] = fail_output
+                if self.output_all[fail_state]:
+                    self.output_all[next_state] = tuple(sorted(set(self.output_all[next_state] + self.output_all[fail_state])))
+
+    def match_index(self, line):
+        if self.plan is not None:
+            indexes = self.plan.match_indexes(line)
+            return indexes[0] if indexes else None
+
+        best = self.always_index
+        if best == 0:
+            return best
+
+        if self.native:
+            for _, (index, _) in self.automaton.iter(line):
+                if best is None or index < best:
+                    best = index
+                    if best == 0:
+                        break
+            return best
+
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        state = 0
+        for char in line:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            index = output[state]
+            if index is not None and (best is None or index < best):
+                best = index
+                if best == 0:
+                    break
+        return best
+
+    def match_indexes(self, line):
+        if self.plan is not None:
+            return self.plan.match_indexes(line)
+
+        found = set(self.always_indexes)
+
+        if self.native:
+            for _, (_, indexes) in self.automaton.iter(line):
+                found.update(indexes)
+            return sorted(found)
+
+        goto = self.goto
+        fail = self.fail
+        output_all = self.output_all
+        state = 0
+        for char in line:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output_all[state]:
+                found.update(output_all[state])
+        return sorted(found)
+
+    def match(self, line):
+        index = self.match_index(line)
+        return None if index is None else self.categories[index]
+
+    def match_all(self, line):
+        return [self.categories[index] for index in self.match_indexes(line)]
+
+    def find_candidate_lines(self, chunk):
+        """
+        Returns the sorted start offsets of the lines in chunk that contain a pattern.
+        chunk is a block of whole lines, str for the native matcher and bytes otherwise.
+        The lines still have to be confirmed with match()/match_all().
+        Only for plain string dictionaries (plan is None).
+        """
+        line_starts = set()
+        if isinstance(chunk, str):
+            newline = "\n"
+            patterns = self.pattern_indexes
+        else:
+            newline = b"\n"
+            patterns = self.encoded_patterns
+
+        if self.native and isinstance(chunk, str):
+            for end_index, _ in self.automaton.iter(chunk):
+                line_starts.add(chunk.rfind(newline, 0, end_index) + 1)
+            return sorted(line_starts)
+
+        for pattern in patterns:
+            position = chunk.find(pattern)
+            while position != -1:
+                line_starts.add(chunk.rfind(newline, 0, position) + 1)
+                # The rest of this line is already a candidate
+                line_end = chunk.find(newline, position + len(pattern) - 1)
+                if line_end == -1:
+                    break
+                position = chunk.find(pattern, line_end + 1)
+        return sorted(line_starts)
+
+
+class MatchPlan:
+    """
+    Matching plan of an error patterns dict with object entries, see pattern_compiler.
+    One automaton finds the plain strings and the prefilter literals of the other entries in the line, a second one
+    the lowercased prefilter literals in the lowercased line. The other entries are only tested on the lines
+    with one of their prefilter literals, or on every line when they have none.
+    A category matches a line with one of its entries and none of its "not" entries.
+    """
+    def __init__(self, error_patterns, use_native=True):
+        # {key: CompiledEntry}, the entries and the excluded entries of every category
+        self.entries = {}
+        # {key: [category indexes]}, in dict order
+        self.positive_indexes = {}
+        self.exclusion_indexes = {}
+        for index, patterns in enumerate(error_patterns.values()):
+            for pattern in patterns:
+                # Validates the whole entry first, {"not": ...} with other keys is an error
+                compiled = compile_entry(pattern)
+                key_indexes = self.positive_indexes
+                if isinstance(pattern, dict) and "not" in pattern:
+                    compiled = compile_entry(pattern["not"])
+                    key_indexes = self.exclusion_indexes
+                self.entries.setdefault(compiled.key, compiled)
+                indexes = key_indexes.setdefault(compiled.key, [])
+                if index not in indexes:
+                    indexes.append(index)
+
+        # {literal: [keys of the entries to test when the literal is found]}
+        self.literal_keys = {}
+        self.lowered_literal_keys = {}
+        self.unfiltered_keys = []
+        for key, compiled in self.entries.items():
+            if compiled.prefilter is None:
+                self.unfiltered_keys.append(key)
+                continue
+            for literal, lowercase in compiled.prefilter:
+                literal_keys = self.lowered_literal_keys if lowercase else self.literal_keys
+                literal_keys.setdefault(literal, []).append(key)
+
+        self.literal_matcher = PatternMatcher({literal: [literal] for literal in self.literal_keys}, use_native, log=False)
+        self.lowered_literal_matcher = None
+        if self.lowered_literal_keys:
+            self.lowered_literal_matcher = PatternMatcher({literal: [literal] for literal in self.lowered_literal_keys}, use_native, log=False)
+
+    def find_keys(self, line):
+        found = set()
+        candidates = set(self.unfiltered_keys)
+        for literal in self.literal_matcher.match_all(line):
+            for key in self.literal_keys[literal]:
+                # Plain strings are confirmed by the automaton
+                if self.entries[key].literal is not None:
+                    found.add(key)
+                else:
+                    candidates.add(key)
+        if self.lowered_literal_matcher is not None:
+            for literal in self.lowered_literal_matcher.match_all(line.lower()):
+                candidates.update(self.lowered_literal_keys[literal])
+        found.update(key for key in candidates if key not in found and self.entries[key].matches(line))
+        return found
+
+    def get_indexes(self, keys):
+        indexes = {index for key in keys for index in self.positive_indexes.get(key, ())}
+        if indexes and self.exclusion_indexes:
+            indexes.difference_update(index for key in keys for index in self.exclusion_indexes.get(key, ()))
+        return sorted(indexes)
+
+    def match_indexes(self, line):
+        return self.get_indexes(self.find_keys(line))
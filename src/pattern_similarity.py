@@ -0,0 +1,76 @@
+# pattern_similarity.py
+# Near duplicate detection for the promotion of user patterns to the default dictionary
+
+from bisect import bisect_left, bisect_right
+
+# Custom imports
+from pattern_compiler import get_entry_key
+
+# Patterns with fuzz.ratio(a, b) >= SIMILARITY_THRESHOLD are near duplicates.
+# thefuzz rounds the rapidfuzz score, so round(score) >= 80 is the same as score >= 79.5
+SIMILARITY_THRESHOLD = 80
+SCORE_CUTOFF = SIMILARITY_THRESHOLD - 0.5
+
+
+class PatternSimilarityIndex:
+    """
+    Patterns sorted by length, to find whether any of them is a near duplicate of a new pattern.
+    fuzz.ratio is at most 200 * shorter length / (sum of both lengths), so only the patterns of a similar length can reach
+    the threshold. They are compared in a single rapidfuzz call that stops at the first one above the cutoff.
+    """
+    def __init__(self, patterns=()):
+        # Imported here, the promotion is the only user
+        from rapidfuzz import fuzz, process
+        self.ratio = fuzz.ratio
+        self.extract_one = process.extractOne
+
+        self.lengths = []
+        self.patterns = []
+        self.pattern_set = set()
+        for pattern in patterns:
+            self.add(pattern)
+
+    def add(self, pattern):
+        index = bisect_right(self.lengths, len(pattern))
+        self.lengths.insert(index, len(pattern))
+        self.patterns.insert(index, pattern)
+        self.pattern_set.add(pattern)
+
+    def has_similar(self, pattern):
+        if pattern in self.pattern_set:
+            return True
+        length = len(pattern)
+        # 200 * min(length, other) / (length + other) >= 79.5 for lengths between 159/241 and 241/159 of length,
+        # widened by one for the float rounding of the score
+        shortest = -(-159 * length // 241) - 1
+        longest = 241 * length // 159 + 1
+        candidates = self.patterns[bisect_left(self.lengths, shortest):bisect_right(self.lengths, longest)]
+        if not candidates:
+            return False
+        return self.extract_one(pattern, candidates, scorer=self.ratio, processor=None, score_cutoff=SCORE_CUTOFF) is not None
+
+
+def promote_user_patterns(user_patterns, default_patterns):
+    """
+    Adds every pattern of user_patterns that has no near duplicate in any category of default_patterns to its category,
+    creating the category when needed. default_patterns is changed in place, and a pattern added this way
+    counts as a near duplicate for the next ones. Returns the (category, pattern) pairs added.
+    """
+    index = PatternSimilarityIndex(pattern for patterns in default_patterns.values() for pattern in patterns if isinstance(pattern, str))
+    # Object entries (see pattern_compiler) are only skipped when the same entry exists
+    entry_keys = {get_entry_key(pattern) for patterns in default_patterns.values() for pattern in patterns if not isinstance(pattern, str)}
+    new_patterns_added = []
+    for category, patterns in user_patterns.items():
+        for pattern in patterns:
+            if isinstance(pattern, str) and index.has_similar(pattern):
+                continue  # Pattern already exists somewhere, then it is skipped
+            if not isinstance(pattern, str) and get_entry_key(pattern) in entry_keys:
+                continue
+
+            default_patterns.setdefault(category, []).append(pattern)
+            if isinstance(pattern, str):
+                index.add(pattern)
+            else:
+                entry_keys.add(get_entry_key(pattern))
+            new_patterns_added.append((category, pattern))
+    return new_patterns_added
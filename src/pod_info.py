@@ -1,26 +1,48 @@
 #pod_info.py
 import re
 import os
-import json
 
 # Custom imports
 from utils import logging, pluralize
+from case_bundle import build_log_index, path_exists
 from printer import Printer
 from cleaner import clean_log, normalize_logs
-from error_message import format_timestamp, parse_non_json_logs, get_full_error_message
+from error_message import format_timestamp
+from json_backend import loads
+
+
+class PodError:
+    """
+    One issue of a pod: a matched line of a log file (with its category and timestamp),
+    or a line of get/pods.txt or describe/pods.txt. str() gives the line shown in reports.
+    """
+    __slots__ = ("line_number", "message", "category", "timestamp")
+
+    def __init__(self, line_number, message, category=None, timestamp=None):
+        self.line_number = line_number
+        self.message = message
+        self.category = category
+        self.timestamp = timestamp
+
+    def __str__(self):
+        if self.category is None:
+            return f"{self.line_number}: {self.message}"
+        return f"{self.line_number}: [{self.category}] {self.timestamp} - {self.message}"
 
 
 class PodInfo:
-    def __init__(self, name, status, node, namespace_path, printer):
+    def __init__(self, name, status, node, namespace_path, printer=None, log_index=None):
         self.name = name
+        # The classification of the pod: the get pods error pattern it matched, or "No Issues"
         self.status = status
         self.node = node
         self.namespace_path = namespace_path
+        # {filename: [PodError]}
         self.errors = {}
         self.logs = []
         self.seen_messages = {}
         self.printer = printer
-        self.get_log_files()
+        self.get_log_files(log_index)
         
     #extracts JSON messages from log lines, unless it fails
     def parse_json_message(self, line: str, category: str) -> str:
@@ -31,7 +53,7 @@ class PodInfo:
                 return f"[{category}] {line.strip()}"
 
             json_part = match.group(1)
-            log_json = json.loads(json_part)
+            log_json = loads(json_part)
             # Extract timestamp and message
             timestamp = log_json.get("timeStamp", "unknown-time")
             message = log_json.get("message", log_json.get("messageKey", "no-message"))
@@ -44,60 +66,65 @@ class PodInfo:
 
 
     def add_error(self, filename, error):
+        # error is a PodError
         if filename not in self.errors:
             self.errors[filename] = []
         self.errors[filename].append(error)
 
-    def add_error_once_by_message(self, filename, category, line, line_number):
-        try:
-            log_json = json.loads(line.strip())
-            raw_message = get_full_error_message(line)
-            timestamp = log_json.get("timeStamp", "unknown-time")
-        except json.JSONDecodeError:
-            timestamp, raw_message = parse_non_json_logs(line.strip())
+    def add_error_once_by_message(self, filename, category, log_record, line_number):
+        # log_record comes from parse_log_line
+        timestamp = log_record.timestamp
+        raw_message = log_record.display_message
 
         # normalize
         cleaned = clean_log(raw_message)
         dedup_key = normalize_logs(cleaned)  # strips timestamp/dynamic parts
 
-        # prints timestamp
-        formatted_error = f"{line_number}: [{category}] {format_timestamp(timestamp)} - {cleaned}"
-
-        existing = self.seen_messages.get(dedup_key)
-
-        # If timestamp is new it is changed
-        if not existing or timestamp > existing[0]:
-            self.seen_messages[dedup_key] = (timestamp, formatted_error)
-
-        # Always rebuild the file's error list from seen_messages
-        self.errors[filename] = [entry[1] for entry in self.seen_messages.values()]
-
-
-    def print_info(self):
-        self.printer.print_message("-" * 20)
-        self.printer.print_message(f"Pod Name: {self.name}")
-        self.printer.print_message(f"Status: {self.status}")
-        self.printer.print_message(f"Node: {self.node}")
-        self.printer.print_message(f"Log Files:")
+        pod_error = PodError(line_number, cleaned, category, format_timestamp(timestamp))
+
+        # {filename: {dedup_key: (timestamp, position in self.errors[filename])}}
+        file_messages = self.seen_messages.setdefault(filename, {})
+        file_errors = self.errors.setdefault(filename, [])
+        existing = file_messages.get(dedup_key)
+
+        # If timestamp is new it is changed in place, so the file keeps its first-seen order
+        if not existing:
+            file_messages[dedup_key] = (timestamp, len(file_errors))
+            file_errors.append(pod_error)
+        elif timestamp > existing[0]:
+            file_messages[dedup_key] = (timestamp, existing[1])
+            file_errors[existing[1]] = pod_error
+
+
+    def print_info(self, printer=None):
+        printer = printer or self.printer
+        printer.print_message("-" * 20)
+        printer.print_message(f"Pod Name: {self.name}")
+        printer.print_message(f"Status: {self.status}")
+        printer.print_message(f"Node: {self.node}")
+        printer.print_message(f"Log Files:")
         for log in self.logs:
-            self.printer.print_message(f"- {log}")
-        self.printer.print_message("\nDetails:")
+            printer.print_message(f"- {log}")
+        printer.print_message("\nDetails:")
         if self.errors:
             for filename, errors in self.errors.items():
-                self.printer.print_message(f"\n{pluralize(len(errors), 'Issue')} in {filename}:")
+                printer.print_message(f"\n{pluralize(len(errors), 'Issue')} in {filename}:")
                 for error in errors:
-                    self.printer.print_message(f"  - {error}")
+                    printer.print_message(f"  - {error}")
         else:
-            self.printer.print_message("No additional details available.")
+            printer.print_message("No additional details available.")
 
-        self.printer.print_message("-" * 20)
+        printer.print_message("-" * 20)
     
-    def get_log_files(self):
+    def get_log_files(self, log_index=None):
+        # log_index is built once per namespace by classify_pods, see build_log_index
         self.pod_logs_files_path = os.path.join(self.namespace_path, 'logs')
-        if os.path.exists(self.pod_logs_files_path):
-            self.logs = [os.path.join(self.pod_logs_files_path, f) for f in os.listdir(self.pod_logs_files_path) if f.startswith(self.name)]
+        if log_index is not None:
+            self.logs = list(log_index.get(self.name, []))
+        elif path_exists(self.pod_logs_files_path):
+            self.logs = list(build_log_index(self.pod_logs_files_path).get(self.name, []))
         else:
-            print(f"No logs directory found for {self.name} at {self.pod_logs_files_path}.\n")
+            logging.warning(f"No logs directory found for {self.name} at {self.pod_logs_files_path}.")
     
     def print_pod_name(self):
         print(self.name)
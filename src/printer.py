@@ -2,6 +2,8 @@
 
 import os
 import json
+import time
+import atexit
 from datetime import datetime
 
 # Custom imports
@@ -12,7 +14,7 @@ DATETIME_FORMAT = "%Y%m%d_%H%M%S"
 
 
 class Printer:
-    def __init__(self, namespace_path, mode="both"):
+    def __init__(self, namespace_path, mode="both", file_suffix=""):
         namespace_path = namespace_path
         namespace = os.path.basename(namespace_path)
         try:
@@ -25,18 +27,52 @@ class Printer:
         assert mode in PRINTER_MODE, f"Invalid printer mode: {mode}. Choose from {PRINTER_MODE}."
         self.mode = mode
         os.makedirs(os.path.join("output", case_number), exist_ok=True)
-        self.file_path = os.path.join(case_number, f"auto_k8s_{namespace}_{datetime.now().strftime(DATETIME_FORMAT)}.txt") if mode in ["file", "both"] else None
+        self.file_path = os.path.join(case_number, f"auto_k8s_{namespace}_{datetime.now().strftime(DATETIME_FORMAT)}{file_suffix}.txt") if mode in ["file", "both"] else None
         
         if not os.path.exists(conf['output_folder']):
             os.makedirs(conf['output_folder'])
         self.file_path = os.path.join(conf['output_folder'], self.file_path) if mode in ["file", "both"] else None
 
         logging.info(f"Printer file path set to: {self.file_path}")
-    
+
+        # The report file is opened once and flushed every flush_size_bytes or flush_interval_seconds
+        printer_conf = conf.get("printer", {})
+        self.flush_size = printer_conf.get("flush_size_bytes", 65536)
+        self.flush_interval = printer_conf.get("flush_interval_seconds", 5)
+        self.file = None
+        self.pending_size = 0
+        self.last_flush = time.monotonic()
+        if self.file_path:
+            atexit.register(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def write_to_file(self, message):
         if self.file_path:
-            with open(self.file_path, 'a', encoding='utf-8') as file:
-                file.write(message + '\n')
+            if self.file is None:
+                self.file = open(self.file_path, 'a', encoding='utf-8', buffering=max(self.flush_size, 1))
+            self.file.write(message + '\n')
+            self.pending_size += len(message) + 1
+            if self.pending_size >= self.flush_size or time.monotonic() - self.last_flush >= self.flush_interval:
+                self.flush()
+
+    def flush(self):
+        if self.file:
+            self.file.flush()
+        self.pending_size = 0
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        if self.file:
+            self.flush()
+            self.file.close()
+            self.file = None
+        # Otherwise the atexit registry keeps every closed Printer of a batch alive
+        atexit.unregister(self.close)
     
     def print_message(self, message, print_level=1, end_=None, flush_=False):
         if conf['print_level'] >= print_level:
@@ -46,5 +82,5 @@ class Printer:
                 case "file":
                     self.write_to_file(message)
                 case "both":
-                    print(message)
+                    print(message, end=end_, flush=flush_)
                     self.write_to_file(message)
@@ -0,0 +1,60 @@
+# report.py
+# Renders a NamespaceAnalysis (see analyzer.py) as the text report and all_errors.json
+
+import os
+import json
+
+# Custom imports
+from utils import logging, pluralize
+
+
+def print_report(analysis, printer, all_errors_path=None):
+    console = printer.mode != "file"
+
+    if analysis.time_window is not None:
+        printer.print_message(f"Log lines from {analysis.time_window}")
+
+    if not analysis.logs_folder_found:
+        printer.print_message(f"No logs folder found at {os.path.join(analysis.namespace_path, 'logs')}")
+    else:
+        for pod in analysis.pods_with_errors:
+            printer.print_message(f"\n=== Checking logs for pod: {pod.name} ===", print_level=2)
+            if not pod.logs:
+                printer.print_message(f"No log files found for pod {pod.name}")
+            for file_name in pod.logs:
+                printer.print_message(f"Processing log file: {file_name}", print_level=2)
+
+    if analysis.pods_with_errors:
+        printer.print_message(f"\nFound {len(analysis.pods_with_errors)} pods with issues:")
+        logging.info(f"Found {len(analysis.pods_with_errors)} pods with issues:")
+        for pod in analysis.pods_with_errors:
+            printer.print_message(f"- {pod.get_pod_name()}")
+            logging.info(f"- {pod.get_pod_name()}")
+
+        if console:
+            print("\nDetails on pods with issues:")
+        for pod in analysis.pods_with_errors:
+            pod.print_info(printer)
+
+        if all_errors_path and console:
+            print(f"\n Clean errors saved to: {all_errors_path}")
+
+    printer.print_message("\nAnalyzing pods in normal state.")
+    for pod in analysis.pods_without_errors:
+        printer.print_message(f"\n=== Analyzing pod without errors: {pod.name} ===", print_level=2)
+        if not pod.logs:
+            printer.print_message(f"No log files found for pod {pod.name}\n")
+
+    if analysis.level_filter_stats is not None:
+        for file_name, (lines, lines_skipped) in analysis.level_filter_stats.items():
+            printer.print_message(f"Level filter: {file_name}: {lines - lines_skipped} lines scanned, {lines_skipped} skipped", print_level=2)
+        totals = analysis.get_level_filter_totals()
+        printer.print_message(f"\nLevel filter: {totals['lines_skipped']} log lines skipped for their level, {totals['lines_scanned']} scanned "
+                              f"in {pluralize(totals['files'], 'file')}")
+
+    analysis.error_info_holder.print_pods_by_error_category(printer)
+    analysis.error_info_holder.print_containers_by_error_category(printer)
+
+def write_all_errors(analysis, all_errors_path):
+    with open(all_errors_path, "w", encoding="utf-8") as f:
+        json.dump(analysis.get_pod_errors(), f, indent=2)
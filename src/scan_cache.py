@@ -0,0 +1,138 @@
+# scan_cache.py
+# Keeps the pattern hits of every scanned log file in SQLite, so a rerun on an unchanged case skips the file entirely
+
+import os
+import json
+import time
+import zlib
+import hashlib
+import sqlite3
+
+# Custom imports
+from utils import logging
+
+# Bumped whenever the stored records change shape, older caches are emptied
+SCAN_CACHE_VERSION = 2
+
+
+class ScanCache:
+    """
+    Pattern hits of each log file: every line that contains an error pattern, with the patterns found in it.
+    Categories are resolved from the hits for the dictionary in use, so one entry serves every dictionary, and
+    a changed dictionary only needs the files to be scanned for its new patterns (see log_scanner.scan_log_files).
+    An entry is only used while the file fingerprint (size and modification time) is unchanged.
+    The least recently used entries are evicted once the stored hits exceed max_size_mb.
+    """
+    def __init__(self, cache_path, max_size_mb=512):
+        self.cache_path = cache_path
+        self.max_size = max_size_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        # {pattern_set_key: frozenset(patterns)}
+        self.pattern_sets = {}
+
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        # Batch worker processes share the file, WAL lets them read while another one writes
+        self.connection = sqlite3.connect(cache_path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != SCAN_CACHE_VERSION:
+            self.connection.execute("DROP TABLE IF EXISTS scan_results")
+            self.connection.execute("DROP TABLE IF EXISTS pattern_sets")
+            self.connection.execute(f"PRAGMA user_version = {SCAN_CACHE_VERSION}")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS scan_results (
+                file_path TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                pattern_set_key TEXT NOT NULL,
+                hits BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )""")
+        # The patterns each file was scanned for, shared by every file scanned with the same dictionary
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS pattern_sets (
+                pattern_set_key TEXT PRIMARY KEY,
+                patterns TEXT NOT NULL
+            )""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS scan_results_last_used ON scan_results (last_used)")
+        self.total_size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM scan_results").fetchone()[0]
+        logging.info(f"Opened scan cache {cache_path} ({self.total_size / 1024 / 1024:.1f} MB)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_pattern_set(self, pattern_set_key):
+        if pattern_set_key not in self.pattern_sets:
+            row = self.connection.execute("SELECT patterns FROM pattern_sets WHERE pattern_set_key = ?", (pattern_set_key,)).fetchone()
+            self.pattern_sets[pattern_set_key] = frozenset(json.loads(row[0])) if row else frozenset()
+        return self.pattern_sets[pattern_set_key]
+
+    def add_pattern_set(self, patterns):
+        patterns_json = json.dumps(sorted(patterns), ensure_ascii=False)
+        pattern_set_key = hashlib.sha256(patterns_json.encode("utf-8")).hexdigest()
+        if pattern_set_key not in self.pattern_sets:
+            self.connection.execute("INSERT OR IGNORE INTO pattern_sets VALUES (?, ?)", (pattern_set_key, patterns_json))
+            self.pattern_sets[pattern_set_key] = frozenset(patterns)
+        return pattern_set_key
+
+    def get(self, file_name, fingerprint):
+        """
+        Returns (scanned_patterns, hits) for file_name, or None when it has to be scanned from scratch.
+        hits is a list of (line_number, line, patterns found in the line), in file order.
+        """
+        file_path = os.path.abspath(file_name)
+        row = self.connection.execute(
+            "SELECT fingerprint, pattern_set_key, hits FROM scan_results WHERE file_path = ?", (file_path,)).fetchone()
+
+        if row is None or row[0] != fingerprint:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.connection.execute("UPDATE scan_results SET last_used = ? WHERE file_path = ?", (time.time(), file_path))
+        hits = [(line_number, line, tuple(patterns)) for line_number, line, patterns in json.loads(zlib.decompress(row[2]))]
+        return self.get_pattern_set(row[1]), hits
+
+    def put(self, file_name, fingerprint, scanned_patterns, hits):
+        # fingerprint is taken before the file is scanned, so a file that changes meanwhile is rescanned next time
+        file_path = os.path.abspath(file_name)
+        pattern_set_key = self.add_pattern_set(scanned_patterns)
+        data = zlib.compress(json.dumps(hits, ensure_ascii=False).encode("utf-8"))
+
+        old_row = self.connection.execute("SELECT size FROM scan_results WHERE file_path = ?", (file_path,)).fetchone()
+        if old_row:
+            self.total_size -= old_row[0]
+        self.connection.execute("INSERT OR REPLACE INTO scan_results VALUES (?, ?, ?, ?, ?, ?)",
+                                (file_path, fingerprint, pattern_set_key, data, len(data), time.time()))
+        self.total_size += len(data)
+
+        if self.total_size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        # Least recently used first, down to 90% of the limit so eviction does not run on every put
+        target_size = self.max_size * 0.9
+        evicted = 0
+        for rowid, size in self.connection.execute("SELECT rowid, size FROM scan_results ORDER BY last_used").fetchall():
+            if self.total_size <= target_size:
+                break
+            self.connection.execute("DELETE FROM scan_results WHERE rowid = ?", (rowid,))
+            self.total_size -= size
+            evicted += 1
+        logging.info(f"Evicted {evicted} entries from the scan cache")
+
+    def commit(self):
+        self.connection.commit()
+
+    def close(self):
+        if self.connection is not None:
+            # Pattern sets no file refers to anymore
+            self.connection.execute("DELETE FROM pattern_sets WHERE pattern_set_key NOT IN (SELECT pattern_set_key FROM scan_results)")
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+            logging.info(f"Scan cache: {self.hits} hits, {self.misses} misses")
@@ -0,0 +1,203 @@
+# time_window.py
+# Restricts the log scan to the lines of a time window (--since / --until).
+# A line takes the time of the last line with a timestamp before it (the first one for the lines before any), so a stack trace
+# stays with its message. Container logs are in time order: the window of a file on disk is found by binary search on byte offsets
+# and only the lines inside it are read. Other files (.gz, inside a bundle) are read line by line.
+
+import re
+from datetime import datetime, timedelta, timezone
+
+# Custom imports
+from utils import logging
+from case_bundle import ARCHIVE_EXTENSIONS
+
+# get-k8s-info names the case folder (or bundle) <case number>_<YYYYMMDD>_<HHMMSS>
+CAPTURE_TIME_REGEX = re.compile(rf"_(\d{{8}}_\d{{6}})(?:{'|'.join(re.escape(extension) for extension in ARCHIVE_EXTENSIONS)})?$", re.IGNORECASE)
+RELATIVE_TIME_REGEX = re.compile(r"^([+-])(\d+(?:\.\d+)?)([smhd])$")
+RELATIVE_TIME_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days"}
+# The timeStamp / ts field of a JSON line (see error_message.parse_log_line), a string or epoch seconds
+TIMESTAMP_FIELD_REGEX = re.compile(r'"(?:timeStamp|ts)"\s*:\s*(?:"([^"]+)"|(\d+(?:\.\d+)?))')
+FRACTION_REGEX = re.compile(r"(\.\d{6})\d+")
+DATE_REGEX = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def parse_timestamp(text):
+    # Aware datetime of an ISO 8601 timestamp, or None. Timestamps without a time zone are UTC.
+    if not text or not text[0].isdigit():
+        return None
+    text = FRACTION_REGEX.sub(r"\1", text.strip())
+    if text.endswith(("Z", "z")):
+        text = text[:-1] + "+00:00"
+    try:
+        time = datetime.fromisoformat(text)
+    except ValueError:
+        return None
+    return time if time.tzinfo else time.replace(tzinfo=timezone.utc)
+
+def read_line_time(line):
+    # Time of a log line: the timeStamp / ts field of a JSON line, or the leading timestamp of a plain text line
+    # (one word, or a date and a time). None without any.
+    if line.startswith("{"):
+        match = TIMESTAMP_FIELD_REGEX.search(line)
+        if match is None:
+            return None
+        if match.group(1) is not None:
+            return parse_timestamp(match.group(1))
+        try:
+            return datetime.fromtimestamp(float(match.group(2)), timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    if not line[:1].isdigit():
+        return None
+    words = line.split(None, 2)
+    if DATE_REGEX.fullmatch(words[0]):
+        # "2025-09-10 15:00:00.123 [error] ..." (RabbitMQ, PostgreSQL). A date alone is not the time of the line.
+        if len(words) < 2 or not words[1][:1].isdigit():
+            return None
+        return parse_timestamp(f"{words[0]}T{words[1].replace(',', '.')}")
+    return parse_timestamp(words[0])
+
+def get_capture_time(namespace_path):
+    # Capture time in the name of the case folder or bundle that contains namespace_path, taken as UTC, or None
+    for part in reversed(re.split(r"[\\/]", namespace_path)):
+        match = CAPTURE_TIME_REGEX.search(part)
+        if match:
+            return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").replace(tzinfo=timezone.utc)
+    return None
+
+def check_time_option(value):
+    # argparse type of --since / --until: "capture", a relative time (-2h) or a timestamp
+    if value == "capture" or RELATIVE_TIME_REGEX.match(value) or parse_timestamp(value):
+        return value
+    raise ValueError(f"Invalid time {value!r}")
+
+def resolve_time_option(value, capture_time):
+    if value is None:
+        return None
+    relative_match = RELATIVE_TIME_REGEX.match(value)
+    if value != "capture" and not relative_match:
+        return parse_timestamp(value)
+    if capture_time is None:
+        raise ValueError(f"{value} is relative to the capture time, which is not in the case folder name")
+    if value == "capture":
+        return capture_time
+    sign, amount, unit = relative_match.groups()
+    offset = timedelta(**{RELATIVE_TIME_UNITS[unit]: float(amount)})
+    return capture_time + offset if sign == "+" else capture_time - offset
+
+
+class TimeWindow:
+    """Lines from since to until (aware datetimes, None for no limit), both included."""
+    def __init__(self, since=None, until=None):
+        self.since = since
+        self.until = until
+
+    def __str__(self):
+        since = self.since.isoformat() if self.since else "the start"
+        until = self.until.isoformat() if self.until else "the end"
+        return f"{since} to {until}"
+
+    def is_before(self, time):
+        return self.since is not None and time < self.since
+
+    def is_after(self, time):
+        return self.until is not None and time > self.until
+
+    def to_summary(self):
+        return {"since": self.since.isoformat() if self.since else None, "until": self.until.isoformat() if self.until else None}
+
+
+def get_time_window(since, until, namespace_path):
+    """
+    TimeWindow of the --since / --until values for namespace_path, relative ones are counted from the capture time of its case.
+    None without any, or when they can not be resolved, the whole logs are analyzed then.
+    """
+    if since is None and until is None:
+        return None
+    try:
+        capture_time = get_capture_time(namespace_path)
+        time_window = TimeWindow(resolve_time_option(since, capture_time), resolve_time_option(until, capture_time))
+    except ValueError as e:
+        print(f"Time window ignored for {namespace_path}: {e}. Analyzing the whole logs.")
+        logging.warning(f"Time window ignored for {namespace_path}: {e}. Analyzing the whole logs.")
+        return None
+    logging.info(f"Time window of {namespace_path}: {time_window}")
+    return time_window
+
+
+def iter_window_lines(lines, time_window):
+    """
+    Yields the (line_number, line) of lines (an iterable of text lines) inside time_window.
+    The lines before the first timestamp wait for it, a file without any timestamp is kept whole.
+    """
+    leading_lines = []
+    inside = None
+    for line_number, line in enumerate(lines, start=1):
+        time = read_line_time(line)
+        if time is not None:
+            if time_window.is_after(time):
+                # Time order, nothing after this line is inside the window
+                inside = False
+                leading_lines = []
+                break
+            inside = not time_window.is_before(time)
+            if leading_lines:
+                if inside:
+                    yield from leading_lines
+                leading_lines = []
+        if inside is None:
+            leading_lines.append((line_number, line))
+        elif inside:
+            yield line_number, line
+    yield from leading_lines
+
+
+def find_window_offsets(log_map, size, time_window):
+    """
+    (start, end) byte offsets of the lines inside time_window in a memory-mapped log file, by binary search.
+    A file without any timestamp is kept whole.
+    """
+    first_line = read_next_timed_line(log_map, size, 0)
+    if first_line is None:
+        return 0, size
+
+    start = 0
+    if time_window.since is not None:
+        start = find_first_timed_line(log_map, size, time_window.is_before)
+        # The lines before the first timestamp go with it
+        if start == first_line[0]:
+            start = 0
+    end = size
+    if time_window.until is not None:
+        end = find_first_timed_line(log_map, size, lambda time: not time_window.is_after(time))
+        if end == first_line[0]:
+            end = 0
+    return start, max(start, end)
+
+def find_first_timed_line(log_map, size, is_earlier):
+    # Offset of the first line with a timestamp for which is_earlier is False, or size
+    low = 0
+    high = size
+    while low < high:
+        middle = (low + high) // 2
+        timed_line = read_next_timed_line(log_map, size, middle)
+        if timed_line is None or not is_earlier(timed_line[2]):
+            high = middle
+        else:
+            low = timed_line[1]
+    timed_line = read_next_timed_line(log_map, size, low)
+    return size if timed_line is None else timed_line[0]
+
+def read_next_timed_line(log_map, size, position):
+    # (start, end, time) of the first line with a timestamp that starts at or after position, or None
+    line_start = 0 if position == 0 else log_map.find(b"\n", position - 1) + 1
+    if line_start == 0 and position != 0:
+        return None
+    while line_start < size:
+        line_end = log_map.find(b"\n", line_start)
+        line_end = size if line_end == -1 else line_end + 1
+        time = read_line_time(log_map[line_start:line_end].decode("utf-8", errors="ignore"))
+        if time is not None:
+            return line_start, line_end, time
+        line_start = line_end
+    return None
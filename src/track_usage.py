@@ -1,4 +1,147 @@
 # track_usage.py
+# Sends user activity to the tracking server from a background thread, so a slow or dead server never delays the analysis.
+# Activity that could not be sent before exit is kept in a small local file and sent by the next run.
 
-import requests
+import os
+import json
+import time
+import queue
+import atexit
+import threading
 
+# Custom imports
+from utils import conf, logging, get_request_timeout
+
+
+class ActivityTracker:
+    """
+    Posts activity payloads to url one at a time from a daemon thread. The queue holds at most max_queue_size payloads,
+    more are dropped. After the first failed post the server is considered down for this run and nothing else is posted.
+    close() waits at most exit_wait_seconds and saves the payloads that were not sent to pending_path.
+    """
+    def __init__(self, url, pending_path, max_queue_size=256, exit_wait_seconds=2):
+        self.url = url
+        self.pending_path = pending_path
+        self.max_queue_size = max_queue_size
+        self.exit_wait_seconds = exit_wait_seconds
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.unsent = []
+        self.in_flight = None
+        self.server_down = False
+        self.thread = None
+        self.closed = False
+
+        for payload in self.load_pending():
+            self.record(payload)
+
+    def load_pending(self):
+        if not os.path.exists(self.pending_path):
+            return []
+        try:
+            with open(self.pending_path, "r", encoding="utf-8") as f:
+                pending = json.load(f)
+            os.remove(self.pending_path)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read the pending user activity in {self.pending_path}: {e}")
+            return []
+        logging.info(f"Sending {len(pending)} pending user activity records from an earlier run")
+        return pending
+
+    def record(self, payload):
+        # Never blocks, the payload is posted by the background thread
+        if self.closed:
+            self.unsent.append(payload)
+            return
+        try:
+            self.queue.put_nowait(payload)
+        except queue.Full:
+            logging.warning(f"User activity queue is full ({self.max_queue_size} records). Dropping {payload}")
+            return
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.send_queued, name="activity-tracker", daemon=True)
+            self.thread.start()
+
+    def send_queued(self):
+        import requests
+        while True:
+            payload = self.queue.get()
+            if payload is None:
+                return
+            if self.server_down:
+                self.unsent.append(payload)
+                continue
+            self.in_flight = payload
+            try:
+                response = requests.post(self.url, json=payload, timeout=get_request_timeout())
+                logging.info(f"Response from {self.url}: {response}")
+            except requests.RequestException as e:
+                logging.warning(f"Could not send user activity to {self.url}: {e}. Keeping it for the next run.")
+                self.server_down = True
+                self.unsent.append(payload)
+            self.in_flight = None
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.thread is not None:
+            # One deadline for both waits, a full queue must not double it
+            deadline = time.monotonic() + self.exit_wait_seconds
+            try:
+                self.queue.put(None, timeout=self.exit_wait_seconds)
+            except queue.Full:
+                pass
+            self.thread.join(max(0, deadline - time.monotonic()))
+
+        pending = list(self.unsent)
+        if self.thread is not None and self.thread.is_alive():
+            # Still waiting on the server, the rest of the queue is kept for the next run
+            logging.warning(f"User activity was not sent within {self.exit_wait_seconds}s. Keeping it for the next run.")
+            if self.in_flight is not None:
+                pending.append(self.in_flight)
+            while True:
+                try:
+                    payload = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if payload is not None:
+                    pending.append(payload)
+        self.save_pending(pending)
+
+    def save_pending(self, pending):
+        if not pending:
+            return
+        # Only the most recent records are kept when the server stays down for many runs
+        pending = pending[-self.max_queue_size:]
+        try:
+            os.makedirs(os.path.dirname(self.pending_path) or ".", exist_ok=True)
+            with open(self.pending_path, "w", encoding="utf-8") as f:
+                json.dump(pending, f)
+            logging.info(f"Saved {len(pending)} unsent user activity records to {self.pending_path}")
+        except OSError as e:
+            logging.warning(f"Could not save the unsent user activity to {self.pending_path}: {e}")
+
+
+activity_tracker = None
+
+def get_activity_tracker():
+    global activity_tracker
+    if activity_tracker is None:
+        network_conf = conf.get("network", {})
+        activity_tracker = ActivityTracker(conf.get("user_activity_url", ""),
+                                           os.path.join(conf["output_folder"], network_conf.get("pending_activity_file", "pending_activity.json")),
+                                           network_conf.get("activity_queue_size", 256),
+                                           network_conf.get("exit_wait_seconds", 2))
+        atexit.register(activity_tracker.close)
+    return activity_tracker
+
+def record_user_activity(namespace_path):
+    user = None
+
+    try:
+        user = os.getlogin()
+    except Exception as e:
+        logging.warning(f"Get user failed. Returning None. Error: {e}")
+
+    payload = {"user": user, "namespace_path" : namespace_path}
+    get_activity_tracker().record(payload)
@@ -3,12 +3,10 @@
 import os
 import json
 
-from prompt_toolkit import prompt
-from prompt_toolkit.completion import WordCompleter
-
-
 # Custom imports
 from utils import logging, conf, remove_invalid_windows_path_chars, load_json_from_path
+from case_bundle import path_exists, path_isdir, list_dir
+from pattern_compiler import validate_entry
 
 DOWNLOAD_UPLOAD_OPTIPONS_NON_DEFAULT = [
     "Download",
@@ -31,6 +29,9 @@ def select_option(options, message_to_prompt="Please select an action:", tab_com
 
         choice = ""
         if tab_complete:
+            # prompt_toolkit is only imported for the first menu with tab completion
+            from prompt_toolkit import prompt
+            from prompt_toolkit.completion import WordCompleter
             menu_completer = WordCompleter(
                 options,
                 ignore_case=True
@@ -96,12 +97,12 @@ def get_user_input_via_cache(cache, target, msg_saved_cache, msg_please_enter_va
 def get_namespace_path_from_user(case_info_dir):
     # List the folders under kubernetes folder and let user select one
     kubernetes_path = os.path.join(case_info_dir, 'kubernetes')
-    if not os.path.exists(kubernetes_path):
+    if not path_exists(kubernetes_path):
         print(f"The 'kubernetes' folder does not exist under {case_info_dir}.")
         logging.error(f"The 'kubernetes' folder does not exist under {case_info_dir}. Exiting the program.")
         return
 
-    folders = [f for f in os.listdir(kubernetes_path) if os.path.isdir(os.path.join(kubernetes_path, f))]
+    folders = [f for f in list_dir(kubernetes_path) if path_isdir(os.path.join(kubernetes_path, f))]
     if not folders:
         print("No folders found under 'kubernetes'.")
         logging.error("No folders found under 'kubernetes'. Exiting the program.")
@@ -114,7 +115,21 @@ def get_namespace_path_from_user(case_info_dir):
     return namespace_path
 
 def user_dict_has_valid_format(user_dict_path):
-    user_dict = load_json_from_path(user_dict_path)
+    try:
+        user_dict = load_json_from_path(user_dict_path)
+    except (OSError, ValueError) as e:
+        print(f"Could not read the error patterns file {user_dict_path}: {e}")
+        logging.error(f"Could not read the error patterns file {user_dict_path}: {e}")
+        return False
+    if user_dict is None:
+        # load_json_from_path printed that the file was not found
+        logging.error(f"Error patterns file not found: {user_dict_path}")
+        return False
+    if type(user_dict) != dict:
+        print(f"The error patterns file must contain an object of categories (ex. {{'category': ['error pattern 1']}}) not {type(user_dict)}")
+        logging.error(f"The error patterns file must contain an object of categories not {type(user_dict)}")
+        return False
+
     categories = list(user_dict.keys())
     patterns = list(user_dict.values())
     
@@ -130,9 +145,11 @@ def user_dict_has_valid_format(user_dict_path):
             logging.error(f"The type of that contains error patterns must be a list (ex. ['error pattern 1', 'error pattern 2']) not {type(pattern)}")
             return False
         for pattern_element in pattern:
-            if type(pattern_element) != str:
-                print(f"The type of the pattern element must be a string (ex. ['error pattern 1', 'error pattern 2']) not {type(pattern_element)}")
-                logging.error(f"The type of the pattern element must be a string (ex. ['error pattern 1', 'error pattern 2']) not {type(pattern_element)}")
+            # A string, or an object such as {"regex": "..."} (see pattern_compiler)
+            error = validate_entry(pattern_element)
+            if error:
+                print(f"Invalid pattern element (ex. ['error pattern 1', {{\"regex\": \"error pattern [0-9]+\"}}]): {error}")
+                logging.error(f"Invalid pattern element: {error}")
                 return False
     return True
 
@@ -4,9 +4,13 @@ import re
 import os
 import json
 import logging
-import inflect
-import requests
+import logging.handlers
 import datetime
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from functools import lru_cache
+from concurrent.futures import Future
 
 # Custom imports
 
@@ -30,6 +34,35 @@ CONF = {
     "output_timestamp_format": "%Y-%m-%d %H:%M:%S",
     "print_level": 1,
     "output_folder": "output",
+    "json_backend": "auto",
+    "scan_mode": "auto",
+    "mmap_min_file_size_mb": 64,
+    "scan_cache": {
+        "file_name": "scan_cache.sqlite",
+        "max_size_mb": 512
+    },
+    "level_filter": {
+        "enabled": False,
+        "min_level": "warn",
+        "category_min_levels": {}
+    },
+    "printer": {
+        "flush_size_bytes": 65536,
+        "flush_interval_seconds": 5
+    },
+    "mongodb": {
+        "server_selection_timeout_ms": 5000,
+        "snapshot_file": "mongodb_snapshot.json",
+        "snapshot_max_age_hours": 24
+    },
+    "network": {
+        "connect_timeout_seconds": 3,
+        "read_timeout_seconds": 5,
+        "env_file_wait_seconds": 10,
+        "activity_queue_size": 256,
+        "exit_wait_seconds": 2,
+        "pending_activity_file": "pending_activity.json"
+    },
     "logging": {
         "level": "INFO",
         "format": "%(asctime)s %(levelname)s %(message)s",
@@ -199,14 +232,44 @@ CONF = {
 
 
 def get_conf():
-    global conf
     if os.path.exists('conf.json'):
         with open('conf.json', 'r', encoding='utf-8') as f:
-            conf = json.load(f)
+            return json.load(f)
     else:
         restore_conf()
         exit(1)
 
+class LazyConf:
+    """conf.json, read on first use instead of when utils is imported. Behaves like the dict."""
+    def __init__(self):
+        self.data = None
+
+    def load(self):
+        if self.data is None:
+            self.data = get_conf()
+        return self.data
+
+    def __getitem__(self, key):
+        return self.load()[key]
+
+    def __setitem__(self, key, value):
+        self.load()[key] = value
+
+    def __contains__(self, key):
+        return key in self.load()
+
+    def __iter__(self):
+        return iter(self.load())
+
+    def __len__(self):
+        return len(self.load())
+
+    def __getattr__(self, name):
+        # get, setdefault, items, ...
+        return getattr(self.load(), name)
+
+conf = LazyConf()
+
 def restore_conf():
     if os.path.exists(RESTORE_CONF_FILE):
         print(f"{RESTORE_CONF_FILE} already exists. Rename it to 'conf.json' to use it.")
@@ -215,10 +278,14 @@ def restore_conf():
         json.dump(CONF, f, indent=2)
     print(f"Configuration restored to {RESTORE_CONF_FILE}. Rename it to 'conf.json' to use it.")
 
-p = inflect.engine()
+@lru_cache(maxsize=None)
+def get_inflect_engine():
+    # inflect takes seconds to import, most runs only need it once the report is printed
+    import inflect
+    return inflect.engine()
 
 def pluralize(count, word):
-    return f"{count} {p.plural(word, count)}"
+    return f"{count} {get_inflect_engine().plural(word, count)}"
 
 def load_cache():
     cache = {}
@@ -235,11 +302,16 @@ def load_cache():
 
 def parse_container_name(log_file_path):
     log_file_name = os.path.basename(log_file_path)
-    container_name = log_file_name.split("_")[-1].replace(".log", "")
+    container_name = log_file_name.split("_")[-1].removesuffix(".gz").replace(".log", "")
 
     return container_name
 
-get_conf()
+def parse_pod_name(log_file_path):
+    # Log files are named <pod>_<container>.log and pod names never contain "_"
+    log_file_name = os.path.basename(log_file_path)
+    pod_name = log_file_name.split("_")[0]
+
+    return pod_name
 
 def load_logging_level():
     if conf['logging']:
@@ -258,15 +330,51 @@ def load_logging_level():
                 logging.warning(f"Unknown logging level: {conf['logging']['level']}. Defaulting to INFO.")
     return logging.INFO  # Default level if not specified
 
-# Configure logging
-logging.basicConfig(
-    level=load_logging_level(),
-    format=conf.get('logging', {}).get('format', "%(asctime)s %(levelname)s %(message)s"),
-    # format=conf['logging']['format'],
-    handlers=[
-        logging.FileHandler(conf.get('logging', {}).get('file_name', "auto_k8s_info.log"), encoding='utf-8')  # Log to file
-    ]
-)
+# Rolled log segments are named <file_name>.YYYY-MM-DD by TimedRotatingFileHandler
+LOG_SEGMENT_DATE_FORMAT = "%Y-%m-%d"
+
+logging_configured = False
+
+def setup_logging(log_queue=None):
+    # Called by main() and by worker processes, importing utils does not touch the log file
+    # The log file is rolled over into a dated segment at midnight (or at the first run after it),
+    # so retention only has to delete old segments instead of rewriting the log file.
+    # Worker processes get the log_queue of worker_log_queue instead: only the main process writes and rolls over the file,
+    # several processes renaming the same file lose a day of log (POSIX) or fail (Windows).
+    global logging_configured
+    if log_queue is not None:
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        # The main process formats the record, with the time it was logged at
+        queue_handler.setFormatter(logging.Formatter("%(message)s"))
+        # Also replaces the rotating handler a forked worker inherits
+        logging.basicConfig(level=load_logging_level(), handlers=[queue_handler], force=True)
+        logging_configured = True
+        return
+    if logging_configured:
+        return
+    logging.basicConfig(
+        level=load_logging_level(),
+        format=conf.get('logging', {}).get('format', "%(asctime)s %(levelname)s %(message)s"),
+        # format=conf['logging']['format'],
+        handlers=[
+            logging.handlers.TimedRotatingFileHandler(conf.get('logging', {}).get('file_name', "auto_k8s_info.log"), when="midnight", encoding='utf-8')  # Log to file
+        ],
+        # Replaces the console handler logging adds when something is logged before this
+        force=True
+    )
+    logging_configured = True
+
+@contextmanager
+def worker_log_queue():
+    # Queue for setup_logging of the worker processes, its records go to the handlers of this process until the block ends
+    log_queue = multiprocessing.Queue()
+    listener = logging.handlers.QueueListener(log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+    listener.start()
+    try:
+        yield log_queue
+    finally:
+        listener.stop()
+        log_queue.close()
 
 def manage_log_retention():   
     log_file_path = conf.get('logging', {}).get('file_name', "auto_k8s_info.log")
@@ -275,28 +383,21 @@ def manage_log_retention():
     # Calculate the cutoff date
     cutoff_date = datetime.datetime.now() - datetime.timedelta(days=retention_days)
 
-    # Read and filter log lines
-    cutoff_date_passed = False
-    filtered_lines = []
-    if os.path.exists(log_file_path):
-        with open(log_file_path, "r") as file:
-            for line in file:
-                try:
-                    # Assuming log lines start with 'YYYY-MM-DD HH:MM:SS'
-                    timestamp_str = line[:19]
-                    timestamp = datetime.datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
-                    if timestamp >= cutoff_date:
-                        cutoff_date_passed = True
-                    if cutoff_date_passed:
-                        filtered_lines.append(line)
-                except ValueError:
-                    # Keep lines that don't start with a timestamp
-                    if cutoff_date_passed:
-                        filtered_lines.append(line)
-
-    # Overwrite the log file with filtered lines
-    with open(log_file_path, "w") as file:
-        file.writelines(filtered_lines)
+    # Delete the segments whose whole day is older than the cutoff date
+    log_dir = os.path.dirname(os.path.abspath(log_file_path))
+    segment_prefix = f"{os.path.basename(log_file_path)}."
+    for file_name in os.listdir(log_dir):
+        if not file_name.startswith(segment_prefix):
+            continue
+        try:
+            segment_date = datetime.datetime.strptime(file_name[len(segment_prefix):], LOG_SEGMENT_DATE_FORMAT)
+        except ValueError:
+            continue
+        if segment_date + datetime.timedelta(days=1) <= cutoff_date:
+            try:
+                os.remove(os.path.join(log_dir, file_name))
+            except OSError as e:
+                logging.warning(f"Could not remove expired log segment {file_name}: {e}")
 
     formatted_cutoff_date = cutoff_date.strftime(conf.get("output_timestamp_format", "%Y-%m-%d %H:%M:%S"))
     
@@ -317,6 +418,11 @@ def load_json_from_path(file_path):
 
     return load_and_fix_json(file_path)
 
+def get_request_timeout():
+    # (connect, read) timeouts of every request to the tracking server
+    network_conf = conf.get("network", {})
+    return network_conf.get("connect_timeout_seconds", 3), network_conf.get("read_timeout_seconds", 5)
+
 def get_env_file():
     if os.path.exists('.env'):
         print(".env file already exists. Skipping download.")
@@ -327,15 +433,48 @@ def get_env_file():
         logging.info("Downloading .env file from the server...")
         local_filename = conf.get("mongodb_conn_var_url", "").split('/')[-1]
 
-        response = requests.get(conf.get("mongodb_conn_var_url", ""), stream=True)
-        response.raise_for_status()  # check for HTTP errors
-
-        with open(local_filename, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        import requests
+        try:
+            with requests.get(conf.get("mongodb_conn_var_url", ""), stream=True, timeout=get_request_timeout()) as response:
+                response.raise_for_status()  # check for HTTP errors
+
+                # An interrupted download must not leave a partial .env behind
+                with open(f"{local_filename}.part", 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        f.write(chunk)
+        except BaseException:
+            if os.path.exists(f"{local_filename}.part"):
+                os.remove(f"{local_filename}.part")
+            raise
+        os.replace(f"{local_filename}.part", local_filename)
         print(f".env file downloaded successfully as {local_filename}.")
         logging.info(f".env file downloaded successfully as {local_filename}.")
 
+env_file_download = None
+
+def start_env_file_download():
+    # Downloads the .env file on a daemon thread while the tool starts up, see wait_for_env_file
+    global env_file_download
+    if env_file_download is None:
+        env_file_download = Future()
+
+        def download():
+            try:
+                env_file_download.set_result(get_env_file())
+            except BaseException as e:
+                env_file_download.set_exception(e)
+
+        threading.Thread(target=download, name="env-file-download", daemon=True).start()
+    return env_file_download
+
+def wait_for_env_file():
+    # Raises TimeoutError when the download takes longer than env_file_wait_seconds, or the download error
+    wait_seconds = conf.get("network", {}).get("env_file_wait_seconds", 10)
+    try:
+        start_env_file_download().result(timeout=wait_seconds)
+    except TimeoutError:
+        raise TimeoutError(f"The .env file download did not finish within {wait_seconds}s") from None
+
 def escape_inner_quotes(json_string: str) -> str:
     """
     Escapes unescaped double quotes inside double-quoted JSON strings.
@@ -376,16 +515,3 @@ def load_and_fix_json(file_path: str):
       return json.loads(content)
   except json.JSONDecodeError as e:
       raise ValueError(f"Still invalid after fixes: {e}") from None
-
-def record_user_activity(namespace_path):
-    user = None
-    
-    try:
-        user = os.getlogin()
-    except Exception as e:
-        logging.warning(f"Get user failed. Returning None. Error: {e}")
-    
-    payload = {"user": user, "namespace_path" : namespace_path}
-
-    response = requests.post(conf.get("user_activity_url", ""), json=payload)
-    logging.info(f'Response from {conf.get("user_activity_url", "")}: {response}')